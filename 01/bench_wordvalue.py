@@ -0,0 +1,27 @@
+'''Compare scoring the whole DICTIONARY word by word (calc_word_value)
+with the batch scorer (calc_word_values)'''
+from timeit import repeat
+
+from wordvalue import load_words, calc_word_value, calc_word_values, np
+
+NUMBER = 1
+REPEAT = 5
+
+
+def bench(label, func, baseline=None):
+    best = min(repeat(func, number=NUMBER, repeat=REPEAT)) / NUMBER
+    speedup = '' if baseline is None else ' ({:.1f}x)'.format(baseline / best)
+    print('{:<32} {:>8.1f} ms{}'.format(label, best * 1000, speedup))
+    return best
+
+
+if __name__ == "__main__":
+    words = load_words()
+    assert list(calc_word_values(words)) == [calc_word_value(w) for w in words]
+
+    print('Scoring {} words\n'.format(len(words)))
+    baseline = bench('calc_word_value (per word)',
+                     lambda: [calc_word_value(w) for w in words])
+    backend = 'numpy' if np is not None else 'bytes.translate'
+    bench('calc_word_values ({})'.format(backend),
+          lambda: calc_word_values(words), baseline)
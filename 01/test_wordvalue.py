@@ -1,7 +1,10 @@
+from array import array
 import unittest
 
 from data import DICTIONARY, LETTER_SCORES
 from wordvalue import load_words, calc_word_value, max_word_value
+from wordvalue import calc_word_values, top_word_values, words_by_value
+from wordvalue import ScoreTable, SCORE_TABLE, _fingerprint
 
 TEST_WORDS = ('bob', 'julian', 'pybites', 'quit', 'barbeque')
 
@@ -20,9 +23,40 @@ class TestWordValue(unittest.TestCase):
         self.assertEqual(calc_word_value('PyBites'), 14)
         self.assertEqual(calc_word_value('benzalphenylhydrazone'), 56)
 
+    def test_calc_word_values(self):
+        self.assertEqual(list(calc_word_values(TEST_WORDS)),
+                         [calc_word_value(word) for word in TEST_WORDS])
+        self.assertEqual(list(calc_word_values(['', 'JuliaN'])), [0, 13])
+        self.assertEqual(len(calc_word_values([])), 0)
+
+    def test_calc_word_values_type(self):
+        for words in ([], ['bob'], TEST_WORDS):
+            values = calc_word_values(words)
+            self.assertIsInstance(values, array)
+            self.assertEqual(values.typecode, 'H')
+
     def test_max_word_value(self):
         self.assertEqual(max_word_value(TEST_WORDS), 'barbeque')
         self.assertEqual(max_word_value(), 'benzalphenylhydrazone')
 
+    def test_top_word_values(self):
+        top = top_word_values(3)
+        self.assertEqual(top[0], ('benzalphenylhydrazone', 56))
+        self.assertEqual([score for _, score in top], [56, 53, 53])
+
+    def test_words_by_value(self):
+        self.assertIn('bob', words_by_value(7))
+        words = words_by_value(53, 100)
+        self.assertEqual(len(words), 3)
+        self.assertEqual(words[-1], 'benzalphenylhydrazone')
+        self.assertEqual(words_by_value(100), [])
+
+    def test_score_table_cache(self):
+        max_word_value()  # makes sure SCORE_TABLE is on disk
+        table = ScoreTable.load(SCORE_TABLE, _fingerprint())
+        self.assertEqual(len(table), 235886)
+        self.assertEqual(table.max_word(), 'benzalphenylhydrazone')
+        self.assertIsNone(ScoreTable.load(SCORE_TABLE, 'stale'))
+
 if __name__ == "__main__":
    unittest.main() 
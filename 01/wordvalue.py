@@ -1,5 +1,24 @@
+from array import array
+from bisect import bisect_left, bisect_right
+import hashlib
+import os
+import sys
+
+try:
+    import numpy as np
+except ImportError:  # optional, calc_word_values falls back to bytes.translate
+    np = None
+
 from data import DICTIONARY, LETTER_SCORES
 
+SCORE_TABLE = DICTIONARY + '.scores'
+MAGIC = b'SCORES1'
+WORD_SEP = b'\n'
+SEP_VALUE = 0xFF  # never a letter score, so marks word boundaries
+
+_tables = {}  # fingerprint -> ScoreTable, so we only read the file once
+
+
 def load_words():
     """Load dictionary into a list and return list"""
     with open(DICTIONARY) as file:
@@ -16,11 +35,49 @@ def calc_word_value(word):
     return sum(letter_to_score)
 
 
+def _build_score_bytes():
+    """256 byte lookup table: byte of an (upper or lower case) letter ->
+    its score, anything else -> 0"""
+    table = bytearray(256)
+    for letter, score in LETTER_SCORES.items():
+        table[ord(letter)] = table[ord(letter.lower())] = score
+    return bytes(table)
+
+
+SCORE_BYTES = _build_score_bytes()
+SEP_BYTES = (SCORE_BYTES[:ord(WORD_SEP)] + bytes([SEP_VALUE]) +
+             SCORE_BYTES[ord(WORD_SEP) + 1:])
+
+
+def calc_word_values(words):
+    """Calculate the values of a batch of words in one go. Returns an
+    array('H') of the values, computed with numpy if it is installed"""
+    words = list(words)
+    if not words:
+        return array('H')
+    blob = WORD_SEP.join(word.encode('utf-8') for word in words)
+    if np is not None:
+        return array('H', _calc_word_values_numpy(blob).tobytes())
+    # translate maps every byte to its score in C, sum() adds them up
+    scores = blob.translate(SEP_BYTES).split(bytes([SEP_VALUE]))
+    return array('H', map(sum, scores))
+
+
+def _calc_word_values_numpy(blob):
+    buf = np.frombuffer(blob, dtype=np.uint8)
+    scores = np.frombuffer(SCORE_BYTES, dtype=np.uint8)[buf]
+    running = np.concatenate(([0], np.cumsum(scores, dtype=np.int64)))
+    seps = np.flatnonzero(buf == ord(WORD_SEP))
+    starts = np.concatenate(([0], seps + 1))
+    ends = np.append(seps, len(buf))
+    return (running[ends] - running[starts]).astype(np.uint16)
+
+
 def max_word_value(list_of_words=None):
     """Calculate the word with the max value, can receive a list
     of words as arg, if none provided uses default DICTIONARY"""
     if not list_of_words:
-        list_of_words = load_words()
+        return get_score_table().max_word()
 
     word_to_score_list = [{'word': word, 'score': calc_word_value(word)}
                                                 for word in list_of_words]
@@ -30,5 +87,111 @@ def max_word_value(list_of_words=None):
     return sorted_words_to_score[-1]['word']
 
 
+def top_word_values(n=10):
+    """Return the n highest (word, value) pairs of the DICTIONARY"""
+    return get_score_table().top(n)
+
+
+def words_by_value(low, high=None):
+    """Return the DICTIONARY words with low <= value <= high"""
+    return get_score_table().in_range(low, low if high is None else high)
+
+
+class ScoreTable:
+    """All words with their values, sorted by value (ties keep dictionary
+    order). Words live in one newline separated utf-8 blob, located by an
+    array('I') of offsets, with the values in a parallel array('H')"""
+
+    def __init__(self, scores, offsets, blob):
+        self.scores = scores
+        self.offsets = offsets
+        self.blob = blob
+
+    @classmethod
+    def build(cls, words):
+        values = calc_word_values(words).tolist()
+        order = sorted(range(len(words)), key=values.__getitem__)
+        scores = array('H', (values[i] for i in order))
+        offsets = array('I', [0])
+        chunks = []
+        for i in order:
+            chunk = (words[i] + '\n').encode('utf-8')
+            chunks.append(chunk)
+            offsets.append(offsets[-1] + len(chunk))
+        return cls(scores, offsets, b''.join(chunks))
+
+    @classmethod
+    def load(cls, path, fingerprint):
+        """Return the table stored in path or None if it is missing or
+        was built from another dictionary / LETTER_SCORES"""
+        try:
+            with open(path, 'rb') as f:
+                header = f.readline().split()
+                if header[:2] != [MAGIC, fingerprint.encode()]:
+                    return None
+                count = int(header[2])
+                scores = array('H')
+                scores.fromfile(f, count)
+                offsets = array('I')
+                offsets.fromfile(f, count + 1)
+                blob = f.read()
+        except (OSError, EOFError, IndexError, ValueError):
+            return None
+        return cls(scores, offsets, blob)
+
+    def save(self, path, fingerprint):
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(b' '.join((MAGIC, fingerprint.encode(),
+                               str(len(self)).encode())) + b'\n')
+            self.scores.tofile(f)
+            self.offsets.tofile(f)
+            f.write(self.blob)
+        os.replace(tmp, path)  # readers never see a half written table
+
+    def __len__(self):
+        return len(self.scores)
+
+    def _words(self, start, stop):
+        chunk = self.blob[self.offsets[start]:self.offsets[stop]]
+        return chunk.decode('utf-8').split('\n')[:-1]
+
+    def max_word(self):
+        return self._words(len(self) - 1, len(self))[0]
+
+    def top(self, n):
+        start = max(0, len(self) - n)
+        words = self._words(start, len(self))
+        return list(zip(reversed(words), reversed(self.scores[start:])))
+
+    def in_range(self, low, high):
+        start = bisect_left(self.scores, low)
+        stop = bisect_right(self.scores, high, lo=start)
+        return self._words(start, stop)
+
+
+def _fingerprint():
+    """Changes whenever DICTIONARY or LETTER_SCORES change"""
+    stat = os.stat(DICTIONARY)
+    key = '{} {} {} {}'.format(stat.st_size, stat.st_mtime_ns, sys.byteorder,
+                               sorted(LETTER_SCORES.items()))
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def get_score_table():
+    """Return the ScoreTable of DICTIONARY, (re)building SCORE_TABLE
+    on disk when it is missing or stale"""
+    fingerprint = _fingerprint()
+    table = _tables.get(fingerprint)
+    if table is None:
+        table = ScoreTable.load(SCORE_TABLE, fingerprint)
+        if table is None:
+            table = ScoreTable.build(load_words())
+            table.save(SCORE_TABLE, fingerprint)
+        _tables.clear()
+        _tables[fingerprint] = table
+    return table
+
+
 if __name__ == "__main__":
     pass # run unittests to validate
@@ -2,12 +2,16 @@
 # Code Challenge 02 - Word Values Part II - a simple game
 # http://pybit.es/codechallenge02.html
 
+from collections import Counter, defaultdict
+from functools import lru_cache
 import itertools
 import random
+from string import ascii_uppercase
 
 from data import DICTIONARY, LETTER_SCORES, POUCH
 
 NUM_LETTERS = 7
+BLANK = '?'
 
 
 def draw_letters():
@@ -50,10 +54,48 @@ def calc_word_value(word):
 # get_possible_dict_words and _get_permutations_draw would be instance methods.
 # 'draw' would be set in the class constructor (__init__).
 def get_possible_dict_words(draw):
-    """Get all possible words from draw which are valid dictionary words.
-    Use the _get_permutations_draw helper and DICTIONARY constant"""
-    permutations = [''.join(word).lower() for word in _get_permutations_draw(draw)]
-    return set(permutations) & set(DICTIONARY)
+    """Get all possible words from draw which are valid dictionary words,
+    ranked by calc_word_value (highest first). BLANK tiles act as jokers.
+    Instead of trying every permutation of the draw we look up every
+    sub-multiset of the draw in a sorted-letter signature index"""
+    index = _get_signature_index()
+    counts = Counter(letter.upper() for letter in draw)
+    blanks = counts.pop(BLANK, 0)
+    ranked = set()
+    for letters in _get_sub_multisets(counts):
+        ranked.update(index.get(letters, ()))
+        for num_blanks in range(1, blanks + 1):
+            for jokers in itertools.combinations_with_replacement(
+                    ascii_uppercase, num_blanks):
+                signature = _signature(letters + ''.join(jokers))
+                ranked.update(index.get(signature, ()))
+    return [word for _, word in sorted(ranked)]
+
+
+def _signature(letters):
+    """Order independent key for a word or collection of letters"""
+    return ''.join(sorted(letters.upper()))
+
+
+@lru_cache(maxsize=None)
+def _get_signature_index():
+    """Map signature -> (-value, word) tuples, built once from DICTIONARY.
+    Words longer than NUM_LETTERS can never be formed so are skipped"""
+    index = defaultdict(list)
+    for word in DICTIONARY:
+        if len(word) <= NUM_LETTERS:
+            index[_signature(word)].append((-calc_word_value(word), word))
+    return dict(index)
+
+
+def _get_sub_multisets(counts):
+    """Yield every distinct selection of the letters in counts (a
+    letter -> amount mapping) as a string which is its own signature"""
+    letters = sorted(counts)
+    for amounts in itertools.product(*(range(counts[letter] + 1)
+                                       for letter in letters)):
+        yield ''.join(letter * amount
+                      for letter, amount in zip(letters, amounts))
 
 
 def _get_permutations_draw(draw):
@@ -0,0 +1,353 @@
+#!python3
+# Code Challenge 02 - Word Values Part II - taken to a real board:
+# find the best scoring placements of a rack on a 15x15 Scrabble board.
+# Moves are generated with the Appel & Jacobson algorithm on top of a
+# DAWG (minimal acyclic word graph) of the DICTIONARY.
+
+from collections import Counter, namedtuple
+from functools import lru_cache
+import random
+import sys
+import time
+
+from data import DICTIONARY, LETTER_SCORES, POUCH
+
+SIZE = 15
+CENTER = SIZE // 2
+RACK_SIZE = 7
+BINGO_BONUS = 50
+BLANK = '?'  # played blanks are stored on the board as lowercase letters
+ACROSS, DOWN = 'across', 'down'
+NUM_GAMES = 10
+
+# T = triple word, D = double word, t = triple letter, d = double letter
+LAYOUT = '''
+T..d...T...d..T
+.D...t...t...D.
+..D...d.d...D..
+d..D...d...D..d
+....D.....D....
+.t...t...t...t.
+..d...d.d...d..
+T..d...D...d..T
+..d...d.d...d..
+.t...t...t...t.
+....D.....D....
+d..D...d...D..d
+..D...d.d...D..
+.D...t...t...D.
+T..d...T...d..T
+'''.split()
+PREMIUMS = {'T': (1, 3), 'D': (1, 2), 't': (3, 1), 'd': (2, 1), '.': (1, 1)}
+# (letter multiplier, word multiplier) per square, for across and down
+MULTIPLIERS = [[PREMIUMS[square] for square in row] for row in LAYOUT]
+MULTIPLIERS_DOWN = [list(col) for col in zip(*MULTIPLIERS)]
+
+Move = namedtuple('Move', 'word row col direction score tiles')
+
+
+def tile_value(letter):
+    """Blanks (lowercase letters) are worth nothing"""
+    return 0 if letter.islower() else LETTER_SCORES[letter]
+
+
+class DawgNode:
+    __slots__ = ('final', 'edges')
+
+    def __init__(self):
+        self.final = False
+        self.edges = {}
+
+    def key(self):
+        """Nodes with equal keys accept the same suffixes so can be shared,
+        children are already minimized so their identity is enough"""
+        return self.final, tuple(sorted((letter, id(child))
+                                        for letter, child in self.edges.items()))
+
+
+class Dawg:
+    """Minimal acyclic word graph, built incrementally from sorted words
+    (Daciuk et al. 2000) so the full trie never lives in memory"""
+
+    def __init__(self, words=()):
+        self.root = DawgNode()
+        self._previous = ''
+        self._unchecked = []  # (parent, letter, child) not yet minimized
+        self._minimized = {}
+        for word in sorted(set(words)):
+            self.insert(word)
+        self.finish()
+
+    def insert(self, word):
+        if word <= self._previous:
+            raise ValueError('Words must be inserted in sorted order')
+        common = 0
+        for a, b in zip(word, self._previous):
+            if a != b:
+                break
+            common += 1
+        self._minimize(common)
+        node = self._unchecked[-1][2] if self._unchecked else self.root
+        for letter in word[common:]:
+            child = DawgNode()
+            node.edges[letter] = child
+            self._unchecked.append((node, letter, child))
+            node = child
+        node.final = True
+        self._previous = word
+
+    def finish(self):
+        self._minimize(0)
+        self._minimized.clear()
+
+    def _minimize(self, down_to):
+        while len(self._unchecked) > down_to:
+            parent, letter, child = self._unchecked.pop()
+            key = child.key()
+            if key in self._minimized:
+                parent.edges[letter] = self._minimized[key]
+            else:
+                self._minimized[key] = child
+
+    def walk(self, letters, node=None):
+        """Follow letters from node (default root), None if we fall off"""
+        node = self.root if node is None else node
+        for letter in letters:
+            node = node.edges.get(letter.upper())
+            if node is None:
+                return None
+        return node
+
+    def __contains__(self, word):
+        node = self.walk(word)
+        return node is not None and node.final
+
+
+@lru_cache(maxsize=None)
+def get_dawg():
+    """Dawg of the playable (2 to SIZE letters, a-z only) DICTIONARY words"""
+    return Dawg(word.upper() for word in DICTIONARY
+                if 2 <= len(word) <= SIZE and word.isascii() and word.isalpha())
+
+
+class Board:
+
+    def __init__(self):
+        self.grid = [[None] * SIZE for _ in range(SIZE)]
+
+    def __str__(self):
+        return '\n'.join(' '.join(square or '.' for square in row)
+                         for row in self.grid)
+
+    def is_empty(self):
+        return all(square is None for row in self.grid for square in row)
+
+    def place(self, move):
+        for row, col, letter in move.tiles:
+            self.grid[row][col] = letter
+
+
+class MoveGenerator:
+
+    def __init__(self, dawg=None):
+        self.dawg = get_dawg() if dawg is None else dawg
+
+    def best_move(self, board, rack):
+        """Highest scoring Move or None if there is no legal move"""
+        moves = self.generate(board, rack)
+        return moves[0] if moves else None
+
+    def generate(self, board, rack):
+        """All legal moves for rack (letters, BLANK for a blank tile)
+        on board, highest score first"""
+        rack = Counter(letter if letter == BLANK else letter.upper()
+                       for letter in rack)
+        empty = board.is_empty()
+        transposed = [list(col) for col in zip(*board.grid)]
+        directions = [(board.grid, MULTIPLIERS, ACROSS),
+                      (transposed, MULTIPLIERS_DOWN, DOWN)]
+        if empty:  # the board is symmetric, down moves would mirror these
+            directions.pop()
+        moves = {}
+        for rows, multipliers, direction in directions:
+            for r in range(SIZE):
+                for move in self._generate_row(rows, r, multipliers, rack,
+                                               direction, empty):
+                    # a single tile can be found both across and down
+                    moves.setdefault(frozenset(move.tiles), move)
+        return sorted(moves.values(),
+                      key=lambda m: (-m.score, m.word, m.row, m.col))
+
+    def _cross_checks(self, rows, r):
+        """For each empty square of row r: the letters allowed there by
+        the tiles above/below it (None = anything) and their value"""
+        checks, cross_values = [None] * SIZE, [None] * SIZE
+        for c in range(SIZE):
+            if rows[r][c] is not None:
+                continue
+            above, i = [], r - 1
+            while i >= 0 and rows[i][c] is not None:
+                above.insert(0, rows[i][c])
+                i -= 1
+            below, i = [], r + 1
+            while i < SIZE and rows[i][c] is not None:
+                below.append(rows[i][c])
+                i += 1
+            if not above and not below:
+                continue
+            allowed = set()
+            node = self.dawg.walk(above)
+            if node is not None:
+                for letter, child in node.edges.items():
+                    end = self.dawg.walk(below, child)
+                    if end is not None and end.final:
+                        allowed.add(letter)
+            checks[c] = allowed
+            cross_values[c] = sum(map(tile_value, above + below))
+        return checks, cross_values
+
+    def _anchors(self, rows, r, empty):
+        """Empty squares next to a tile, only the center on an empty board"""
+        if empty:
+            return [CENTER] if r == CENTER else []
+        row = rows[r]
+        return [c for c in range(SIZE) if row[c] is None and (
+                (c > 0 and row[c - 1] is not None) or
+                (c < SIZE - 1 and row[c + 1] is not None) or
+                (r > 0 and rows[r - 1][c] is not None) or
+                (r < SIZE - 1 and rows[r + 1][c] is not None))]
+
+    def _generate_row(self, rows, r, multipliers, rack, direction, empty):
+        anchors = self._anchors(rows, r, empty)
+        if not anchors:
+            return []
+        row = rows[r]
+        checks, cross_values = self._cross_checks(rows, r)
+        root = self.dawg.root
+        moves = []
+
+        def score(word, end):
+            total = cross_total = placed = 0
+            word_multiplier = 1
+            for c, letter in enumerate(word, end - len(word)):
+                value = tile_value(letter)
+                if row[c] is not None:  # premiums only count for new tiles
+                    total += value
+                    continue
+                placed += 1
+                letter_mult, word_mult = multipliers[r][c]
+                total += value * letter_mult
+                word_multiplier *= word_mult
+                if cross_values[c] is not None:
+                    cross_total += (cross_values[c] +
+                                    value * letter_mult) * word_mult
+            bonus = BINGO_BONUS if placed == RACK_SIZE else 0
+            return total * word_multiplier + cross_total + bonus
+
+        def record(word, end):
+            start = end - len(word)
+            if direction == ACROSS:
+                tiles = tuple((r, c, letter) for c, letter
+                              in enumerate(word, start) if row[c] is None)
+                move_row, move_col = r, start
+            else:
+                tiles = tuple((c, r, letter) for c, letter
+                              in enumerate(word, start) if row[c] is None)
+                move_row, move_col = start, r
+            moves.append(Move(''.join(word).upper(), move_row, move_col,
+                              direction, score(word, end), tiles))
+
+        def play(letter, node, arg, word, anchor, then):
+            """Try letter from the rack as a real tile and as a blank,
+            continuing the search with then(node, arg, word, anchor)"""
+            for tile in (letter, BLANK):
+                if rack[tile]:
+                    rack[tile] -= 1
+                    word.append(letter if tile != BLANK else letter.lower())
+                    then(node, arg, word, anchor)
+                    word.pop()
+                    rack[tile] += 1
+
+        def extend_right(node, col, word, anchor):
+            if col < SIZE and row[col] is not None:
+                child = node.edges.get(row[col].upper())
+                if child is not None:
+                    word.append(row[col])
+                    extend_right(child, col + 1, word, anchor)
+                    word.pop()
+                return
+            if node.final and col > anchor and len(word) > 1:
+                record(word, col)
+            if col == SIZE:
+                return
+            allowed = checks[col]
+            for letter, child in node.edges.items():
+                if allowed is None or letter in allowed:
+                    play(letter, child, col + 1, word, anchor, extend_right)
+
+        def left_part(node, limit, word, anchor):
+            extend_right(node, anchor, word, anchor)
+            if limit:
+                for letter, child in node.edges.items():
+                    play(letter, child, limit - 1, word, anchor, left_part)
+
+        anchor_set = set(anchors)
+        for anchor in anchors:
+            if anchor > 0 and row[anchor - 1] is not None:
+                # left part is fixed: the tiles already on the board
+                start = anchor - 1
+                while start > 0 and row[start - 1] is not None:
+                    start -= 1
+                node = self.dawg.walk(row[start:anchor])
+                if node is not None:
+                    extend_right(node, anchor, list(row[start:anchor]), anchor)
+                continue
+            limit, c = 0, anchor - 1
+            while c >= 0 and row[c] is None and c not in anchor_set \
+                    and limit < RACK_SIZE - 1:
+                limit += 1
+                c -= 1
+            left_part(root, limit, [], anchor)
+        return moves
+
+
+def play_game(generator, num_players=2, rng=random):
+    """Let num_players greedy AIs play a game, return their scores"""
+    bag = list(POUCH)
+    rng.shuffle(bag)
+    racks = [[bag.pop() for _ in range(RACK_SIZE)] for _ in range(num_players)]
+    scores = [0] * num_players
+    board = Board()
+    passes = player = 0
+    while passes < num_players:
+        rack = racks[player]
+        move = generator.best_move(board, rack)
+        if move is None:
+            passes += 1
+        else:
+            passes = 0
+            board.place(move)
+            scores[player] += move.score
+            for _, _, letter in move.tiles:
+                rack.remove(BLANK if letter.islower() else letter)
+            while bag and len(rack) < RACK_SIZE:
+                rack.append(bag.pop())
+            if not rack:
+                break
+        player = (player + 1) % num_players
+    return scores
+
+
+if __name__ == "__main__":
+    num_games = int(sys.argv[1]) if len(sys.argv) > 1 else NUM_GAMES
+
+    start = time.perf_counter()
+    generator = MoveGenerator()
+    print('Built DAWG in {:.1f}s'.format(time.perf_counter() - start))
+
+    start = time.perf_counter()
+    for _ in range(num_games):
+        print('Scores: {}'.format(play_game(generator)))
+    duration = time.perf_counter() - start
+    print('{} games in {:.1f}s ({:.2f} games/sec)'.format(
+        num_games, duration, num_games / duration))
@@ -1,9 +1,11 @@
 import itertools
 import unittest
 
+from data import DICTIONARY
+
 from game import draw_letters, calc_word_value, max_word_value
 from game import get_possible_dict_words, _get_permutations_draw
-from game import _validation
+from game import _validation, BLANK
 
 NUM_LETTERS = 7
 TEST_WORDS = ('bob', 'julian', 'pybites', 'quit', 'barbeque')
@@ -38,6 +40,22 @@ class TestGame(unittest.TestCase):
         self.fixed_draw = list('garytev'.upper())
         words = get_possible_dict_words(self.fixed_draw)
         self.assertEqual(len(words), 137)
+        permutations = (''.join(p).lower()
+                        for p in _get_permutations_draw(self.fixed_draw))
+        self.assertEqual(set(words), set(permutations) & DICTIONARY)
+
+    def test_get_possible_dict_words_ranked(self):
+        words = get_possible_dict_words(list('garytev'.upper()))
+        self.assertEqual(words[0], 'garvey')
+        values = [calc_word_value(word) for word in words]
+        self.assertEqual(values, sorted(values, reverse=True))
+
+    def test_get_possible_dict_words_blank(self):
+        words = get_possible_dict_words(list('QUI') + [BLANK])
+        self.assertIn('quiz', words)
+        self.assertIn('quit', words)
+        self.assertIn('qua', words)
+        self.assertEqual(len(words), len(set(words)))
 
     def test_validation(self):
         letters = list('garytev'.upper())
@@ -0,0 +1,61 @@
+import unittest
+
+from movegen import Board, Dawg, Move, MoveGenerator, play_game
+from movegen import ACROSS, BLANK, CENTER
+
+WORDS = ('CAT', 'CATS', 'AT', 'TA', 'ACT', 'SCAT', 'AS')
+
+
+class TestMoveGen(unittest.TestCase):
+
+    def setUp(self):
+        self.dawg = Dawg(WORDS)
+        self.generator = MoveGenerator(self.dawg)
+        self.board = Board()
+        self.board.place(Move('CAT', CENTER, CENTER - 1, ACROSS, 10,
+                              ((CENTER, CENTER - 1, 'C'), (CENTER, CENTER, 'A'),
+                               (CENTER, CENTER + 1, 'T'))))
+
+    def test_dawg(self):
+        for word in WORDS:
+            self.assertIn(word, self.dawg)
+        self.assertNotIn('CA', self.dawg)
+        self.assertNotIn('CATSS', self.dawg)
+        self.assertRaises(ValueError, self.dawg.insert, 'AA')
+
+    def test_empty_board(self):
+        moves = self.generator.generate(Board(), 'CAT')
+        self.assertTrue(moves)
+        for move in moves:
+            self.assertIn((CENTER, CENTER), [(r, c) for r, c, _ in move.tiles])
+        self.assertEqual(moves[0].score, 10)  # center is a double word
+
+    def test_hooks_and_cross_words(self):
+        moves = self.generator.generate(self.board, 'S')
+        self.assertEqual(sorted(move.word for move in moves),
+                         ['AS', 'CATS', 'SCAT'])
+        scores = {move.word: move.score for move in moves}
+        self.assertEqual(scores, {'CATS': 6, 'SCAT': 6, 'AS': 2})
+
+    def test_blank(self):
+        moves = self.generator.generate(self.board, BLANK)
+        cats = [move for move in moves if move.word == 'CATS']
+        self.assertEqual(len(cats), 1)
+        self.assertEqual(cats[0].score, 5)
+        self.assertEqual(cats[0].tiles, ((CENTER, CENTER + 2, 's'),))
+
+    def test_no_moves(self):
+        self.assertEqual(self.generator.generate(self.board, 'QZ'), [])
+        self.assertIsNone(self.generator.best_move(self.board, ''))
+
+    def test_dictionary(self):
+        generator = MoveGenerator()
+        move = generator.best_move(Board(), 'GARYTEV')
+        self.assertEqual((move.word, move.score), ('GARVEY', 34))
+        scores = play_game(generator)
+        self.assertEqual(len(scores), 2)
+        self.assertTrue(all(score > 0 for score in scores))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,38 @@
+'''Time get_similarities on synthetic tags (see test_tags.py) of growing
+size, against the original scoring every pair with the same first
+letter on the smallest'''
+from difflib import SequenceMatcher
+from itertools import combinations
+from timeit import repeat
+
+from tags import IDENTICAL, SIMILAR, get_similarities
+from test_tags import synthetic_tags
+
+SIZES = (1000, 10000, 30000)
+NUMBER = 1
+REPEAT = 3
+
+
+def bench(label, func, baseline=None):
+    best = min(repeat(func, number=NUMBER, repeat=REPEAT)) / NUMBER
+    speedup = '' if baseline is None else ' ({:.1f}x)'.format(baseline / best)
+    print('{:<32} {:>8.1f} ms{}'.format(label, best * 1000, speedup))
+    return best
+
+
+def all_pairs(tags):
+    return [pair for pair in combinations(sorted(tags), 2)
+            if pair[0][0] == pair[1][0] and
+            SIMILAR < SequenceMatcher(None, *pair).ratio() < IDENTICAL]
+
+
+if __name__ == "__main__":
+    tags, _ = synthetic_tags(SIZES[0])
+    assert set(get_similarities(tags)) == set(all_pairs(tags))
+    baseline = bench('all pairs, {} tags'.format(SIZES[0]),
+                     lambda: all_pairs(tags))
+    for size in SIZES:
+        tags, _ = synthetic_tags(size)
+        bench('get_similarities, {} tags'.format(size),
+              lambda: list(get_similarities(tags)),
+              baseline if size == SIZES[0] else None)
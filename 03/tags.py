@@ -1,48 +1,207 @@
-from collections import Counter
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from difflib import SequenceMatcher
-from itertools import product
+from functools import lru_cache, partial
+from glob import glob
+from itertools import chain
+import os
 import re
+import sys
 
 REPLACE_CHARS = str.maketrans('-', ' ')
 IDENTICAL = 1.0
 TOP_NUMBER = 10
 RSS_FEED = 'rss.xml'
+FEED_PATTERN = '*.xml'
 SIMILAR = 0.87
 TAG_HTML = re.compile(r'<category>([^<]+)</category>')
+CHUNK_SIZE = 64 * 1024
+MAX_TAG_LENGTH = 1024  # longer <category> elements split over chunks are lost
 
 
 def get_tags():
     """Find all tags (TAG_HTML) in RSS_FEED.
     Replace dash with whitespace (REPLACE_CHARS)"""
-    with open(RSS_FEED) as f:
-        tags = TAG_HTML.findall(f.read().lower())
-    return [tag.translate(REPLACE_CHARS) for tag in tags]
+    return list(iter_tags(RSS_FEED))
+
+
+def iter_tags(*feeds, chunk_size=CHUNK_SIZE):
+    """Lazily yield the tags of one or more feeds (files or directories
+    of FEED_PATTERN files), reading them chunk_size characters at a time
+    so memory stays flat however big the feeds are"""
+    for feed in _get_feed_files(feeds):
+        yield from _iter_feed_tags(feed, chunk_size)
+
+
+def _get_feed_files(feeds):
+    for feed in feeds:
+        if os.path.isdir(feed):
+            yield from sorted(glob(os.path.join(feed, FEED_PATTERN)))
+        else:
+            yield feed
+
+
+def _iter_feed_tags(feed, chunk_size):
+    carry = ''
+    with open(feed) as f:
+        for chunk in iter(partial(f.read, chunk_size), ''):
+            buf = carry + chunk.lower()
+            end = 0
+            for m in TAG_HTML.finditer(buf):
+                yield m.group(1).translate(REPLACE_CHARS)
+                end = m.end()
+            # only a tag starting in this tail can still end in the next chunk
+            carry = buf[max(end, len(buf) - MAX_TAG_LENGTH):]
 
 
 def get_top_tags(tags):
-    """Get the TOP_NUMBER of most common tags"""
+    """Get the TOP_NUMBER of most common tags, tags can be any iterable
+    (e.g. iter_tags of many feeds) or a Counter of already counted tags"""
     return Counter(tags).most_common(TOP_NUMBER)
 
 
-def get_similarities(tags):
-    """Find set of tags pairs with similarity ratio of > SIMILAR"""
-    for pair in product(tags, tags):
-        # performance enhancements 1.992s -> 0.144s
-        if pair[0][0] != pair[1][0]:
-            continue
-        pair = tuple(sorted(pair))  # set needs hashable type
-        similarity = SequenceMatcher(None, *pair).ratio()
-        if SIMILAR < similarity < IDENTICAL:
-            yield pair
+def get_similarities(tags, workers=None):
+    """Find set of tags pairs with similarity ratio of > SIMILAR.
+    Only plausible pairs of distinct tags are scored (see
+    _get_similar_pairs), tags starting with a different letter are
+    never similar so each letter can be handled by a pool of workers"""
+    groups = defaultdict(set)
+    for tag in tags:
+        if tag:
+            groups[tag[0]].add(tag)
+    groups = [groups[letter] for letter in sorted(groups)]
+    if workers:
+        with ProcessPoolExecutor(workers) as pool:
+            for pairs in pool.map(_get_similar_pairs, groups):
+                yield from pairs
+    else:
+        for pairs in map(_get_similar_pairs, groups):
+            yield from pairs
+
+
+def _get_similar_pairs(tags):
+    """Return sorted pairs of tags that are > SIMILAR, only running the
+    full SequenceMatcher on candidate pairs:
+    - ratio = 2 * matches / total length, so the shorter tag has to be
+      long enough: 2 * len(a) / (len(a) + len(b)) > SIMILAR
+    - they share enough bigrams (_min_shared_bigrams), found by only
+      indexing the rarest bigrams of each tag (prefix filtering), two
+      of which have to be shared when more than one is needed
+    - no more characters of either are missing from the other than it
+      can leave unmatched
+    - SequenceMatcher's cheap upper bound (quick_ratio) is > SIMILAR"""
+    tags = sorted(tags, key=lambda t: (len(t), t))
+    bigrams = {tag: _bigrams(tag) for tag in tags}
+    chars = {tag: frozenset(tag) for tag in tags}
+    frequency = Counter(chain.from_iterable(bigrams.values()))
+    rank = {bigram: i for i, (bigram, _) in enumerate(
+            sorted(frequency.items(), key=lambda item: (item[1], item[0])))}
+    index = defaultdict(lambda: defaultdict(set))  # length -> bigram -> tags
+    similar = []
+    for tag in tags:
+        # two tags sharing >= n bigrams share two of their len - n + 2
+        # rarest ones, n being the least any pairing of theirs needs
+        shared = bigrams[tag]
+        own_chars = chars[tag]
+        rarest = sorted(shared, key=rank.__getitem__)
+        for length, min_shared, probed, missing, other_missing in \
+                _probes(len(tag)):
+            postings = index.get(length)
+            if not postings:
+                continue
+            seen, candidates = set(), set()
+            for bigram in rarest[:probed]:
+                tags_with = postings.get(bigram)
+                if tags_with:
+                    if min_shared > 1:
+                        candidates |= seen & tags_with
+                        seen |= tags_with
+                    else:
+                        candidates |= tags_with
+            for other in candidates:
+                if len(chars[other] - own_chars) > other_missing or \
+                        len(own_chars - chars[other]) > missing or \
+                        len(bigrams[other] & shared) < min_shared:
+                    continue
+                pair = (other, tag) if other < tag else (tag, other)
+                matcher = SequenceMatcher(None, *pair)
+                if matcher.quick_ratio() > SIMILAR and \
+                        SIMILAR < matcher.ratio() < IDENTICAL:
+                    similar.append(pair)
+        least = _least_shared_bigrams(len(tag))
+        indexed = len(rarest) - least + min(2, least)
+        postings = index[len(tag)]
+        for bigram in rarest[:max(0, indexed)]:
+            postings[bigram].add(tag)
+    return similar
+
+
+def _bigrams(tag):
+    """Set of bigrams of tag, repeats get a number so they all count"""
+    bigrams = [tag[i:i + 2] for i in range(len(tag) - 1)]
+    unique = frozenset(bigrams)
+    if len(unique) == len(bigrams):
+        return unique
+    seen = set()
+    for bigram in bigrams:
+        while bigram in seen:
+            bigram += '+'
+        seen.add(bigram)
+    return frozenset(seen)
+
+
+@lru_cache(maxsize=None)
+def _shorter_lengths(length):
+    """Lengths (up to length) a tag can have to be > SIMILAR to a tag of
+    length: 2 * shorter / (shorter + length) > SIMILAR"""
+    return [other for other in range(1, length + 1)
+            if 2 * other > SIMILAR * (other + length)]
+
+
+@lru_cache(maxsize=None)
+def _probes(length):
+    """(length, bigrams to share, bigrams to probe, characters left
+    unmatched in the tag and in the other) of each length a tag can have
+    to be > SIMILAR to a tag of length"""
+    probes = []
+    for other in _shorter_lengths(length):
+        min_shared = _min_shared_bigrams(other, length)
+        matches = _min_matches(other, length)
+        probes.append((other, min_shared,
+                       max(0, length - 1 - min_shared + min(2, min_shared)),
+                       length - matches, other - matches))
+    return probes
+
+
+@lru_cache(maxsize=None)
+def _least_shared_bigrams(length):
+    """Fewest bigrams a tag of length has to share with any (not
+    shorter) tag that is long enough to be > SIMILAR to it"""
+    lengths = range(length, int(length * (2 - SIMILAR) / SIMILAR) + 2)
+    return min(_min_shared_bigrams(length, other) for other in lengths)
+
+
+def _min_matches(len_a, len_b):
+    """ratio = 2 * M / T > SIMILAR needs M matching characters"""
+    return int(SIMILAR * (len_a + len_b) / 2) + 1
+
+
+def _min_shared_bigrams(len_a, len_b):
+    """The M (_min_matches) matching characters come in k blocks, each
+    gap between blocks costs an unmatched character so k <= T - 2M + 1
+    and the blocks hold M - k >= 3M - T - 1 bigrams"""
+    total = len_a + len_b
+    return max(1, 3 * _min_matches(len_a, len_b) - total - 1)
 
 
 if __name__ == "__main__":
-    tags = get_tags()
-    top_tags = get_top_tags(tags)
+    feeds = sys.argv[1:] or [RSS_FEED]
+    tag_counts = Counter(iter_tags(*feeds))
+    top_tags = get_top_tags(tag_counts)
     print('* Top {} tags:'.format(TOP_NUMBER))
     for tag, count in top_tags:
         print('{:<20} {}'.format(tag, count))
-    similar_tags = dict(get_similarities(tags))
+    similar_tags = dict(get_similarities(list(tag_counts)))
     print()
     print('* Similar tags:')
     for singular, plural in similar_tags.items():
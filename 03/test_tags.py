@@ -1,11 +1,15 @@
+from difflib import SequenceMatcher
+import random
 import re
 import unittest
+from unittest import mock
 
-from tags import get_tags, get_top_tags
-from tags import get_similarities, TOP_NUMBER
+from tags import get_tags, get_top_tags, iter_tags
+from tags import get_similarities, TOP_NUMBER, RSS_FEED
 
 TAG_COUNT = re.compile(r'">([^<]+)</a>\s\((\d+)\)<')
 TAGS = 'tags.html'
+SYNTHETIC_TAGS = 30000  # timed in bench_tags.py
 
 
 def parse_tags_html():
@@ -18,6 +22,35 @@ def parse_tags_html():
                 yield m.groups()[0], int(m.groups()[1])
 
 
+def synthetic_tags(count, seed=0):
+    '''count random tags of 3 to 14 (English-ish frequency) letters, one in
+    five followed by a plural, a deletion or an insertion of itself'''
+    rng = random.Random(seed)
+    letters = 'etaoinshrdlucmfwypvbgkjqxz'
+    weights = range(len(letters), 0, -1)
+    tags = set()
+    variants = []
+    while len(tags) < count:
+        tag = ''.join(rng.choices(letters, weights, k=rng.randint(3, 14)))
+        tags.add(tag)
+        if rng.random() < 0.2:
+            i = rng.randrange(len(tag))
+            variant = rng.choice([tag + 's', tag[:i] + tag[i + 1:],
+                                  tag[:i] + rng.choice(letters) + tag[i:]])
+            tags.add(variant)
+            variants.append(tuple(sorted((tag, variant))))
+    return sorted(tags), variants
+
+
+class CountingMatcher(SequenceMatcher):
+    ''' SequenceMatcher counting the pairs it gets to score '''
+    pairs = 0
+
+    def __init__(self, *args, **kwargs):
+        type(self).pairs += 1
+        super().__init__(*args, **kwargs)
+
+
 class test_tags(unittest.TestCase):
 
     def setUp(self):
@@ -36,6 +69,17 @@ class test_tags(unittest.TestCase):
         for tag in top_tags:
             self.assertIn(tag, pybites_tags.items())
 
+    def test_iter_tags_chunked(self):
+        for chunk_size in (7, 100, 4096):
+            tags = iter_tags(RSS_FEED, chunk_size=chunk_size)
+            self.assertEqual(list(tags), self.tags)
+
+    def test_iter_tags_multiple_feeds(self):
+        tags = iter_tags(RSS_FEED, 'all.rss.xml', '.')  # . has both feeds
+        top_tags = dict(get_top_tags(tags))
+        self.assertEqual(len(top_tags), TOP_NUMBER)
+        self.assertEqual(top_tags['python'], 4 * 10)
+
     def test_get_similarities(self):
         similar_tags = dict(get_similarities(self.tags)).items()
         self.assertEqual(len(similar_tags), 3)
@@ -43,6 +87,31 @@ class test_tags(unittest.TestCase):
         self.assertIn(('challenge', 'challenges'), similar_tags)
         self.assertIn(('generator', 'generators'), similar_tags)
 
+    def test_get_similarities_workers(self):
+        similar_tags = set(get_similarities(self.tags))
+        self.assertEqual(set(get_similarities(self.tags, workers=2)),
+                         similar_tags)
+
+    def test_get_similarities_pairs(self):
+        tags = ['abcdefgh', 'xabcdefgh', 'abcdefghx', 'abcdxefgh', 'hgfedcba',
+                'abcdefgh', 'bcdefgha', 'zz', 'z']
+        similar_tags = set(get_similarities(tags))
+        self.assertEqual(similar_tags, {('abcdefgh', 'abcdefghx'),
+                                        ('abcdefgh', 'abcdxefgh'),
+                                        ('abcdefghx', 'abcdxefgh')})
+
+    def test_get_similarities_candidates(self):
+        tags, variants = synthetic_tags(SYNTHETIC_TAGS)
+        CountingMatcher.pairs = 0
+        with mock.patch('tags.SequenceMatcher', CountingMatcher):
+            similar_tags = set(get_similarities(tags))
+        # of the ~450 million pairs, the filters leave about as many to
+        # score as there are similar ones (~4500 for ~4300)
+        self.assertLess(CountingMatcher.pairs, 2 * len(similar_tags))
+        for tag, variant in variants:
+            if len(tag) > 5 and tag[0] == variant[0]:  # ratio > 0.87
+                self.assertIn((tag, variant), similar_tags)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,229 @@
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from http.client import HTTPException
+import json
+import os
+import random
+import sys
+import threading
+import time
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+from rate_limit import TokenBucket, parse_retry_after
+from tweet_archive import PAGE_SIZE, TweetArchive
+
+API_URL = 'https://api.twitter.com/1.1'
+DEST_DIR = 'data'
+CHECKPOINT = '.harvest.json'
+WORKERS = 8
+# requests per window (seconds) per endpoint, app auth limits
+RATE_LIMITS = {'user_timeline': (1500, 15 * 60)}
+MAX_RETRIES = 5
+BACKOFF = 1  # seconds, doubled on every retry
+MAX_BACKOFF = 60
+TIMEOUT = 30
+TWITTER_DATE = '%a %b %d %H:%M:%S %z %Y'
+
+Status = namedtuple('Status', 'id_str created_at text')
+
+
+class TimelineError(Exception):
+    """A failed request, status is the HTTP status of the answer (None
+    if there was none) and retry_after is set (seconds) if the server
+    told us when to try again"""
+
+    def __init__(self, message, retry_after=None, status=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.status = status
+
+
+class HttpTimelineAPI(object):
+    """Minimal user_timeline client for the v1.1 REST API (app auth
+    bearer token), or a server mimicking it"""
+
+    def __init__(self, base_url=API_URL, bearer_token=None, timeout=TIMEOUT):
+        self.base_url = base_url.rstrip('/')
+        self.bearer_token = bearer_token
+        self.timeout = timeout
+
+    def user_timeline(self, screen_name, count=20, since_id=None, max_id=None):
+        params = {'screen_name': screen_name, 'count': count,
+                  'since_id': since_id, 'max_id': max_id, 'trim_user': 1}
+        url = '{}/statuses/user_timeline.json?{}'.format(
+            self.base_url,
+            urlencode({k: v for k, v in params.items() if v is not None}))
+        request = Request(url)
+        if self.bearer_token:
+            request.add_header('Authorization',
+                               'Bearer {}'.format(self.bearer_token))
+        status = None
+        try:
+            with urlopen(request, timeout=self.timeout) as response:
+                status = response.status
+                statuses = json.load(response)
+        except HTTPError as exc:
+            raise TimelineError('{} for {}'.format(exc.code, screen_name),
+                                _retry_after(exc.headers), exc.code) from exc
+        except (URLError, OSError, HTTPException) as exc:
+            raise TimelineError('{} for {}'.format(exc, screen_name)) from exc
+        except ValueError as exc:  # an answer, but not the json we want
+            raise TimelineError('{} for {}'.format(exc, screen_name),
+                                status=status) from exc
+        return [Status(s['id_str'], _parse_date(s['created_at']),
+                       s.get('full_text', s.get('text', '')))
+                for s in statuses]
+
+
+def _parse_date(created_at):
+    """Naive UTC datetime, like tweepy gives us"""
+    date = datetime.strptime(created_at, TWITTER_DATE)
+    return date.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _retry_after(headers):
+    """Seconds to wait according to Retry-After or x-rate-limit-reset"""
+    if headers.get('Retry-After'):
+        return parse_retry_after(headers['Retry-After'])
+    try:
+        if headers.get('x-rate-limit-reset'):
+            return max(0.0, float(headers['x-rate-limit-reset']) - time.time())
+    except ValueError:
+        pass
+    return None
+
+
+def is_retryable(exc):
+    """Only rate limiting (429), server errors (5xx) and connection
+    errors (no status) are worth another try, a 401, 403 or 404 stays
+    one. tweepy errors carry their status in the response"""
+    status = getattr(exc, 'status', None)
+    if status is None:
+        status = getattr(getattr(exc, 'response', None), 'status_code', None)
+    return status is None or status == 429 or status >= 500
+
+
+class RateLimitedAPI(object):
+    """Wrap an api (tweepy.API, HttpTimelineAPI ..) so each call to an
+    endpoint in limits first takes a token from that endpoint's bucket
+    and retryable failures (is_retryable) get retried with jittered
+    exponential backoff"""
+
+    def __init__(self, api, limits=RATE_LIMITS, max_retries=MAX_RETRIES,
+                 backoff=BACKOFF, retry_on=(TimelineError,),
+                 sleep=time.sleep, rng=random):
+        self.api = api
+        self.buckets = {endpoint: TokenBucket(rate, window, sleep=sleep)
+                        for endpoint, (rate, window) in limits.items()}
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.retry_on = retry_on
+        self.sleep = sleep
+        self.rng = rng
+
+    def __getattr__(self, endpoint):
+        method = getattr(self.api, endpoint)
+        bucket = self.buckets.get(endpoint)
+
+        def call(*args, **kwargs):
+            for attempt in range(self.max_retries + 1):
+                if bucket is not None:
+                    bucket.acquire()
+                try:
+                    return method(*args, **kwargs)
+                except self.retry_on as exc:
+                    if attempt == self.max_retries or not is_retryable(exc):
+                        raise
+                    delay = getattr(exc, 'retry_after', None)
+                    if delay is None:  # "full jitter" backoff
+                        delay = self.rng.uniform(
+                            0, min(MAX_BACKOFF, self.backoff * 2 ** attempt))
+                    self.sleep(delay)
+        return call
+
+
+class Checkpoint(object):
+    """The handles of a harvest that are done, saved after each one so
+    an interrupted run can resume. Removed once all handles are done"""
+
+    def __init__(self, path, handles):
+        self.path = path
+        self.handles = list(handles)
+        self.done = set()
+        self.lock = threading.Lock()
+        try:
+            with open(path) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return
+        if saved.get('handles') == self.handles:  # same run, resume it
+            self.done = set(saved['done'])
+
+    @property
+    def todo(self):
+        return [handle for handle in self.handles if handle not in self.done]
+
+    def mark_done(self, handle):
+        with self.lock:
+            self.done.add(handle)
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w') as f:
+                json.dump({'handles': self.handles,
+                           'done': sorted(self.done)}, f)
+            os.replace(tmp, self.path)
+
+    def finish(self):
+        if not self.todo and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def harvest(handles, api, dest_dir=DEST_DIR, workers=WORKERS,
+            count=PAGE_SIZE, checkpoint=CHECKPOINT):
+    """Archive the new tweets of all handles to dest_dir/<handle>.csv
+    (Tweet._fields columns), fetching up to workers handles at a time
+    through a RateLimitedAPI. Returns {handle: new tweets} and
+    {handle: exception} of the handles that kept failing, they are
+    retried when harvest is called again with the same handles"""
+    os.makedirs(dest_dir, exist_ok=True)
+    if not isinstance(api, RateLimitedAPI):
+        api = RateLimitedAPI(api)
+    progress = Checkpoint(os.path.join(dest_dir, checkpoint), handles)
+
+    def fetch(handle):
+        archive = TweetArchive(os.path.join(dest_dir, handle))
+        new = archive.update(api, handle, count=count)
+        progress.mark_done(handle)
+        return new
+
+    results, errors = {}, {}
+    with ThreadPoolExecutor(workers) as pool:
+        futures = {handle: pool.submit(fetch, handle)
+                   for handle in progress.todo}
+        for handle, future in futures.items():
+            try:
+                results[handle] = future.result()
+            except Exception as exc:
+                errors[handle] = exc
+    progress.finish()
+    return results, errors
+
+
+if __name__ == "__main__":
+    from tweepy import TweepError
+    from usertweets import API
+
+    handles = sys.argv[1:] or ['pybites', 'techmoneykids', 'bbelderbos']
+    start = time.perf_counter()
+    # tweepy wraps the network errors of its requests in TweepError, a
+    # TypeError or AttributeError is a bug and not worth another try
+    api = RateLimitedAPI(API, retry_on=(TweepError, OSError, HTTPException))
+    results, errors = harvest(handles, api)
+    for handle, new in sorted(results.items()):
+        print('{:<20} {:>5} new tweets'.format(handle, new))
+    for handle, exc in sorted(errors.items()):
+        print('{:<20} failed: {}'.format(handle, exc))
+    print('{} handles in {:.1f}s'.format(len(handles),
+                                         time.perf_counter() - start))
@@ -0,0 +1,55 @@
+"""Client side rate limiting of the harvester: a token bucket and the
+Retry-After header of a 429 or 503. The 25 TMDB client has the same in
+its themoviedb package"""
+from datetime import timezone
+from email.utils import parsedate_to_datetime
+import math
+import threading
+import time
+
+
+class TokenBucket(object):
+    """Allow rate calls per window seconds: the bucket holds up to rate
+    tokens, refilled continuously, and acquire() blocks until one is
+    available. Thread safe"""
+
+    def __init__(self, rate, window, clock=time.monotonic, sleep=time.sleep):
+        self.capacity = rate
+        self.fill_rate = rate / window
+        self.tokens = float(rate)
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = self.clock()
+                self.tokens = min(self.capacity, self.tokens +
+                                  (now - self.updated) * self.fill_rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.fill_rate
+            self.sleep(wait)
+
+
+def parse_retry_after(value, now=time.time):
+    """Seconds to wait according to a Retry-After header value, either
+    delay seconds or an HTTP date. None if there is none or it is
+    neither"""
+    if not value:
+        return None
+    try:
+        delay = float(value)
+    except ValueError:
+        try:
+            when = parsedate_to_datetime(value)
+        except (TypeError, ValueError, IndexError):
+            return None
+        if when.tzinfo is None:  # "-0000", but HTTP dates are GMT anyway
+            when = when.replace(tzinfo=timezone.utc)
+        delay = when.timestamp() - now()
+    return max(0.0, delay) if math.isfinite(delay) else None
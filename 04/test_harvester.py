@@ -0,0 +1,214 @@
+import csv
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from urllib.parse import parse_qs, urlparse
+
+from rate_limit import parse_retry_after
+from tweets import TWEETS  # mock data
+from tweet_archive import Tweet, TweetArchive
+from harvester import (HttpTimelineAPI, RateLimitedAPI, TimelineError,
+                       TokenBucket, harvest, CHECKPOINT, TWITTER_DATE)
+
+HANDLES = ['pybites', 'bbelderbos', 'techmoneykids']
+STUB_DATE = TWITTER_DATE.replace('%z', '+0000')  # TWEETS dates are UTC
+
+
+class StubTimelineHandler(BaseHTTPRequestHandler):
+    """Serves TWEETS for every handle in timelines, failures[handle]
+    is the number of 429s to answer before serving it"""
+    timelines = {}
+    failures = {}
+    requests = []
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        handle = query.get('screen_name')
+        self.requests.append(handle)
+        if url.path != '/statuses/user_timeline.json' or \
+                handle not in self.timelines:
+            return self.send_error(404)
+        if self.failures.get(handle):
+            self.failures[handle] -= 1
+            self.send_response(429)
+            self.send_header('Retry-After', '0')
+            return self.end_headers()
+        statuses = [
+            {'id_str': s.id_str, 'text': s.text,
+             'created_at': s.created_at.strftime(STUB_DATE)}
+            for s in self.timelines[handle]
+            if int(s.id_str) > int(query.get('since_id', 0)) and
+            int(s.id_str) <= int(query.get('max_id', 2 ** 64))]
+        body = json.dumps(statuses[:int(query['count'])]).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_rate(self):
+        clock = FakeClock()
+        bucket = TokenBucket(3, 60, clock=clock, sleep=clock.sleep)
+        for _ in range(3):
+            bucket.acquire()
+        self.assertEqual(clock.now, 0)  # a full bucket allows a burst
+        bucket.acquire()
+        self.assertAlmostEqual(clock.now, 20)
+        for _ in range(3):
+            bucket.acquire()
+        self.assertAlmostEqual(clock.now, 80)
+
+
+class TestRetryAfter(unittest.TestCase):
+
+    def test_parse_retry_after(self):
+        now = lambda: 1494590400.0  # Fri, 12 May 2017 12:00:00 GMT
+        self.assertEqual(parse_retry_after('120', now), 120)
+        self.assertEqual(parse_retry_after('1.5', now), 1.5)
+        self.assertEqual(parse_retry_after(
+            'Fri, 12 May 2017 12:00:30 GMT', now), 30)
+        self.assertEqual(parse_retry_after(
+            'Fri, 12 May 2017 11:59:00 GMT', now), 0)  # in the past
+        for value in (None, '', 'soon', 'inf', 'nan'):
+            self.assertIsNone(parse_retry_after(value, now))
+
+
+class TestRateLimitedAPI(unittest.TestCase):
+
+    def test_jittered_retries(self):
+        delays = []
+        calls = []
+
+        class FlakyAPI(object):
+            def user_timeline(self, **kwargs):
+                calls.append(kwargs)
+                if len(calls) < 3:
+                    raise TimelineError('503')
+                return ['ok']
+
+        api = RateLimitedAPI(FlakyAPI(), backoff=1, sleep=delays.append)
+        self.assertEqual(api.user_timeline(screen_name='pybites'), ['ok'])
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(len(delays), 2)
+        self.assertTrue(0 <= delays[0] <= 1 and 0 <= delays[1] <= 2)
+
+        calls.clear()
+        api = RateLimitedAPI(FlakyAPI(), max_retries=1, sleep=delays.append)
+        self.assertRaises(TimelineError, api.user_timeline)
+
+    def test_client_errors_not_retried(self):
+        calls = []
+
+        class Response(object):
+            status_code = 404
+
+        class TweepError(Exception):
+            response = Response()
+
+        class BrokenAPI(object):
+            def user_timeline(self, **kwargs):
+                calls.append(kwargs)
+                raise errors[len(calls) - 1]
+
+        errors = [TimelineError('401', status=401), TweepError('404'),
+                  TimelineError('429', status=429), TimelineError('timeout'),
+                  TweepError('404')]
+        api = RateLimitedAPI(BrokenAPI(), retry_on=(Exception,),
+                             sleep=lambda s: None)
+        self.assertRaises(TimelineError, api.user_timeline)
+        self.assertRaises(TweepError, api.user_timeline)
+        self.assertRaises(TweepError, api.user_timeline)  # after 2 retries
+        self.assertEqual(len(calls), 5)
+
+
+class TestHarvester(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubTimelineHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.api = HttpTimelineAPI('http://127.0.0.1:{}'.format(
+            cls.server.server_port))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        StubTimelineHandler.timelines = {handle: TWEETS for handle in HANDLES}
+        StubTimelineHandler.failures = {}
+        StubTimelineHandler.requests = []
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def harvest(self, **kwargs):
+        api = RateLimitedAPI(self.api, max_retries=2, sleep=lambda s: None)
+        return harvest(HANDLES, api, dest_dir=self.tmp_dir, count=40, **kwargs)
+
+    def test_harvest(self):
+        StubTimelineHandler.failures = {'bbelderbos': 2}
+        results, errors = self.harvest(workers=3)
+        self.assertEqual(results, {handle: 40 for handle in HANDLES})
+        self.assertEqual(errors, {})
+        self.assertEqual(StubTimelineHandler.requests.count('bbelderbos'), 3)
+        self.assertFalse(os.path.exists(os.path.join(self.tmp_dir, CHECKPOINT)))
+
+        archive = TweetArchive(os.path.join(self.tmp_dir, 'pybites'))
+        self.assertEqual(archive[0], Tweet(*TWEETS[0]))
+        with open(archive.csv_file) as f:
+            self.assertEqual(tuple(next(csv.reader(f))), Tweet._fields)
+
+        # a second run costs one request per handle
+        StubTimelineHandler.requests = []
+        results, errors = self.harvest()
+        self.assertEqual(results, {handle: 0 for handle in HANDLES})
+        self.assertEqual(sorted(StubTimelineHandler.requests), sorted(HANDLES))
+
+    def test_resume_after_failure(self):
+        StubTimelineHandler.failures = {'bbelderbos': 10}
+        results, errors = self.harvest()
+        self.assertEqual(list(errors), ['bbelderbos'])
+        self.assertTrue(os.path.exists(os.path.join(self.tmp_dir, CHECKPOINT)))
+
+        StubTimelineHandler.failures = {}
+        StubTimelineHandler.requests = []
+        results, errors = self.harvest()
+        self.assertEqual(results, {'bbelderbos': 40})
+        self.assertEqual(StubTimelineHandler.requests, ['bbelderbos'])
+        self.assertFalse(os.path.exists(os.path.join(self.tmp_dir, CHECKPOINT)))
+
+    def test_not_found_fails_fast(self):
+        del StubTimelineHandler.timelines['techmoneykids']
+        results, errors = self.harvest()
+        self.assertEqual(list(errors), ['techmoneykids'])
+        self.assertEqual(errors['techmoneykids'].status, 404)
+        self.assertEqual(StubTimelineHandler.requests.count('techmoneykids'), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
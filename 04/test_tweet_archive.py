@@ -0,0 +1,115 @@
+from datetime import datetime, timedelta
+import os
+import shutil
+import tempfile
+import unittest
+
+from tweets import TWEETS  # mock data
+from tweet_archive import Tweet, TweetArchive
+
+HANDLE = 'pybites'
+
+
+class FakeTimelineAPI(object):
+    """Local stand-in for tweepy's API.user_timeline, newest first"""
+
+    def __init__(self, statuses=TWEETS):
+        self.statuses = sorted(statuses, key=lambda s: int(s.id_str),
+                               reverse=True)
+        self.deleted = set()  # ids left out of the pages, not the count
+        self.calls = 0
+
+    def tweet(self, text):
+        newest = self.statuses[0]
+        status = Tweet(str(int(newest.id_str) + 1),
+                       newest.created_at + timedelta(minutes=1), text)
+        self.statuses.insert(0, status)
+        return status
+
+    def user_timeline(self, screen_name, count=20, since_id=None, max_id=None):
+        self.calls += 1
+        page = [s for s in self.statuses
+                if (since_id is None or int(s.id_str) > int(since_id)) and
+                (max_id is None or int(s.id_str) <= int(max_id))][:count]
+        return [s for s in page if s.id_str not in self.deleted]
+
+
+class TestTweetArchive(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, HANDLE)
+        self.api = FakeTimelineAPI()
+        self.archive = TweetArchive(self.path)
+        self.archive.update(self.api, HANDLE, count=50)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_first_update_gets_one_page(self):
+        self.assertEqual(self.api.calls, 1)
+        self.assertEqual(len(self.archive), 50)
+        self.assertEqual(self.archive.newest_id, TWEETS[0].id_str)
+
+    def test_served_from_disk_newest_first(self):
+        self.assertEqual(self.archive[0], TWEETS[0])
+        self.assertIsInstance(self.archive[0].created_at, datetime)
+        self.assertEqual(self.archive[-1], TWEETS[49])
+        self.assertEqual(self.archive[:3], list(TWEETS[:3]))
+        self.assertEqual(self.archive.get(TWEETS[10].id_str), TWEETS[10])
+        self.assertIsNone(self.archive.get('1'))
+        with self.assertRaises(IndexError):
+            self.archive[50]
+
+    def test_update_only_fetches_new_tweets(self):
+        self.assertEqual(self.archive.update(self.api, HANDLE, count=50), 0)
+        new = [self.api.tweet('tweet {}'.format(i)) for i in range(3)]
+        self.assertEqual(self.archive.update(self.api, HANDLE, count=50), 3)
+        # one request per update, the ids follow on newest_id
+        self.assertEqual(self.api.calls, 3)
+        self.assertEqual(self.archive[:3], new[::-1])
+
+        archive = TweetArchive(self.path)  # reopened from disk
+        self.assertEqual(len(archive), 53)
+        self.assertEqual(archive.newest_id, new[-1].id_str)
+        self.assertEqual(archive[3], TWEETS[0])
+
+    def test_update_pages_back_to_newest(self):
+        for i in range(120):
+            self.api.tweet('tweet, "with" quotes\r{}'.format(i))
+        self.assertEqual(self.archive.update(self.api, HANDLE, count=50), 120)
+        self.assertEqual(self.api.calls, 4)
+        self.assertEqual(len(self.archive), 170)
+        self.assertEqual(self.archive[0].text, 'tweet, "with" quotes\r119')
+        self.assertEqual(self.archive[120], TWEETS[0])
+
+    def test_update_pages_past_short_pages(self):
+        new = [self.api.tweet('tweet {}'.format(i)) for i in range(120)]
+        # every page comes back short, up to and including the oldest
+        # new tweet, so only an empty page tells there are no more
+        self.api.deleted = {tweet.id_str for tweet in new[::4]}
+        kept = [tweet for tweet in new if tweet.id_str not in self.api.deleted]
+        self.assertEqual(self.archive.update(self.api, HANDLE, count=50), 90)
+        self.assertEqual(self.api.calls, 5)  # 50 + 50 + 20 + 0, less deleted
+        self.assertEqual(self.archive[:90], kept[::-1])
+        self.assertEqual(self.archive[90], TWEETS[0])
+
+    def test_interrupted_append_is_rolled_back(self):
+        with open(self.archive.csv_file, 'a') as f:
+            f.write('1,2017-01-13 09:00:05,half written')
+        with open(self.archive.index_file, 'ab') as f:
+            f.write(b'\x01\x02')
+        archive = TweetArchive(self.path)
+        self.assertEqual(len(archive), 50)
+        self.assertEqual(archive[-1], TWEETS[49])
+        self.assertEqual(archive.update(self.api, HANDLE), 0)
+
+    def test_old_csv_gets_indexed(self):
+        os.remove(self.archive.index_file)
+        archive = TweetArchive(self.path)
+        self.assertEqual(len(archive), 50)
+        self.assertEqual(archive[0], TWEETS[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
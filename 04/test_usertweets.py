@@ -46,13 +46,13 @@ class TestUserTweets(unittest.TestCase):
     def test_read_back_from_cached_csv(self):
         csv_tweets = read_csv(self.user.output_file)
         self.assertEqual(len(csv_tweets), NUM_TWEETS)
-        tw_n = 0  # first
+        tw_n = -1  # newest, the archive gets appended to
         self.assertEqual(csv_tweets[tw_n].id_str, MAX_ID)
         self.assertEqual(csv_tweets[tw_n].created_at,
-                         str(TWEETS[tw_n].created_at))
-        self.assertEqual(csv_tweets[tw_n].text, TWEETS[tw_n].text)
-        tw_n = -1  # last
-        self.assertEqual(csv_tweets[tw_n].text, TWEETS[tw_n].text)
+                         str(TWEETS[0].created_at))
+        self.assertEqual(csv_tweets[tw_n].text, TWEETS[0].text)
+        tw_n = 0  # oldest
+        self.assertEqual(csv_tweets[tw_n].text, TWEETS[-1].text)
 
 
 if __name__ == "__main__":
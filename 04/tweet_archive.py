@@ -0,0 +1,155 @@
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
+import csv
+from datetime import datetime
+import io
+import os
+
+CSV_EXT = 'csv'
+INDEX_EXT = 'idx'
+PAGE_SIZE = 200  # most tweets user_timeline returns per request
+MAX_PAGES = 16  # user_timeline only reaches back 3200 tweets
+
+Tweet = namedtuple('Tweet', 'id_str created_at text')
+
+
+def status_to_tweet(status):
+    return Tweet(status.id_str, status.created_at, status.text.replace('\n', ''))
+
+
+def _parse_date(created_at):
+    try:
+        return datetime.fromisoformat(created_at)
+    except ValueError:
+        return created_at
+
+
+class TweetArchive(object):
+    """Tweets of one handle in <path>.csv (Tweet._fields columns), oldest
+    first and only ever appended to, plus <path>.idx: an array('Q') of
+    (id, end offset) pairs, one per csv row. Only the index lives in
+    memory, tweets are read from the csv when asked for and served
+    newest first, like user_timeline returns them"""
+
+    def __init__(self, path):
+        self.csv_file = '{}.{}'.format(path, CSV_EXT)
+        self.index_file = '{}.{}'.format(path, INDEX_EXT)
+        self._ids = array('Q')
+        self._ends = array('Q')
+        self._start = 0  # offset of the first row, right after the header
+        if not os.path.exists(self.csv_file):
+            self._create()
+        elif not os.path.exists(self.index_file):
+            self._rebuild()  # csv written by the old UserTweets
+        else:
+            self._load()
+
+    def _create(self):
+        with open(self.csv_file, 'w', newline='') as f:
+            csv.writer(f).writerow(Tweet._fields)
+            self._start = f.tell()
+        open(self.index_file, 'wb').close()
+        self._ids, self._ends = array('Q'), array('Q')
+
+    def _rebuild(self):
+        with open(self.csv_file, newline='') as f:
+            rows = list(csv.reader(f))[1:]
+        tweets = {int(row[0]): Tweet(*row) for row in rows if len(row) == 3}
+        self._create()
+        self._append([tweets[id_] for id_ in sorted(tweets)])
+
+    def _load(self):
+        entries = array('Q')
+        with open(self.index_file, 'rb') as f:
+            data = f.read()
+        size = len(data) - len(data) % (2 * entries.itemsize)
+        entries.frombytes(data[:size])
+        self._ids, self._ends = entries[0::2], entries[1::2]
+        with open(self.csv_file, 'rb') as f:
+            self._start = len(f.readline())
+        end = self._ends[-1] if self._ends else self._start
+        csv_size = os.path.getsize(self.csv_file)
+        if csv_size < end:
+            self._rebuild()  # index does not match the csv
+        elif csv_size > end or size < len(data):
+            # an append got interrupted: drop what was not fully indexed
+            os.truncate(self.csv_file, end)
+            os.truncate(self.index_file, size)
+
+    def _append(self, tweets):
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        entries = array('Q')
+        with open(self.csv_file, 'ab') as f:
+            offset = f.tell()
+            for tweet in tweets:
+                writer.writerow(tweet)
+                row = buf.getvalue().encode('utf-8')
+                buf.seek(0)
+                buf.truncate()
+                f.write(row)
+                offset += len(row)
+                entries.extend((int(tweet.id_str), offset))
+        # rows first, so a crash never leaves index entries without a row
+        with open(self.index_file, 'ab') as f:
+            entries.tofile(f)
+        self._ids.extend(entries[0::2])
+        self._ends.extend(entries[1::2])
+
+    @property
+    def newest_id(self):
+        return str(self._ids[-1]) if self._ids else None
+
+    def append(self, tweets):
+        """Archive the tweets newer than newest_id, returns how many"""
+        newest = self._ids[-1] if self._ids else -1
+        new = {int(tweet.id_str): tweet for tweet in tweets
+               if int(tweet.id_str) > newest}
+        self._append([new[id_] for id_ in sorted(new)])
+        return len(new)
+
+    def update(self, api, handle, max_id=None, count=PAGE_SIZE):
+        """Fetch and archive the tweets of handle since newest_id, paging
+        back (max_id) until a page is empty or max_id got to newest_id.
+        A short page is no sign of the end: user_timeline leaves deleted
+        tweets and retweets out of its pages. Without new tweets that is
+        one request. A new archive only gets the latest count tweets
+        (before max_id)"""
+        since_id = self.newest_id
+        statuses = []
+        for _ in range(MAX_PAGES if since_id else 1):
+            page = api.user_timeline(screen_name=handle, count=count,
+                                     since_id=since_id, max_id=max_id)
+            if not page:
+                break
+            statuses.extend(page)
+            max_id = min(int(status.id_str) for status in page) - 1
+            if max_id <= int(since_id or 0):
+                break
+        return self.append(map(status_to_tweet, statuses))
+
+    def _read(self, rows):
+        with open(self.csv_file, 'rb') as f:
+            for row in rows:
+                start = self._ends[row - 1] if row else self._start
+                f.seek(start)
+                line = f.read(self._ends[row] - start).decode('utf-8')
+                id_str, created_at, text = next(csv.reader(io.StringIO(line)))
+                yield Tweet(id_str, _parse_date(created_at), text)
+
+    def get(self, id_str):
+        """The archived Tweet with id_str, or None"""
+        row = bisect_left(self._ids, int(id_str))
+        if row == len(self._ids) or self._ids[row] != int(id_str):
+            return None
+        return next(self._read([row]))
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __getitem__(self, pos):
+        rows = range(len(self) - 1, -1, -1)[pos]  # newest first
+        if isinstance(rows, range):
+            return list(self._read(rows))
+        return next(self._read([rows]))
@@ -1,47 +1,37 @@
-from collections import namedtuple
-import csv
 import os
 
 import tweepy
 
 from config import CONSUMER_KEY, CONSUMER_SECRET
 from config import ACCESS_TOKEN, ACCESS_SECRET
+from tweet_archive import TweetArchive
 
 DEST_DIR = 'data'
-EXT = 'csv'
 NUM_TWEETS = 100
 
 auth = tweepy.OAuthHandler(CONSUMER_KEY, CONSUMER_SECRET)
 auth.set_access_token(ACCESS_TOKEN, ACCESS_SECRET)
 API = tweepy.API(auth)
 
-Tweet = namedtuple('Tweet', 'id_str created_at text')
-
 
 class UserTweets(object):
+    """Tweets of handle, newest first. They are archived in
+    DEST_DIR/<handle>.csv, only fetching what got tweeted since the
+    previous run, and read back lazily from there"""
 
-    def __init__(self, handle, max_id=None):
+    def __init__(self, handle, max_id=None, api=None):
         self.handle = handle
         self.max_id = max_id
-        self.output_file = '{}.{}'.format(os.path.join(DEST_DIR, self.handle), EXT)
-        self._tweets = list(self._get_tweets())
-        self._save_tweets()
-
-    def _get_tweets(self):
-        tweets = API.user_timeline(self.handle, count=NUM_TWEETS, max_id=self.max_id)
-        return (Tweet(s.id_str, s.created_at, s.text.replace('\n', '')) for s in tweets)
-
-    def _save_tweets(self):
-        with open(self.output_file, 'w') as f:
-            writer = csv.writer(f)
-            writer.writerow(Tweet._fields)
-            writer.writerows(self._tweets)
+        self._archive = TweetArchive(os.path.join(DEST_DIR, self.handle))
+        self.output_file = self._archive.csv_file
+        self._archive.update(api or API, handle, max_id=max_id,
+                             count=NUM_TWEETS)
 
     def __len__(self):
-        return len(self._tweets)
+        return len(self._archive)
 
     def __getitem__(self, pos):
-        return self._tweets[pos]
+        return self._archive[pos]
 
 
 if __name__ == "__main__":
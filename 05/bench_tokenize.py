@@ -0,0 +1,46 @@
+'''Compare the old three pass tokenize_text with the single pass
+iter_tokens on a synthetic corpus of NUM_TWEETS tweets'''
+import random
+import sys
+from timeit import repeat
+
+from similar_tweeters import IS_LINK_OBJ, STOPWORDS, iter_tokens
+
+NUM_TWEETS = 1000000
+WORDS_PER_TWEET = 15
+REPEAT = 3
+VOCABULARY = ['python', 'pybites', 'generators', 'about', 'which', 'their',
+              'code', 'is', 'a', 'challenge', '@pybites', '#python',
+              'https://t.co/Nk4s3yL6zL', 'http://pybit.es', 'café',
+              'naïve', 'itertools', 'learning', 'rt', 'tweets']
+
+
+def _is_ascii(w):
+    return all(ord(c) < 128 for c in w)
+
+
+def tokenize_text_three_passes(words):
+    '''tokenize_text as it was'''
+    words = [word for word in words if len(word) > 4 and word not in STOPWORDS]
+    words = [word for word in words if _is_ascii(word)]
+    words = [word for word in words if not IS_LINK_OBJ.search(word)]
+    return words
+
+
+def bench(label, func, baseline=None):
+    best = min(repeat(func, number=1, repeat=REPEAT))
+    speedup = '' if baseline is None else ' ({:.1f}x)'.format(baseline / best)
+    print('{:<32} {:>8.2f} s{}'.format(label, best, speedup))
+    return best
+
+
+if __name__ == "__main__":
+    num_tweets = int(sys.argv[1]) if len(sys.argv) > 1 else NUM_TWEETS
+    rng = random.Random(0)
+    words = rng.choices(VOCABULARY, k=num_tweets * WORDS_PER_TWEET)
+    assert list(iter_tokens(words)) == tokenize_text_three_passes(words)
+
+    print('Tokenizing {} tweets ({} words)\n'.format(num_tweets, len(words)))
+    baseline = bench('three passes (old)',
+                     lambda: tokenize_text_three_passes(words))
+    bench('iter_tokens', lambda: sum(1 for _ in iter_tokens(words)), baseline)
@@ -1,5 +1,7 @@
 import csv
 import glob
+import hashlib
+import json
 import os
 import re
 from string import ascii_lowercase
@@ -11,12 +13,24 @@ from nltk.corpus import stopwords
 from tweet_dumper import get_all_tweets 
 
 CSV = 'data/new/{}.csv'
+MODEL_DIR = 'data/model'
+TOKEN_CACHE = os.path.join(MODEL_DIR, 'tokens', '{}.json')
+STATE = os.path.join(MODEL_DIR, 'state.json')
+DICTIONARY = os.path.join(MODEL_DIR, 'tweets.dict')
+LDA_MODEL = os.path.join(MODEL_DIR, 'tweets.lda')
+SIM_INDEX = os.path.join(MODEL_DIR, 'tweets.index')
+NUM_TOPICS = 5
+PASSES = 15
+# lda.update() only adds documents: a changed user is seen again on top
+# of their old tweets and removed users stay in, so after this many
+# incremental updates the model is trained again from scratch
+MAX_LDA_UPDATES = 5
+# nor can it learn new words, it ignores them until it is trained again,
+# or right away when they are more than this share of the changed tweets
+MAX_NEW_WORDS = 0.05
 IS_LINK_OBJ = re.compile(r'^(?:@|https?://)')
-STOPWORDS = set(stopwords.words('english'))
-
-
-def _is_ascii(w):
-    return all(ord(c) < 128 for c in w)
+STOPWORDS = frozenset(stopwords.words('english'))
+MIN_WORD_LENGTH = 5
 
 
 def _strip_non_ascii(w):
@@ -31,21 +45,164 @@ def get_user_tokens(user):
     tweets_csv = CSV.format(user)
     if not os.path.isfile(tweets_csv):
         get_all_tweets(user)
-    words = []
     with open(tweets_csv) as csvfile:
         reader = csv.DictReader(csvfile)
-        for row in reader:
-            for w in row['text'].lower().split():
-                words.append(w)
-    return tokenize_text(words)
+        return tokenize_text(w for row in reader
+                             for w in row['text'].lower().split())
+
+
+def _file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def _save_json(obj, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(obj, f)
+    os.replace(tmp, path)
+
+
+def get_cached_user_tokens(user):
+    """Return (csv hash, tokens) of user, only tokenizing the csv
+    again when its hash differs from the cached one"""
+    tweets_csv = CSV.format(user)
+    if not os.path.isfile(tweets_csv):
+        get_all_tweets(user)
+    csv_hash = _file_hash(tweets_csv)
+    cache = TOKEN_CACHE.format(user)
+    try:
+        with open(cache) as f:
+            cached = json.load(f)
+        if cached['hash'] == csv_hash:
+            return csv_hash, cached['tokens']
+    except (OSError, ValueError, KeyError):
+        pass
+    tokens = get_user_tokens(user)
+    _save_json({'hash': csv_hash, 'tokens': tokens}, cache)
+    return csv_hash, tokens
+
+
+class SimilarityModel(object):
+    """Dictionary, bag of words corpus, LDA model and similarity index of
+    all users, persisted in MODEL_DIR. update() only re-tokenizes users
+    whose csv changed and only retrains when the corpus changed, so
+    asking who is similar to a user is a lookup. The LDA model drifts
+    from a fresh one by at most MAX_LDA_UPDATES incremental updates.
+    Training it from scratch also builds the dictionary anew, dropping
+    the words of users that are gone"""
+
+    def __init__(self):
+        self.users = []
+        self.hashes = {}
+        self.corpus = {}  # user -> bag of words
+        self.dictionary = corpora.Dictionary()
+        self.lda = None
+        self.lda_updates = 0  # since it was last trained from scratch
+        self.index = None
+
+    @classmethod
+    def load(cls):
+        """The persisted model, an empty one if there is none"""
+        model = cls()
+        try:
+            with open(STATE) as f:
+                state = json.load(f)
+            dictionary = corpora.Dictionary.load(DICTIONARY)
+            lda = models.ldamodel.LdaModel.load(LDA_MODEL)
+            index = similarities.MatrixSimilarity.load(SIM_INDEX)
+        except (OSError, ValueError):
+            return model
+        model.users = state['users']
+        model.hashes = state['hashes']
+        model.corpus = {user: [tuple(pair) for pair in bow]
+                        for user, bow in state['corpus'].items()}
+        model.lda_updates = state.get('lda_updates', 0)
+        model.dictionary, model.lda, model.index = dictionary, lda, index
+        return model
+
+    def save(self):
+        os.makedirs(MODEL_DIR, exist_ok=True)
+        self.dictionary.save(DICTIONARY)
+        self.lda.save(LDA_MODEL)
+        self.index.save(SIM_INDEX)
+        # written last: it only matches the files above once they are saved
+        _save_json({'users': self.users, 'hashes': self.hashes,
+                    'corpus': self.corpus, 'lda_updates': self.lda_updates},
+                   STATE)
+
+    def update(self, users):
+        """Bring the model up to date with the csv files of users,
+        returns True if anything changed (and the model got saved)"""
+        users = sorted(set(users))
+        tokens, changed = {}, []
+        for user in users:
+            csv_hash, tokens[user] = get_cached_user_tokens(user)
+            if self.hashes.get(user) != csv_hash:
+                self.hashes[user] = csv_hash
+                changed.append(user)
+        if users == self.users and not changed:
+            return False
+        for user in set(self.users) - set(users):
+            del self.hashes[user], self.corpus[user]
+        self.users = users
+
+        changed_tokens = [token for user in changed for token in tokens[user]]
+        new_words = sum(token not in self.dictionary.token2id
+                        for token in changed_tokens)
+        if self.lda is None or len(changed) == len(users) or \
+                self.lda_updates >= MAX_LDA_UPDATES or \
+                new_words > MAX_NEW_WORDS * len(changed_tokens):
+            self.dictionary = corpora.Dictionary(tokens[user]
+                                                 for user in users)
+            self.corpus = {user: self.dictionary.doc2bow(tokens[user])
+                           for user in users}
+            self.lda = models.ldamodel.LdaModel(
+                [self.corpus[user] for user in users], num_topics=NUM_TOPICS,
+                id2word=self.dictionary, passes=PASSES)
+            self.lda_updates = 0
+        else:
+            self.dictionary.add_documents(tokens[user] for user in changed)
+            for user in changed:
+                self.corpus[user] = self.dictionary.doc2bow(tokens[user])
+            if changed:
+                self.lda.update([self._lda_bow(self.corpus[user])
+                                 for user in changed])
+            self.lda_updates += 1
+        self.index = similarities.MatrixSimilarity(
+            [self.lda[self._lda_bow(self.corpus[user])] for user in users],
+            num_features=NUM_TOPICS)
+        self.save()
+        return True
+
+    def _lda_bow(self, bow):
+        """bow without the words added to the dictionary after the LDA
+        model got trained, it has no topic weights for them"""
+        return [(id_, count) for id_, count in bow
+                if id_ < self.lda.num_terms]
+
+    def similar(self, user):
+        """[(other user, similarity)] most similar first"""
+        _, tokens = get_cached_user_tokens(user)
+        bow = self._lda_bow(self.dictionary.doc2bow(tokens))
+        sims = self.index[self.lda[bow]]
+        return sorted(((other, sim) for other, sim in zip(self.users, sims)
+                       if other != user), key=lambda item: -item[1])
 
 
 def tokenize_text(words):
-    words = [word for word in words if len(word) > 4 and word not in STOPWORDS]
-    words = [word for word in words if _is_ascii(word)]
-    words = [word for word in words if not IS_LINK_OBJ.search(word)]
-    #words = [_strip_non_ascii(word) for word in words]
-    return words
+    return list(iter_tokens(words))
+
+
+def iter_tokens(words):
+    """Lazily yield the words of at least MIN_WORD_LENGTH ascii characters
+    that are neither stopwords nor links/mentions, in a single pass"""
+    is_link = IS_LINK_OBJ.match
+    for word in words:
+        if len(word) >= MIN_WORD_LENGTH and word.isascii() and \
+                word not in STOPWORDS and not is_link(word):
+            yield word
 
 
 if __name__ == "__main__":
@@ -60,22 +217,8 @@ if __name__ == "__main__":
         diff_users = [i for i in glob.glob(CSV.format('*')) if user not in i]
         diff_users = [_get_filename(u) for u in diff_users]
 
-    data = []
-    for du in diff_users:
-        data.append(get_user_tokens(du))
-    dictionary = corpora.Dictionary(data)
-
-    corpus = [dictionary.doc2bow(text) for text in data]
-    lda = models.ldamodel.LdaModel(corpus, num_topics=5,
-                                   id2word=dictionary, passes=15)
-
-    index = similarities.MatrixSimilarity(lda[corpus])
-
-    tokens = get_user_tokens(user)
-    vec_bow = dictionary.doc2bow(tokens)
-    vec_lda = lda[vec_bow]
-
-    sims = index[vec_lda]
-    sims = sorted(enumerate(sims), key=lambda item: -item[1])
-    for i, sim in sims:
-        print(diff_users[i], sim)
+    # like before, the model is of the others, user is only compared
+    model = SimilarityModel.load()
+    model.update(diff_users)
+    for other, sim in model.similar(user):
+        print(other, sim)
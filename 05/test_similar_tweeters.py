@@ -0,0 +1,156 @@
+import csv
+import os
+
+import pytest
+
+import similar_tweeters
+from similar_tweeters import (MAX_LDA_UPDATES, MAX_NEW_WORDS,
+                              SimilarityModel, get_cached_user_tokens)
+
+TWEETS = {
+    'pythonista': ['Python generators and itertools make lovely pipelines',
+                   'Writing python decorators for caching results'],
+    'coder': ['Generators in python keep memory usage really small',
+              'Decorators and closures explained with python examples'],
+    'baker': ['Baking sourdough bread with organic flour tonight',
+              'Another sourdough loaf, crunchy crust and butter'],
+}
+
+
+def write_csv(path, tweets):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['id', 'created_at', 'text'])
+        writer.writerows((i, '2017-01-01', text)
+                         for i, text in enumerate(tweets))
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """Tweets csv files and the model in tmp_path, counting how often
+    a user's tweets get tokenized"""
+    model_dir = str(tmp_path / 'model')
+    paths = {'CSV': str(tmp_path / '{}.csv'),
+             'MODEL_DIR': model_dir,
+             'TOKEN_CACHE': os.path.join(model_dir, 'tokens', '{}.json'),
+             'STATE': os.path.join(model_dir, 'state.json'),
+             'DICTIONARY': os.path.join(model_dir, 'tweets.dict'),
+             'LDA_MODEL': os.path.join(model_dir, 'tweets.lda'),
+             'SIM_INDEX': os.path.join(model_dir, 'tweets.index')}
+    for name, path in paths.items():
+        monkeypatch.setattr(similar_tweeters, name, path)
+    for user, tweets in TWEETS.items():
+        write_csv(paths['CSV'].format(user), tweets)
+
+    tokenized = []
+    get_user_tokens = similar_tweeters.get_user_tokens
+
+    def counting_get_user_tokens(user):
+        tokenized.append(user)
+        return get_user_tokens(user)
+
+    monkeypatch.setattr(similar_tweeters, 'get_user_tokens',
+                        counting_get_user_tokens)
+    return paths, tokenized
+
+
+def test_cached_user_tokens(data_dir):
+    paths, tokenized = data_dir
+    csv_hash, tokens = get_cached_user_tokens('baker')
+    assert 'sourdough' in tokens and 'with' not in tokens
+    assert get_cached_user_tokens('baker') == (csv_hash, tokens)
+    assert tokenized == ['baker']  # second call is a cache hit
+
+    write_csv(paths['CSV'].format('baker'), TWEETS['baker'][:1])
+    new_hash, new_tokens = get_cached_user_tokens('baker')
+    assert new_hash != csv_hash and new_tokens != tokens
+    assert tokenized == ['baker', 'baker']
+
+
+def test_model_reload(data_dir):
+    paths, tokenized = data_dir
+    model = SimilarityModel.load()
+    assert model.update(TWEETS)
+    assert sorted(other for other, _ in model.similar('baker')) == \
+        ['coder', 'pythonista']
+
+    reloaded = SimilarityModel.load()
+    assert reloaded.users == model.users == sorted(TWEETS)
+    assert reloaded.hashes == model.hashes
+    assert reloaded.corpus == model.corpus
+    # LDA inference starts from random topic weights
+    assert dict(reloaded.similar('coder')) == \
+        pytest.approx(dict(model.similar('coder')), abs=1e-3)
+
+    # nothing changed: no tokenizing, retraining or saving
+    del tokenized[:]
+    mtime = os.path.getmtime(paths['STATE'])
+    assert not reloaded.update(TWEETS)
+    assert tokenized == []
+    assert os.path.getmtime(paths['STATE']) == mtime
+
+
+def test_lda_drift_is_bounded(data_dir):
+    paths, _ = data_dir
+    model = SimilarityModel.load()
+    model.update(TWEETS)
+    tweets = TWEETS['coder']
+    for update in range(1, MAX_LDA_UPDATES + 2):
+        lda = model.lda
+        tweets = tweets[1:] + tweets[:1]  # same words, another csv hash
+        write_csv(paths['CSV'].format('coder'), tweets)
+        assert model.update(TWEETS)
+        if update <= MAX_LDA_UPDATES:
+            assert model.lda is lda
+            assert model.lda_updates == update
+        else:  # trained from scratch again
+            assert model.lda is not lda
+            assert model.lda_updates == 0
+        assert SimilarityModel.load().lda_updates == model.lda_updates
+
+
+def test_few_new_words_update_incrementally(data_dir):
+    paths, _ = data_dir
+    model = SimilarityModel.load()
+    model.update(TWEETS)
+    lda = model.lda
+    tweets = TWEETS['coder'] * 20 + ['Brand newword']
+    write_csv(paths['CSV'].format('coder'), tweets)
+    _, tokens = get_cached_user_tokens('coder')
+    assert 2 <= MAX_NEW_WORDS * len(tokens)
+
+    assert model.update(TWEETS)
+    assert model.lda is lda and model.lda_updates == 1
+    # in the dictionary, not (yet) in the LDA model
+    assert model.dictionary.token2id['newword'] >= lda.num_terms
+    assert sorted(other for other, _ in model.similar('coder')) == \
+        ['baker', 'pythonista']
+
+
+def test_many_new_words_retrain(data_dir):
+    paths, _ = data_dir
+    model = SimilarityModel.load()
+    model.update(TWEETS)
+    lda = model.lda
+    write_csv(paths['CSV'].format('coder'),
+              ['Completely different vocabulary about gardening tomatoes'])
+    assert model.update(TWEETS)
+    assert model.lda is not lda and model.lda_updates == 0
+    assert model.lda.num_terms == len(model.dictionary)
+
+
+def test_retrain_drops_words_of_removed_users(data_dir):
+    paths, _ = data_dir
+    model = SimilarityModel.load()
+    model.update(TWEETS)
+    others = ['coder', 'pythonista']
+    assert model.update(others)
+    assert sorted(model.corpus) == others
+    assert 'sourdough' in model.dictionary.token2id  # until retrained
+
+    write_csv(paths['CSV'].format('coder'),
+              ['Completely different vocabulary about gardening tomatoes'])
+    assert model.update(others)
+    assert 'sourdough' not in model.dictionary.token2id
+    assert 'gardening' in model.dictionary.token2id
+    assert SimilarityModel.load().corpus == model.corpus
@@ -0,0 +1,205 @@
+"""When does PyPI reach N packages?
+
+Forecast from an append-only log of package counts, one event per line:
+'YYYYmmddHHMMSS:count' (a snapshot like data.txt) or 'YYYYmmddHHMMSS'
+(one package got created, see append_rss_events). Every event updates
+a least squares fit of count over time and a windowed rate in O(1),
+the engine state is saved so reruns only read the lines added since.
+"""
+from collections import deque
+from datetime import datetime, timedelta, timezone
+import hashlib
+import json
+import os
+import sys
+from xml.etree import ElementTree
+from email.utils import parsedate_to_datetime
+
+DATA = 'data.txt'
+STATE = '.forecast_state.json'
+GOAL = 100000
+WINDOW = timedelta(days=90)  # for the recent rate of new packages
+DATE_FMT = '%Y%m%d%H%M%S'  # UTC
+FINGERPRINT_SIZE = 4096  # head of the log hashed to recognize it
+
+
+class ForecastEngine(object):
+    """Running sums for the regression count = intercept + slope * t and
+    a deque of the events within WINDOW, both updated per event. t is
+    seconds since the first event, keeping the sums well conditioned"""
+
+    def __init__(self, window=WINDOW):
+        self.window = window.total_seconds()
+        self.origin = None  # datetime of the first event
+        self.n = 0
+        self.sum_t = self.sum_c = self.sum_tt = self.sum_tc = 0.0
+        self.recent = deque()  # (t, count) of the last window seconds
+        self.count = 0
+        self.offset = 0  # bytes of the log processed
+        self.inode = None  # of the log processed
+        self.fingerprint = None  # hash of its first FINGERPRINT_SIZE bytes
+
+    def add(self, when, count=None):
+        """Add an event: a snapshot of the total count or, without count,
+        a single new package"""
+        if self.origin is None:
+            self.origin = when
+        t = (when - self.origin).total_seconds()
+        self.count = self.count + 1 if count is None else count
+        self.n += 1
+        self.sum_t += t
+        self.sum_c += self.count
+        self.sum_tt += t * t
+        self.sum_tc += t * self.count
+        self.recent.append((t, self.count))
+        while t - self.recent[0][0] > self.window:
+            self.recent.popleft()
+
+    def ingest(self, path=DATA):
+        """Process the lines appended to the log at path since the last
+        call, a trailing partial line waits for the next one. A log that
+        got replaced (another inode, other first bytes or shorter) is
+        processed from the start. Returns the number of events added"""
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            head = f.read(min(self.offset, FINGERPRINT_SIZE))
+            if stat.st_size < self.offset or stat.st_ino != self.inode or \
+                    _fingerprint(head) != self.fingerprint:
+                self.__init__(timedelta(seconds=self.window))
+                head = b''
+            f.seek(self.offset)
+            data = f.read()
+        end = data.rfind(b'\n') + 1
+        if self.offset < FINGERPRINT_SIZE:
+            self.fingerprint = _fingerprint(
+                (head + data[:end])[:FINGERPRINT_SIZE])
+        self.inode = stat.st_ino
+        added = 0
+        for line in data[:end].decode('utf-8').splitlines():
+            if not line.strip():
+                continue
+            stamp, _, count = line.strip().partition(':')
+            self.add(datetime.strptime(stamp, DATE_FMT),
+                     int(count) if count else None)
+            added += 1
+        self.offset += end
+        return added
+
+    @property
+    def slope(self):
+        """Packages per second according to the regression"""
+        denominator = self.n * self.sum_tt - self.sum_t ** 2
+        if not denominator:
+            return None
+        return (self.n * self.sum_tc - self.sum_t * self.sum_c) / denominator
+
+    @property
+    def rate(self):
+        """Packages per second over the last window"""
+        (t0, c0), (t1, c1) = self.recent[0], self.recent[-1]
+        return (c1 - c0) / (t1 - t0) if t1 > t0 else None
+
+    def when_regression(self, goal=GOAL):
+        """Datetime the fitted line reaches goal packages, None if it
+        never does"""
+        slope = self.slope
+        if not slope or slope < 0:
+            return None
+        intercept = (self.sum_c - slope * self.sum_t) / self.n
+        return self.origin + timedelta(seconds=(goal - intercept) / slope)
+
+    def when_rate(self, goal=GOAL):
+        """Datetime goal packages get reached at the recent rate"""
+        rate = self.rate
+        if not rate or rate < 0:
+            return None
+        t_last = self.recent[-1][0]
+        return self.origin + timedelta(
+            seconds=t_last + (goal - self.count) / rate)
+
+    def to_dict(self):
+        return {'window': self.window,
+                'origin': self.origin and self.origin.strftime(DATE_FMT),
+                'n': self.n, 'sums': [self.sum_t, self.sum_c, self.sum_tt,
+                                      self.sum_tc],
+                'recent': list(self.recent), 'count': self.count,
+                'offset': self.offset, 'inode': self.inode,
+                'fingerprint': self.fingerprint}
+
+    @classmethod
+    def from_dict(cls, state):
+        engine = cls(timedelta(seconds=state['window']))
+        if state['origin']:
+            engine.origin = datetime.strptime(state['origin'], DATE_FMT)
+        engine.n = state['n']
+        engine.sum_t, engine.sum_c, engine.sum_tt, engine.sum_tc = state['sums']
+        engine.recent = deque(tuple(event) for event in state['recent'])
+        engine.count = state['count']
+        engine.offset = state['offset']
+        engine.inode = state['inode']
+        engine.fingerprint = state['fingerprint']
+        return engine
+
+
+def _fingerprint(head):
+    return hashlib.sha1(head).hexdigest()
+
+
+def load_engine(state_file=STATE, window=WINDOW):
+    try:
+        with open(state_file) as f:
+            engine = ForecastEngine.from_dict(json.load(f))
+    except (OSError, ValueError, KeyError, TypeError):
+        return ForecastEngine(window)
+    if engine.window != window.total_seconds():
+        return ForecastEngine(window)
+    return engine
+
+
+def save_engine(engine, state_file=STATE):
+    tmp = state_file + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(engine.to_dict(), f)
+    os.replace(tmp, state_file)
+
+
+def append_rss_events(rss_file, log_file=DATA):
+    """Append an event line per package in a saved packages RSS feed
+    that is newer than the last line of the log, returns how many.
+    pubDates are converted to UTC, a date without a zone taken as UTC"""
+    last = ''
+    if os.path.isfile(log_file):
+        with open(log_file) as f:
+            for line in f:
+                last = line.strip() or last
+    last = last.partition(':')[0]
+    stamps = sorted(
+        _utc(parsedate_to_datetime(date.text)).strftime(DATE_FMT)
+        for date in ElementTree.parse(rss_file).getroot().iter('pubDate'))
+    new = [stamp for stamp in stamps if stamp > last]
+    with open(log_file, 'a') as f:
+        f.writelines(stamp + '\n' for stamp in new)
+    return len(new)
+
+
+def _utc(when):
+    if when.tzinfo is None:  # "-0000": UTC, but no zone information
+        return when
+    return when.astimezone(timezone.utc)
+
+
+def main(argv):
+    goals = [int(arg) for arg in argv] or [GOAL]
+    engine = load_engine()
+    added = engine.ingest(DATA)
+    save_engine(engine)
+    print('{} new events, {} in total, last count {}'.format(
+        added, engine.n, engine.count))
+    for goal in goals:
+        print('{:>8} packages: {} (regression) / {} (last {} days)'.format(
+            goal, engine.when_regression(goal), engine.when_rate(goal),
+            WINDOW.days))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta
+import os
+
+import pytest
+
+from forecast import (DATA, DATE_FMT, ForecastEngine, append_rss_events,
+                      load_engine, save_engine)
+
+with open(DATA) as f:
+    LINES = f.readlines()
+
+RSS = '''<?xml version="1.0"?><rss version="2.0"><channel>
+<item><pubDate>Mon, 03 Apr 2017 01:30:00 +0200</pubDate></item>
+<item><pubDate>Sun, 02 Apr 2017 23:00:00 GMT</pubDate></item>
+<item><pubDate>Mon, 03 Apr 2017 00:00:00 -0000</pubDate></item>
+<item><pubDate>Sun, 02 Apr 2017 20:00:00 -0400</pubDate></item>
+<item><pubDate>Sun, 02 Apr 2017 23:00:00 +0100</pubDate></item>
+</channel></rss>'''
+
+
+def full_recompute(path):
+    engine = ForecastEngine()
+    engine.ingest(path)
+    return engine.to_dict()
+
+
+@pytest.mark.parametrize('step', [1, 7, 100, 5000])
+def test_incremental_ingest_equals_full_recompute(tmp_path, step):
+    log = str(tmp_path / 'data.txt')
+    state = str(tmp_path / 'state.json')
+    rss_events = ['{}\n'.format((datetime(2017, 3, 1) + timedelta(hours=i))
+                                .strftime(DATE_FMT)) for i in range(50)]
+    lines = LINES + rss_events
+    open(log, 'w').close()
+    added = 0
+    for start in range(0, len(lines), step):
+        with open(log, 'a') as f:
+            f.writelines(lines[start:start + step])
+            f.write(lines[start + step][:5] if start + step < len(lines)
+                    else '')  # a partial line waits for the next ingest
+        engine = load_engine(state)
+        added += engine.ingest(log)
+        save_engine(engine, state)
+        # drop the partial line again, the next append completes it
+        with open(log, 'rb+') as f:
+            f.truncate(engine.offset)
+    assert added == len(lines)
+    assert load_engine(state).to_dict() == full_recompute(log)
+    assert engine.when_regression() == ForecastEngine.from_dict(
+        full_recompute(log)).when_regression()
+
+
+def test_replaced_log_is_read_again(tmp_path):
+    log = tmp_path / 'data.txt'
+    log.write_text(''.join(LINES[:10]))
+    engine = ForecastEngine()
+    assert engine.ingest(str(log)) == 10
+
+    # same size and inode, other content: caught by the fingerprint
+    with open(str(log), 'r+') as f:
+        f.write(''.join(LINES[10:20])[:os.path.getsize(str(log))])
+    assert engine.ingest(str(log)) == 10
+    assert engine.to_dict() == full_recompute(str(log))
+
+    # rotated: a new file, longer and starting like the old one
+    rotated = tmp_path / 'data.txt.new'
+    rotated.write_text(log.read_text() + ''.join(LINES[20:25]))
+    os.replace(str(rotated), str(log))
+    if os.stat(str(log)).st_ino:  # no inodes on every filesystem
+        assert engine.ingest(str(log)) == 15
+        assert engine.to_dict() == full_recompute(str(log))
+
+
+def test_append_rss_events_in_utc(tmp_path):
+    rss = tmp_path / 'packages.xml'
+    rss.write_text(RSS)
+    log = tmp_path / 'data.txt'
+    log.write_text('20170402221500:98907\n')
+    assert append_rss_events(str(rss), str(log)) == 4  # not the +0100 one, 22:00 UTC
+    assert log.read_text().splitlines()[1:] == [
+        '20170402230000', '20170402233000', '20170403000000',
+        '20170403000000']
@@ -0,0 +1,58 @@
+'''Throughput (tweets/sec) of the sentiment backends, with and without
+the LRU cache, on a synthetic corpus where a share of the tweets are
+retweets or duplicates, plus how often lexicon agrees with TextBlob'''
+import random
+import sys
+import time
+
+from sentiment import (CachedBackend, LexiconBackend, TextBlobBackend,
+                       get_sentiment)
+
+NUM_TWEETS = 20000
+BATCH_SIZE = 1000
+REPEAT_RATE = 0.4  # share of tweets that are a retweet/duplicate
+WORDS = ('i love this great movie but the ending was not good and very sad '
+         'python is awesome today never happy with the terrible weather '
+         'really bad service what a beautiful day no problem at all thanks '
+         'worst update ever pretty cool new release').split()
+
+
+def make_corpus(num_tweets, rng):
+    tweets = []
+    for _ in range(num_tweets):
+        if tweets and rng.random() < REPEAT_RATE:
+            tweet = rng.choice(tweets)  # a retweet is the same "rt @x: .."
+            if rng.random() < 0.5:
+                tweet = tweet.upper()
+        else:
+            tweet = ' '.join(rng.choices(WORDS, k=rng.randint(4, 16)))
+            if rng.random() < 0.5:
+                tweet = 'rt @user{}: {}'.format(rng.randrange(50), tweet)
+        tweets.append(tweet)
+    return tweets
+
+
+def bench(label, backend, tweets):
+    start = time.perf_counter()
+    polarities = []
+    for i in range(0, len(tweets), BATCH_SIZE):
+        polarities.extend(backend.polarities(tweets[i:i + BATCH_SIZE]))
+    duration = time.perf_counter() - start
+    print('{:<24} {:>10.0f} tweets/sec'.format(label, len(tweets) / duration))
+    return [get_sentiment(polarity) for polarity in polarities]
+
+
+if __name__ == "__main__":
+    num_tweets = int(sys.argv[1]) if len(sys.argv) > 1 else NUM_TWEETS
+    tweets = make_corpus(num_tweets, random.Random(0))
+    lexicon = LexiconBackend()
+
+    print('Scoring {} tweets ({:.0%} repeats)\n'.format(num_tweets, REPEAT_RATE))
+    textblob = bench('textblob', TextBlobBackend(), tweets)
+    cached = bench('textblob + cache', CachedBackend(TextBlobBackend()), tweets)
+    assert cached == textblob, 'the cache must not change the report'
+    fast = bench('lexicon', lexicon, tweets)
+    assert bench('lexicon + cache', CachedBackend(lexicon), tweets) == fast
+
+    agree = sum(a == b for a, b in zip(textblob, fast)) / len(tweets)
+    print('\nlexicon agrees with textblob on {:.1%} of the tweets'.format(agree))
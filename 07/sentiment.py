@@ -1,14 +1,49 @@
-from collections import defaultdict
+from abc import ABC, abstractmethod
+import argparse
+from array import array
+from collections import Counter, OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from functools import lru_cache
+import gzip
+import hashlib
+from itertools import islice
 import json
+import os
+import random
+import re
 import sys
+import time
+from xml.etree import ElementTree
 
+try:
+    import numpy as np
+except ImportError:  # optional, LexiconBackend falls back to a loop
+    np = None
+import textblob
 from textblob import TextBlob
 
+SENTIMENTS = ('positive', 'negative', 'neutral')
+CHUNK_SIZE = 1000  # tweets per task sent to a worker process
+MAX_PENDING = 2  # chunks in flight per worker, bounds memory
+CACHE_SIZE = 100000  # texts remembered per worker, 0 disables the cache
+LEXICON = os.path.join(os.path.dirname(textblob.__file__), 'en',
+                       'en-sentiment.xml')
+NEGATIONS = ('no', 'not', "n't", 'never')
+NEGATION_FACTOR = -0.5  # "not good" = slightly bad, like TextBlob
+TOKEN = re.compile(r"n't|[a-z0-9]+(?:'[a-z]+)?")
+
+
+def _open(input_file):
+    if input_file.endswith('.gz'):
+        return gzip.open(input_file, 'rt')
+    return open(input_file)
+
 
 def get_tweets(input_file):
-    with open(input_file) as f:
-        for line in f.readlines():
-            yield json.loads(line)
+    with _open(input_file) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
 
 
 def get_sentiment(polarity):
@@ -20,30 +55,336 @@ def get_sentiment(polarity):
         return "positive"
 
 
-if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print('please provide json data file')
-        sys.exit(1)
+class SentimentBackend(ABC):
+    """Turns a batch of texts into their polarities (-1.0 - 1.0)"""
+
+    @abstractmethod
+    def polarities(self, texts):
+        """[polarity] of texts, in order"""
+
+
+class TextBlobBackend(SentimentBackend):
+
+    def polarities(self, texts):
+        return [TextBlob(text).sentiment.polarity for text in texts]
+
+
+@lru_cache()
+def _load_words(path):
+    """{word: (polarity, intensity, is adverb)} of a pattern style
+    sentiment xml, averaging the senses per part of speech and then the
+    parts of speech. Like TextBlob, the adverb of an adjective
+    ("terrible" -> "terribly") gets the scores of the adjective"""
+    senses = {}
+    for word in ElementTree.parse(path).getroot().findall('word'):
+        form = word.attrib.get('form')
+        if form:
+            senses.setdefault(form, {}).setdefault(
+                word.attrib.get('pos'), []).append(
+                    (float(word.attrib.get('polarity', 0.0)),
+                     float(word.attrib.get('intensity', 1.0))))
+    words, adjectives = {}, {}
+    for form, pos in senses.items():
+        scores = {tag: _mean(senses) for tag, senses in pos.items()}
+        words[form] = (*_mean(scores.values()), 'RB' in pos)
+        if 'JJ' in pos:
+            adjectives[form] = scores['JJ']
+    for form, (polarity, intensity) in adjectives.items():
+        if form.endswith('y'):
+            form = form[:-1] + 'i'
+        if form.endswith('le'):
+            form = form[:-2]
+        words[form + 'ly'] = polarity, intensity, True
+    return words
+
+
+def _mean(rows):
+    rows = list(rows)
+    return [sum(column) / len(rows) for column in zip(*rows)]
+
+
+def load_lexicon(path=LEXICON):
+    """{word: polarity} of a pattern style sentiment xml"""
+    return {form: polarity
+            for form, (polarity, _, _) in _load_words(path).items()}
+
+
+def load_modifiers(path=LEXICON):
+    """{word: intensity} of the adverbs ("very"), they intensify the word
+    after them"""
+    return {form: intensity
+            for form, (_, intensity, adverb) in _load_words(path).items()
+            if adverb}
+
+
+class LexiconBackend(SentimentBackend):
+    """Mean polarity of the lexicon words in a text, scored like TextBlob
+    does on plain text:
+    - a modifier ("very") right before a known word is merged with it,
+      the word's polarity times the modifier's intensity (-1.0 - 1.0)
+    - a word, or its modifier, right after a negation counts
+      NEGATION_FACTOR times and the modifier's intensity is inverted
+    - unknown one letter words ("not a good") don't break either scope
+    The lexicon is compiled to token ids (0 = unknown) with polarity,
+    intensity and flag arrays indexed by id, so a whole batch is scored
+    with a few numpy calls"""
+
+    def __init__(self, lexicon=None, modifiers=None):
+        lexicon = load_lexicon() if lexicon is None else lexicon
+        modifiers = load_modifiers() if modifiers is None else modifiers
+        modifiers = {w: i for w, i in modifiers.items() if w in lexicon}
+        words = sorted(set(lexicon) | set(NEGATIONS))
+        self.ids = {word: i for i, word in enumerate(words, 1)}
+        self.polarity = array('d', [0.0] + [lexicon.get(w, 0.0) for w in words])
+        self.intensity = array('d', [1.0] + [modifiers.get(w, 1.0)
+                                             for w in words])
+        self.known = array('B', [0] + [w in lexicon for w in words])
+        self.modifier = array('B', [0] + [w in modifiers for w in words])
+        self.negation = array('B', [0] + [w in NEGATIONS for w in words])
+
+    def token_ids(self, text):
+        ids = self.ids
+        return [ids.get(token, 0) for token in TOKEN.findall(text.lower())
+                if len(token) > 1 or token in ids]
+
+    def polarities(self, texts):
+        docs = [self.token_ids(text) for text in texts]
+        if np is not None:
+            return self._polarities_numpy(docs)
+        return [self._polarity(ids) for ids in docs]
+
+    def _polarity(self, ids):
+        known, modifier = self.known, self.modifier
+        total, count, start = 0.0, 0, 0  # start: first word of the merge
+        for t, id_ in enumerate(ids):
+            previous = ids[t - 1] if t else 0
+            merged = known[id_] and modifier[previous]
+            if not merged:
+                start = t
+            if not known[id_] or (modifier[id_] and t + 1 < len(ids) and
+                                  known[ids[t + 1]]):
+                continue  # unknown, or merged into the next word
+            negated = start and self.negation[ids[start - 1]]
+            score = self.polarity[id_]
+            if merged:
+                intensity = self.intensity[previous]
+                if negated and start == t - 1:
+                    intensity = 1 / intensity
+                score = max(-1.0, min(score * intensity, 1.0))
+            total += score * (NEGATION_FACTOR if negated else 1)
+            count += 1
+        return total / (count or 1)
+
+    def _polarities_numpy(self, docs):
+        lengths = np.fromiter(map(len, docs), dtype=np.intp, count=len(docs))
+        ids = np.fromiter((id_ for ids in docs for id_ in ids), dtype=np.intp,
+                          count=int(lengths.sum()))
+        doc = np.repeat(np.arange(len(docs)), lengths)
+        same_doc = doc[1:] == doc[:-1]
+        known = np.frombuffer(self.known, dtype=np.uint8)[ids].astype(bool)
+        modifier = np.frombuffer(self.modifier, dtype=np.uint8)[ids] \
+            .astype(bool)
+        merged = np.zeros(len(ids), dtype=bool)
+        merged[1:] = known[1:] & modifier[:-1] & same_doc
+        counted = known.copy()
+        counted[:-1] &= ~(modifier[:-1] & known[1:] & same_doc)
+        position = np.arange(len(ids))
+        start = np.maximum.accumulate(np.where(merged, 0, position)) \
+            if len(ids) else position
+        before = np.maximum(start - 1, 0)
+        negated = (start > 0) & (doc[before] == doc) & np.frombuffer(
+            self.negation, dtype=np.uint8)[ids[before]].astype(bool)
+        intensity = np.ones(len(ids))
+        intensity[1:] = np.frombuffer(self.intensity)[ids[:-1]]
+        intensity = np.where(negated & (start == position - 1),
+                             1 / intensity, intensity)
+        scores = np.frombuffer(self.polarity)[ids]
+        scores = np.where(merged, np.clip(scores * intensity, -1.0, 1.0),
+                          scores) * np.where(negated, NEGATION_FACTOR, 1.0)
+        totals = np.bincount(doc[counted], weights=scores[counted],
+                             minlength=len(docs))
+        counts = np.bincount(doc[counted], minlength=len(docs))
+        return (totals / np.maximum(counts, 1)).tolist()
+
+
+class CachedBackend(SentimentBackend):
+    """Bounded LRU cache in front of another backend, keyed by a hash of
+    the text ignoring case and whitespace, so duplicates and retweets
+    (all "rt @user: <same text>") only get scored once"""
 
-    input_file = sys.argv[1]
+    def __init__(self, backend, maxsize=CACHE_SIZE):
+        self.backend = backend
+        self.maxsize = maxsize
+        self.cache = OrderedDict()
+        self.hits = self.misses = 0
 
-    tweets = get_tweets(input_file)
+    @staticmethod
+    def key(text):
+        text = ' '.join(text.lower().split())
+        return hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest()
 
-    sentiments = defaultdict(set)
+    def polarities(self, texts):
+        result = [None] * len(texts)
+        missing = OrderedDict()  # key -> positions in texts
+        for i, text in enumerate(texts):
+            key = self.key(text)
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                result[i] = self.cache[key]
+                self.hits += 1
+            else:
+                missing.setdefault(key, []).append(i)
+        self.misses += len(missing)
+        scores = self.backend.polarities([texts[positions[0]]
+                                          for positions in missing.values()])
+        for (key, positions), score in zip(missing.items(), scores):
+            for i in positions:
+                result[i] = score
+            self.cache[key] = score
+        while len(self.cache) > self.maxsize:
+            self.cache.popitem(last=False)
+        return result
 
-    for tw in tweets:
-        text = dict(tw)['text'].lower()
-        blob = TextBlob(text)
-        sent = get_sentiment(blob.sentiment.polarity)
-        sentiments[sent].add(text)
 
-    total = sum(len(i) for i in sentiments.values())
+BACKENDS = {'textblob': TextBlobBackend, 'lexicon': LexiconBackend}
 
-    perc_pos = len(sentiments["positive"]) / total * 100
-    perc_neg = len(sentiments["negative"]) / total * 100
-    perc_neu = len(sentiments["neutral"]) / total * 100
+_backend = None  # per worker process, set by init_backend
+
+
+def get_backend(name='textblob', cache_size=CACHE_SIZE):
+    backend = BACKENDS[name]()
+    return CachedBackend(backend, cache_size) if cache_size else backend
+
+
+def init_backend(name='textblob', cache_size=CACHE_SIZE):
+    global _backend
+    _backend = get_backend(name, cache_size)
+
+
+def score_texts(texts):
+    """Sentiment of each text, runs in the worker processes"""
+    if _backend is None:
+        init_backend()
+    return [get_sentiment(polarity) for polarity in _backend.polarities(texts)]
+
+
+def _unique(texts):
+    """Skip texts seen before, only keeping their sha1 digests around
+    (hash() collisions would drop distinct texts). That set is not
+    bounded: it takes ~95 bytes per distinct text (95 MB per million),
+    use analyze(unique=False) (--all) beyond what fits"""
+    seen = set()
+    for text in texts:
+        key = hashlib.sha1(text.encode('utf-8', 'surrogatepass')).digest()
+        if key not in seen:
+            seen.add(key)
+            yield text
+
+
+def _chunks(iterable, size):
+    iterable = iter(iterable)
+    while True:
+        chunk = list(islice(iterable, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class SentimentCounts(object):
+    """Tweets per sentiment, optionally with a random sample (reservoir
+    sampling) of at most num_samples texts per sentiment"""
+
+    def __init__(self, num_samples=0, rng=random):
+        self.counts = Counter()
+        self.samples = {sentiment: [] for sentiment in SENTIMENTS}
+        self.num_samples = num_samples
+        self.rng = rng
+
+    def add(self, text, sentiment):
+        self.counts[sentiment] += 1
+        if not self.num_samples:
+            return
+        sample = self.samples[sentiment]
+        if len(sample) < self.num_samples:
+            sample.append(text)
+        else:
+            i = self.rng.randrange(self.counts[sentiment])
+            if i < self.num_samples:
+                sample[i] = text
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+
+def analyze(texts, workers=None, chunk_size=CHUNK_SIZE, unique=True,
+            num_samples=0, backend='textblob', cache_size=CACHE_SIZE):
+    """Score texts in chunks on a process pool, keeping only counts (and
+    samples). With unique a text gets counted once, like the sets of the
+    original script did, remembering the digests of the texts seen
+    (~95 bytes per distinct text, see _unique).
+    backend names one of BACKENDS, cached per worker (cache_size texts)"""
+    result = SentimentCounts(num_samples)
+    chunks = _chunks(_unique(texts) if unique else texts, chunk_size)
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(workers, initializer=init_backend,
+                             initargs=(backend, cache_size)) as pool:
+        max_pending = MAX_PENDING * workers
+        pending = {pool.submit(score_texts, chunk): chunk
+                   for chunk in islice(chunks, max_pending)}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                for text, sentiment in zip(pending.pop(future),
+                                           future.result()):
+                    result.add(text, sentiment)
+            for chunk in islice(chunks, len(done)):
+                pending[pool.submit(score_texts, chunk)] = chunk
+    return result
+
+
+def print_report(result, duration=None):
+    total = result.total
 
     print("Analyzed {} tweets".format(total))
-    print("Positive: {:.2f}%".format(perc_pos))
-    print("Negative: {:.2f}%".format(perc_neg))
-    print("Neutral: {:.2f}%".format(perc_neu))
+    for sentiment in SENTIMENTS:
+        perc = result.counts[sentiment] / max(1, total) * 100
+        print("{}: {:.2f}%".format(sentiment.capitalize(), perc))
+    if duration is not None:
+        print("Throughput: {:.0f} tweets/sec ({:.1f}s)".format(
+            total / max(duration, 1e-9), duration))
+    for sentiment, sample in result.samples.items():
+        for text in sample:
+            print('{:<8} | {}'.format(sentiment, text.replace('\n', ' ')))
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        description='Sentiment of tweets in a (gzipped) json lines file')
+    parser.add_argument('input_file')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='worker processes (default: number of cpus)')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--all', dest='unique', action='store_false',
+                        help='count duplicate texts too, unique counting '
+                             'keeps ~95 bytes per distinct text in memory')
+    parser.add_argument('--samples', type=int, default=0,
+                        help='print up to this many sample tweets per sentiment')
+    parser.add_argument('--backend', choices=sorted(BACKENDS),
+                        default='textblob')
+    parser.add_argument('--cache-size', type=int, default=CACHE_SIZE,
+                        help='texts cached per worker, 0 disables the cache')
+    args = parser.parse_args(args)
+
+    start = time.perf_counter()
+    texts = (dict(tw)['text'].lower() for tw in get_tweets(args.input_file))
+    result = analyze(texts, args.workers, args.chunk_size, args.unique,
+                     args.samples, args.backend, args.cache_size)
+    print_report(result, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print('please provide json data file')
+        sys.exit(1)
+    main()
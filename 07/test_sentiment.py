@@ -0,0 +1,153 @@
+from collections import Counter, defaultdict
+import gzip
+import json
+
+import pytest
+from textblob import TextBlob
+
+import sentiment
+from sentiment import (CachedBackend, LexiconBackend, SentimentBackend,
+                       TextBlobBackend, analyze, get_sentiment, get_tweets,
+                       main)
+
+TWEETS = ['I love Python, what a great day!',
+          'This update is terrible and the service was bad',
+          'Meeting at 10am in room 4',
+          'i love python, what a great day!',  # same text lowercased
+          'RT @pybites: I love Python, what a great day!',
+          'Not good, not good at all',
+          'Meeting at 10am in room 4',
+          'Pretty cool new release',
+          'what  a   GREAT day']
+
+PHRASES = ['very good', 'not good', 'not very good', 'not a good movie',
+           'very very good', 'good, very', 'a very', 'never happy',
+           'this is not really terrible', 'i love it but not very much',
+           'terribly good', 'really bad service', 'not good at all', '']
+
+
+@pytest.fixture(params=['tweets.json', 'tweets.json.gz'])
+def tweets_file(request, tmp_path):
+    lines = ''.join(json.dumps({'id': i, 'text': text}) + '\n'
+                    for i, text in enumerate(TWEETS))
+    path = tmp_path / request.param
+    if request.param.endswith('.gz'):
+        with gzip.open(str(path), 'wt') as f:
+            f.write(lines)
+    else:
+        path.write_text(lines + '\n')  # a blank line gets skipped
+    return str(path)
+
+
+def old_report(texts):
+    """The report of the original script, one set per sentiment"""
+    sentiments = defaultdict(set)
+    for text in texts:
+        sent = get_sentiment(TextBlob(text).sentiment.polarity)
+        sentiments[sent].add(text)
+    total = sum(len(i) for i in sentiments.values())
+    return '\n'.join([
+        "Analyzed {} tweets".format(total),
+        "Positive: {:.2f}%".format(len(sentiments["positive"]) / total * 100),
+        "Negative: {:.2f}%".format(len(sentiments["negative"]) / total * 100),
+        "Neutral: {:.2f}%".format(len(sentiments["neutral"]) / total * 100)])
+
+
+@pytest.mark.parametrize('cache_size', [0, 2, 100])
+def test_report_matches_old_script(tweets_file, cache_size, capsys):
+    main([tweets_file, '--workers', '2', '--chunk-size', '2',
+          '--cache-size', str(cache_size)])
+    report = capsys.readouterr().out.splitlines()
+    assert report[-1].startswith('Throughput: ')
+    assert '\n'.join(report[:-1]) == old_report(t.lower() for t in TWEETS)
+
+
+def test_analyze_streams_all_texts(tweets_file):
+    texts = (tweet['text'].lower() for tweet in get_tweets(tweets_file))
+    result = analyze(texts, workers=1, chunk_size=1, unique=False,
+                     num_samples=1)
+    assert result.total == len(TWEETS)
+    assert result.counts == Counter(
+        get_sentiment(TextBlob(text.lower()).sentiment.polarity)
+        for text in TWEETS)
+    assert result.samples['neutral'] == ['meeting at 10am in room 4']
+    assert all(len(sample) == 1 for sample in result.samples.values())
+
+
+def test_unique_survives_hash_collisions(monkeypatch):
+    texts = [t.lower() for t in TWEETS]
+    expected = list(dict.fromkeys(texts))
+    assert list(sentiment._unique(texts)) == expected
+    # every text colliding with every other one on hash()
+    monkeypatch.setattr(sentiment, 'hash', lambda text: 42, raising=False)
+    assert list(sentiment._unique(texts)) == expected
+
+
+class CountingBackend(SentimentBackend):
+
+    def __init__(self):
+        self.scored = []
+
+    def polarities(self, texts):
+        self.scored.extend(texts)
+        return [len(text) % 3 - 1.0 for text in texts]
+
+
+def test_cached_backend():
+    backend = CountingBackend()
+    cached = CachedBackend(backend, maxsize=3)
+    assert cached.polarities(TWEETS[:4]) == \
+        CountingBackend().polarities(TWEETS[:4])
+    # case and whitespace are ignored, a text is scored once per batch
+    assert backend.scored == TWEETS[:3]
+    assert (cached.hits, cached.misses) == (0, 3)
+
+    texts = [TWEETS[0].upper(), '  ' + TWEETS[1]]
+    assert cached.polarities(texts) == \
+        CountingBackend().polarities(TWEETS[:2])
+    assert backend.scored == TWEETS[:3]
+    assert (cached.hits, cached.misses) == (2, 3)
+
+    cached.polarities(['Pretty cool'])
+    assert backend.scored == TWEETS[:3] + ['Pretty cool']
+    assert len(cached.cache) == 3  # least recently used one dropped
+
+    cached.polarities([TWEETS[2]])
+    assert backend.scored[-1] == TWEETS[2]
+
+
+def test_cached_backend_same_polarities():
+    texts = [text.lower() for text in TWEETS]
+    cached = CachedBackend(TextBlobBackend())
+    for _ in range(2):
+        assert cached.polarities(texts) == TextBlobBackend().polarities(texts)
+    assert cached.hits == len(texts)
+    assert cached.misses == len(set(map(cached.key, texts))) < len(texts)
+
+
+def test_backends_implement_polarities():
+    with pytest.raises(TypeError):
+        SentimentBackend()
+
+    class NoPolarities(SentimentBackend):
+        pass
+
+    with pytest.raises(TypeError):
+        NoPolarities()
+
+
+@pytest.fixture(scope='module')
+def lexicon_backend():
+    return LexiconBackend()
+
+
+def test_lexicon_modifiers_and_negations(lexicon_backend):
+    assert lexicon_backend.polarities(PHRASES) == \
+        pytest.approx(TextBlobBackend().polarities(PHRASES))
+
+
+def test_lexicon_without_numpy(lexicon_backend, monkeypatch):
+    texts = PHRASES + [text.lower() for text in TWEETS]
+    expected = lexicon_backend.polarities(texts)
+    monkeypatch.setattr(sentiment, 'np', None)
+    assert lexicon_backend.polarities(texts) == pytest.approx(expected)
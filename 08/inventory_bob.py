@@ -1,10 +1,9 @@
-from collections import defaultdict, namedtuple
+from inventory_store import InventoryStore
 
 NUM_ITEMS = 5
 ROOMS = 'study living_room master_bedroom'.split()
 
-Item = namedtuple('Item', 'name value')
-inventory = defaultdict(list)
+inventory = InventoryStore()
 
 
 def get_name():
@@ -28,10 +27,8 @@ def get_value():
 
 
 def calc_totals(inventory):
-    totals = {}
-    for room, items in inventory.items():
-        totals[room] = sum(it.value for it in items)
-    return totals
+    """Subtotal per room, kept up to date by the store on every change"""
+    return inventory.totals()
 
 
 if __name__ == "__main__":
@@ -41,15 +38,14 @@ if __name__ == "__main__":
             print('* Item #{}:'.format(i + 1))
             name = get_name()
             value = get_value()
-            item = Item(name, value)
-            inventory[room].append(item)
+            inventory.add(room, name, value)
 
     totals = calc_totals(inventory)
 
     fmt = '{:<15}: {:>5}'
-    for room, items in inventory.items():
+    for room in inventory.rooms():
         print('\n* Room: {}'.format(room))
-        for it in items:
+        for it in inventory.room_items(room):
             print(fmt.format(it.name, it.value))
         print('--')
         print(fmt.format('Subtotal', totals[room]))
@@ -0,0 +1,162 @@
+"""SQLite backed inventory: items are indexed by room and name, per room
+subtotals are kept up to date by triggers, and savepoints make undoing
+a batch of changes cost as much as the changes, not the inventory"""
+from collections import namedtuple
+from contextlib import contextmanager
+from itertools import count
+import sqlite3
+
+Item = namedtuple('Item', 'name value')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY,
+    room TEXT NOT NULL DEFAULT '',
+    name TEXT NOT NULL,
+    value INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS items_room ON items (room);
+CREATE INDEX IF NOT EXISTS items_name ON items (name);
+
+CREATE TABLE IF NOT EXISTS room_totals (
+    room TEXT NOT NULL PRIMARY KEY,
+    subtotal INTEGER NOT NULL,
+    items INTEGER NOT NULL,
+    first_id INTEGER NOT NULL
+);
+
+CREATE TRIGGER IF NOT EXISTS items_insert AFTER INSERT ON items BEGIN
+    INSERT INTO room_totals VALUES (NEW.room, NEW.value, 1, NEW.id)
+    ON CONFLICT (room) DO UPDATE SET subtotal = subtotal + NEW.value,
+                                     items = items + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS items_delete AFTER DELETE ON items BEGIN
+    UPDATE room_totals SET subtotal = subtotal - OLD.value, items = items - 1
+    WHERE room = OLD.room;
+    DELETE FROM room_totals WHERE room = OLD.room AND items = 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS items_update AFTER UPDATE OF room, value ON items
+BEGIN
+    UPDATE room_totals SET subtotal = subtotal - OLD.value, items = items - 1
+    WHERE room = OLD.room;
+    DELETE FROM room_totals WHERE room = OLD.room AND items = 0;
+    INSERT INTO room_totals VALUES (NEW.room, NEW.value, 1, NEW.id)
+    ON CONFLICT (room) DO UPDATE SET subtotal = subtotal + NEW.value,
+                                     items = items + 1;
+END;
+'''
+
+
+class InventoryStore(object):
+    """Items (room, name, value) in SQLite, in memory by default. Also
+    behaves like the list of item dicts it replaces: len(), iteration
+    in id order, append() and pop()"""
+
+    def __init__(self, path=':memory:', items=()):
+        # autocommit, transactions are our own savepoints
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        self.conn.executescript(SCHEMA)
+        self._savepoints = count()
+        for item in items:
+            self.append(item)
+
+    def add(self, room, name, value):
+        """Add an item, returns its id"""
+        cursor = self.conn.execute(
+            'INSERT INTO items (room, name, value) VALUES (?, ?, ?)',
+            (room, name, value))
+        return cursor.lastrowid
+
+    def delete(self, item_id):
+        self.conn.execute('DELETE FROM items WHERE id = ?', (item_id,))
+
+    def update(self, item_id, **fields):
+        """Change the room, name and/or value of an item"""
+        unknown = set(fields) - {'room', 'name', 'value'}
+        if unknown:
+            raise ValueError('Unknown fields: {}'.format(', '.join(unknown)))
+        assignments = ', '.join('{} = ?'.format(field) for field in fields)
+        self.conn.execute('UPDATE items SET {} WHERE id = ?'.format(assignments),
+                          list(fields.values()) + [item_id])
+
+    def room_items(self, room):
+        return [Item(*row) for row in self.conn.execute(
+            'SELECT name, value FROM items WHERE room = ? ORDER BY id', (room,))]
+
+    def find(self, name):
+        """[(id, room, Item)] of the items called name"""
+        return [(item_id, room, Item(name, value))
+                for item_id, room, value in self.conn.execute(
+                    'SELECT id, room, value FROM items WHERE name = ? '
+                    'ORDER BY id', (name,))]
+
+    def rooms(self):
+        """Rooms with items, in the order they got their first item"""
+        return [room for room, in self.conn.execute(
+            'SELECT room FROM room_totals ORDER BY first_id')]
+
+    def totals(self):
+        """{room: sum of item values}, read from the running subtotals"""
+        return dict(self.conn.execute(
+            'SELECT room, subtotal FROM room_totals ORDER BY first_id'))
+
+    def total(self):
+        return self.conn.execute(
+            'SELECT COALESCE(SUM(subtotal), 0) FROM room_totals').fetchone()[0]
+
+    def savepoint(self):
+        """Start a (nested) savepoint, returns its name"""
+        name = 'sp{}'.format(next(self._savepoints))
+        self.conn.execute('SAVEPOINT {}'.format(name))
+        return name
+
+    def release(self, name):
+        """Keep the changes since savepoint name"""
+        self.conn.execute('RELEASE {}'.format(name))
+
+    def rollback(self, name):
+        """Undo the changes since savepoint name"""
+        self.conn.execute('ROLLBACK TO {}'.format(name))
+        self.conn.execute('RELEASE {}'.format(name))
+
+    @contextmanager
+    def transaction(self, rollback=False):
+        """Changes in the block are undone if it raises, or always with
+        rollback=True (a throwaway copy for tests)"""
+        name = self.savepoint()
+        try:
+            yield self
+        except BaseException:
+            self.rollback(name)
+            raise
+        if rollback:
+            self.rollback(name)
+        else:
+            self.release(name)
+
+    # the list of item dicts interface
+    def __len__(self):
+        return self.conn.execute(
+            'SELECT COALESCE(SUM(items), 0) FROM room_totals').fetchone()[0]
+
+    def __iter__(self):
+        cursor = self.conn.execute(
+            'SELECT id, room, name, value FROM items ORDER BY id')
+        for item_id, room, name, value in cursor:
+            yield {'id': item_id, 'room': room, 'name': name, 'value': value}
+
+    def append(self, item):
+        self.conn.execute(
+            'INSERT INTO items (id, room, name, value) VALUES (?, ?, ?, ?)',
+            (item.get('id'), item.get('room', ''), item['name'], item['value']))
+
+    def pop(self):
+        """Remove and return the item with the highest id"""
+        row = self.conn.execute('SELECT id, room, name, value FROM items '
+                                'ORDER BY id DESC LIMIT 1').fetchone()
+        if row is None:
+            raise IndexError('pop from empty inventory')
+        self.delete(row[0])
+        return dict(zip(('id', 'room', 'name', 'value'), row))
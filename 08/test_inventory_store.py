@@ -0,0 +1,152 @@
+import random
+
+import pytest
+
+from inventory_store import InventoryStore, Item
+
+STEPS = 300
+ROOMS = 'study living_room master_bedroom'.split()
+
+
+@pytest.fixture
+def store():
+    store = InventoryStore()
+    store.add('study', 'laptop', 1000)
+    store.add('study', 'chair', 300)
+    store.add('living_room', 'tv', 800)
+    return store
+
+
+def recomputed(store):
+    """{room: (subtotal, items)} summed from the items table"""
+    return {room: (subtotal, items) for room, subtotal, items in
+            store.conn.execute('SELECT room, SUM(value), COUNT(*) '
+                               'FROM items GROUP BY room')}
+
+
+def check_totals(store):
+    kept = {room: (subtotal, items) for room, subtotal, items in
+            store.conn.execute('SELECT room, subtotal, items '
+                               'FROM room_totals')}
+    assert kept == recomputed(store)
+    assert store.totals() == {room: subtotal for room, (subtotal, _)
+                              in kept.items()}
+    assert store.total() == sum(item['value'] for item in store)
+    assert len(store) == len(list(store))
+
+
+def test_subtotals(store):
+    assert store.totals() == {'study': 1300, 'living_room': 800}
+    assert store.total() == 2100
+    assert store.rooms() == ['study', 'living_room']
+    assert store.room_items('study') == [Item('laptop', 1000),
+                                         Item('chair', 300)]
+
+    laptop, = store.find('laptop')
+    store.update(laptop[0], value=1200)
+    store.update(laptop[0], name='notebook')  # no totals change
+    assert store.totals() == {'study': 1500, 'living_room': 800}
+    tv_id = store.find('tv')[0][0]
+    store.delete(tv_id)
+    assert store.totals() == {'study': 1500}
+    assert store.rooms() == ['study']
+    check_totals(store)
+
+
+def test_room_moves(store):
+    chair_id = store.find('chair')[0][0]
+    store.update(chair_id, room='living_room')
+    assert store.totals() == {'study': 1000, 'living_room': 1100}
+    assert store.room_items('living_room') == [Item('chair', 300),
+                                               Item('tv', 800)]
+
+    # the last item leaving a room removes it, a new room comes last
+    tv_id = store.find('tv')[0][0]
+    store.update(chair_id, room='attic', value=50)
+    store.update(tv_id, room='attic')
+    assert store.rooms() == ['study', 'attic']
+    assert store.totals() == {'study': 1000, 'attic': 850}
+    check_totals(store)
+
+
+def test_savepoint_rollback(store):
+    outer = store.savepoint()
+    store.add('garage', 'bike', 500)
+    inner = store.savepoint()
+    store.delete(store.find('laptop')[0][0])
+    assert store.totals() == {'study': 300, 'living_room': 800,
+                              'garage': 500}
+    store.rollback(inner)
+    assert store.totals() == {'study': 1300, 'living_room': 800,
+                              'garage': 500}
+    store.rollback(outer)
+    assert store.totals() == {'study': 1300, 'living_room': 800}
+
+    name = store.savepoint()
+    store.add('garage', 'bike', 500)
+    store.release(name)
+    assert store.totals()['garage'] == 500
+    check_totals(store)
+
+
+def test_transaction(store):
+    with store.transaction(rollback=True) as copy:
+        copy.pop()
+        assert len(copy) == 2
+    assert len(store) == 3
+
+    with pytest.raises(KeyError):
+        with store.transaction():
+            store.add('garage', 'bike', 500)
+            raise KeyError('bike')
+    assert 'garage' not in store.totals()
+
+    with store.transaction():
+        store.add('garage', 'bike', 500)
+    assert store.totals()['garage'] == 500
+    check_totals(store)
+
+
+def test_list_interface():
+    store = InventoryStore(items=[{'id': 1, 'name': 'laptop', 'value': 1000},
+                                  {'id': 2, 'name': 'chair', 'value': 300}])
+    assert len(store) == 2
+    store.append({'name': 'book', 'value': 20})
+    assert [item['id'] for item in store] == [1, 2, 3]
+    assert store.pop() == {'id': 3, 'room': '', 'name': 'book', 'value': 20}
+    assert store.totals() == {'': 1300}
+    store.pop()
+    store.pop()
+    with pytest.raises(IndexError):
+        store.pop()
+    with pytest.raises(ValueError):
+        store.update(1, colour='red')
+
+
+def test_random_changes_keep_totals(store):
+    rng = random.Random(0)
+    savepoints = []
+    for step in range(STEPS):
+        ids = [item['id'] for item in store]
+        action = rng.choice(['add', 'add', 'delete', 'move', 'value',
+                             'savepoint', 'rollback', 'release'])
+        if action == 'add' or not ids and action in ('delete', 'move',
+                                                     'value'):
+            store.add(rng.choice(ROOMS), 'item{}'.format(step),
+                      rng.randint(1, 1000))
+        elif action == 'delete':
+            store.delete(rng.choice(ids))
+        elif action == 'move':
+            store.update(rng.choice(ids), room=rng.choice(ROOMS))
+        elif action == 'value':
+            store.update(rng.choice(ids), value=rng.randint(1, 1000))
+        elif action == 'savepoint':
+            savepoints.append((store.savepoint(), recomputed(store)))
+        elif savepoints:
+            name, before = savepoints.pop()
+            if action == 'rollback':
+                store.rollback(name)
+                assert recomputed(store) == before
+            else:
+                store.release(name)
+        check_totals(store)
@@ -1,7 +1,9 @@
 # took the data structure from
 # https://github.com/pybites/blog_code/blob/master/flaskapi/app.py
+# inventory_store.py links to the 08 inventory challenge's store
+from inventory_store import InventoryStore
 
-items = [
+items = InventoryStore(items=[
     {
         'id': 1,
         'name': 'laptop',
@@ -17,4 +19,4 @@ items = [
         'name': 'book',
         'value': 20,
     },
-]
+])
@@ -0,0 +1 @@
+../08/inventory_store.py
\ No newline at end of file
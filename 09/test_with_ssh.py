@@ -0,0 +1,148 @@
+import socket
+import threading
+import time
+
+import paramiko
+import pytest
+
+from with_ssh import SSHPool
+
+USER, PASSWORD = 'bob', 'secret'
+HOST_KEY = paramiko.RSAKey.generate(1024)
+
+
+class StubServer(paramiko.ServerInterface):
+    """In-process sshd: password auth, 'cat /etc/hostname', 'cat latin1.txt'
+    (not utf-8) and 'false'"""
+
+    def check_auth_password(self, username, password):
+        if (username, password) == (USER, PASSWORD):
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def get_allowed_auths(self, username):
+        return 'password'
+
+    def check_channel_request(self, kind, chanid):
+        return paramiko.OPEN_SUCCEEDED
+
+    def check_channel_exec_request(self, channel, command):
+        threading.Thread(target=self._exec, args=(channel, command),
+                         daemon=True).start()
+        return True
+
+    @staticmethod
+    def _exec(channel, command):
+        time.sleep(0.05)  # let the transport send the exec request reply
+        if command == b'cat /etc/hostname':
+            channel.sendall(b'stubhost\n')
+            channel.send_exit_status(0)
+        elif command == b'cat latin1.txt':
+            channel.sendall(b'caf\xe9\n')
+            channel.sendall_stderr(b'\xff\n')
+            channel.send_exit_status(0)
+        else:
+            channel.sendall_stderr(b'unknown command\n')
+            channel.send_exit_status(1)
+        channel.close()
+
+
+def _serve(sock, transports):
+    while True:
+        try:
+            client, _ = sock.accept()
+        except OSError:
+            return
+        transport = paramiko.Transport(client)
+        transport.add_server_key(HOST_KEY)
+        transport.start_server(server=StubServer())
+        transports.append(transport)
+        threading.Thread(target=_accept_channels, args=(transport,),
+                         daemon=True).start()
+
+
+def _accept_channels(transport):
+    channels = []  # a channel that gets garbage collected is closed
+    while transport.is_active():
+        channel = transport.accept(1)
+        if channel is not None:
+            channels.append(channel)
+
+
+@pytest.fixture
+def sshd():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    sock.listen(16)
+    transports = []
+    threading.Thread(target=_serve, args=(sock, transports),
+                     daemon=True).start()
+    yield sock.getsockname()[1], transports
+    sock.close()
+    for transport in transports:
+        transport.close()
+
+
+def make_pool(port, **kwargs):
+    return SSHPool(USER, port=port, password=PASSWORD, look_for_keys=False,
+                   allow_agent=False, **kwargs)
+
+
+def test_sessions_get_reused(sshd):
+    port, _ = sshd
+    with make_pool(port) as pool:
+        for _ in range(3):
+            result = pool.exec_command('127.0.0.1', 'cat /etc/hostname')
+            assert result.stdout == 'stubhost\n'
+            assert result.exit_status == 0
+        assert pool.connections == 1
+        failed = pool.exec_command('127.0.0.1', 'false')
+        assert (failed.exit_status, failed.stderr) == (1, 'unknown command\n')
+        assert pool.connections == 1
+
+
+def test_undecodable_output(sshd):
+    port, _ = sshd
+    with make_pool(port) as pool:
+        result = pool.exec_command('127.0.0.1', 'cat latin1.txt')
+        assert result.error is None
+        assert (result.stdout, result.stderr) == ('caf\ufffd\n', '\ufffd\n')
+
+
+def test_run_many_hosts(sshd):
+    port, _ = sshd
+    hosts = ['127.0.0.1', 'localhost'] * 4
+    with make_pool(port) as pool:
+        results = list(pool.run(hosts, 'cat /etc/hostname', max_workers=4))
+        assert len(results) == len(hosts)
+        assert all(r.stdout == 'stubhost\n' for r in results)
+        assert pool.connections <= 2 * 4  # per host, at most one per worker
+
+        connections = pool.connections
+        list(pool.run(hosts[:2], 'cat /etc/hostname', max_workers=2))
+        assert pool.connections == connections
+
+
+def test_idle_ttl_and_dead_sessions(sshd):
+    port, transports = sshd
+    with make_pool(port, ttl=0.05) as pool:
+        pool.exec_command('127.0.0.1', 'cat /etc/hostname')
+        time.sleep(0.1)
+        pool.exec_command('127.0.0.1', 'cat /etc/hostname')
+        assert pool.connections == 2  # the idle one expired
+
+        transports[-1].close()  # server drops the connection
+        time.sleep(0.1)
+        result = pool.exec_command('127.0.0.1', 'cat /etc/hostname')
+        assert result.stdout == 'stubhost\n'
+        assert pool.connections == 3
+
+
+def test_auth_failure_is_a_result(sshd):
+    port, _ = sshd
+    pool = SSHPool('mallory', port=port, password='guess',
+                   look_for_keys=False, allow_agent=False)
+    result = pool.exec_command('127.0.0.1', 'cat /etc/hostname')
+    assert result.exit_status is None
+    assert isinstance(result.error, paramiko.AuthenticationException)
+    pool.close()
@@ -1,8 +1,15 @@
 #!python3
 # with_ssh is a script to connect to a server and run a command.
+# Sessions are pooled per (host, user): a with block borrows an idle
+# connection when there is one, so checks across a fleet pay the TCP
+# and SSH handshake once per host instead of once per command.
 
+from collections import defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from contextlib import contextmanager
 import os
+import threading
+import time
 
 import paramiko
 
@@ -10,18 +17,130 @@ server = os.environ.get('SSH_SERVER')
 username = os.environ.get('SSH_USER')
 password = os.environ.get('SSH_PASSWORD')
 
+IDLE_TTL = 60  # seconds an unused session stays open
+MAX_WORKERS = 16  # hosts handled at the same time by SSHPool.run
+TIMEOUT = 10
+
+Result = namedtuple('Result', 'host exit_status stdout stderr error')
+
+
+def connect(host, user, port=22, **kwargs):
+    ssh = paramiko.SSHClient()
+    ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    ssh.connect(host, port=port, username=user, timeout=TIMEOUT, **kwargs)
+    return ssh
+
+
+class SSHPool(object):
+    """Open SSH sessions keyed by (host, user). Idle sessions are kept
+    for ttl seconds, dead or expired ones get closed. Use it as a context
+    manager to close everything at the end. connect_kwargs (password,
+    port, pkey ..) go to connect()"""
+
+    def __init__(self, user=None, ttl=IDLE_TTL, connect=connect,
+                 **connect_kwargs):
+        self.user = user
+        self.ttl = ttl
+        self.connect = connect
+        self.connect_kwargs = connect_kwargs
+        self.idle = defaultdict(list)  # (host, user) -> [(since, ssh)]
+        self.lock = threading.Lock()
+        self.connections = 0  # handshakes done, to see the pool working
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @staticmethod
+    def _is_alive(ssh):
+        transport = ssh.get_transport()
+        return transport is not None and transport.is_active()
+
+    def _expired(self, now):
+        """Pop the idle sessions past their ttl, close them unlocked"""
+        expired = []
+        for key, sessions in self.idle.items():
+            expired.extend(ssh for since, ssh in sessions
+                           if now - since > self.ttl)
+            sessions[:] = [(since, ssh) for since, ssh in sessions
+                           if now - since <= self.ttl]
+        return expired
+
+    def _checkout(self, key):
+        with self.lock:
+            expired = self._expired(time.monotonic())
+            sessions = self.idle[key]
+            ssh = sessions.pop()[1] if sessions else None
+        for old in expired:
+            old.close()
+        while ssh is not None and not self._is_alive(ssh):
+            ssh.close()
+            with self.lock:
+                ssh = self.idle[key].pop()[1] if self.idle[key] else None
+        if ssh is None:
+            ssh = self.connect(key[0], key[1], **self.connect_kwargs)
+            with self.lock:
+                self.connections += 1
+        return ssh
+
+    @contextmanager
+    def session(self, host, user=None):
+        """Yield a connected SSHClient for host, returned to the pool
+        afterwards unless the block raised"""
+        key = (host, user or self.user)
+        ssh = self._checkout(key)
+        try:
+            yield ssh
+        except BaseException:
+            ssh.close()  # might be in a broken state
+            raise
+        with self.lock:
+            self.idle[key].append((time.monotonic(), ssh))
+
+    def exec_command(self, host, command, user=None):
+        """Run command on host, returns a Result (error is set and the
+        rest None when it failed to connect or run). Output that isn't
+        valid utf-8 gets U+FFFD replacement characters"""
+        try:
+            with self.session(host, user) as ssh:
+                _, stdout, stderr = ssh.exec_command(command, timeout=TIMEOUT)
+                out = stdout.read().decode(errors='replace')
+                err = stderr.read().decode(errors='replace')
+                return Result(host, stdout.channel.recv_exit_status(),
+                              out, err, None)
+        except (paramiko.SSHException, OSError) as exc:
+            return Result(host, None, None, None, exc)
+
+    def run(self, hosts, command, user=None, max_workers=MAX_WORKERS):
+        """Run command on all hosts, at most max_workers at a time,
+        yielding the Results as they come in"""
+        with ThreadPoolExecutor(max_workers) as pool:
+            futures = [pool.submit(self.exec_command, host, command, user)
+                       for host in hosts]
+            for future in as_completed(futures):
+                yield future.result()
+
+    def close(self):
+        with self.lock:
+            sessions = [ssh for idle in self.idle.values() for _, ssh in idle]
+            self.idle.clear()
+        for ssh in sessions:
+            ssh.close()
+
+
+pool = SSHPool(username, password=password)
+
 
 @contextmanager
 def check_hostname(host):
-    try:
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        ssh.connect(host, username=username, password=password)
+    with pool.session(host) as ssh:
         yield ssh
-    finally:
-        ssh.close()
 
 
-with check_hostname(server) as ssh:
-    ssh_stdin, ssh_stdout, ssh_stderr = ssh.exec_command('cat /etc/hostname')
-    print('%s' % ssh_stdout.readlines())
+if __name__ == '__main__':
+    with check_hostname(server) as ssh:
+        ssh_stdin, ssh_stdout, ssh_stderr = ssh.exec_command('cat /etc/hostname')
+        print('%s' % ssh_stdout.readlines())
+    pool.close()
@@ -1,14 +1,16 @@
 from contextlib import contextmanager
-from copy import deepcopy
 
 import app
 
 
 @contextmanager
 def copy_db():
-    backup = deepcopy(app.items)
-    yield app.items
-    app.items = backup
+    # undo the changes with a savepoint instead of copying all items
+    savepoint = app.items.savepoint()
+    try:
+        yield app.items
+    finally:
+        app.items.rollback(savepoint)
 
 
 def test_post():
@@ -24,3 +26,15 @@ def test_delete():
         db.pop()
         assert len(db) == 2
     assert len(app.items) == 3
+
+
+def test_subtotals_rolled_back():
+    assert app.items.totals() == {'': 1320}
+    with copy_db() as db:
+        db.add('office', 'screen', 200)
+        db.pop()
+        db.pop()
+        assert db.totals() == {'': 1300}
+        assert db.find('laptop')[0][0] == 1
+    assert app.items.totals() == {'': 1320}
+    assert [item['name'] for item in app.items] == ['laptop', 'chair', 'book']
@@ -1,16 +1,14 @@
-from copy import deepcopy
-
 import app
 
 
 class CopyDb():
 
     def __enter__(self):
-        self.backup = deepcopy(app.items)
+        self.savepoint = app.items.savepoint()
         return app.items
 
     def __exit__(self, *args):
-        app.items = self.backup
+        app.items.rollback(self.savepoint)
 
 
 def test_post():
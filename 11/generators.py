@@ -15,8 +15,18 @@ $ for i in ../*/*py; do grep ^import $i|sed 's/import //g' ; done | sort | uniq
    1 datetime
 """
 from collections import Counter
+from concurrent.futures import (FIRST_COMPLETED, ProcessPoolExecutor,
+                                ThreadPoolExecutor, wait)
 from glob import iglob
+from itertools import islice
+import os
 import re
+import sys
+
+IMPORT_PATTERN = re.compile(r'^import (\w+)')
+BUFFER_SIZE = 64 * 1024  # per open file, lines are read lazily
+BATCH_SIZE = 16  # files per task, one task per file is mostly overhead
+MAX_PENDING = 4  # batches in flight per worker, bounds memory on huge globs
 
 
 def gen_files(pat):
@@ -25,8 +35,8 @@ def gen_files(pat):
 
 def gen_lines(files):
     for fi in files:
-        with open(fi) as f:
-            yield from f.readlines()
+        with open(fi, buffering=BUFFER_SIZE) as f:
+            yield from f
 
 
 def gen_grep(lines, pattern):
@@ -40,9 +50,56 @@ def gen_count(modules):
     yield from Counter(modules).most_common()
 
 
+def count_files(files, pattern):
+    """gen_lines + gen_grep fused for a batch of files, returns a partial
+    Counter (runs in the pool workers)"""
+    return Counter(gen_grep(gen_lines(files), pattern))
+
+
+def gen_count_parallel(files, pattern, workers=None, processes=False,
+                       batch_size=BATCH_SIZE):
+    """Same output as gen_count(gen_grep(gen_lines(files), pattern)),
+    ties included, but files are read and grepped on a thread (or
+    process) pool in batches of batch_size, merging the partial Counters
+    as they come in. files is consumed lazily, at most MAX_PENDING
+    batches per worker are queued at any time"""
+    workers = workers or os.cpu_count() or 1
+    executor = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    files = iter(files)
+    batches = enumerate(iter(lambda: list(islice(files, batch_size)), []))
+    total = Counter()
+    first_seen = {}  # module -> (batch number, index in its Counter)
+    with executor(workers) as pool:
+        numbers = {pool.submit(count_files, batch, pattern): number
+                   for number, batch in islice(batches, MAX_PENDING * workers)}
+        pending = set(numbers)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                counts = future.result()
+                total.update(counts)
+                number = numbers.pop(future)
+                for index, module in enumerate(counts):
+                    seen = first_seen.get(module, (number, index))
+                    first_seen[module] = min(seen, (number, index))
+            for number, batch in islice(batches, len(done)):
+                future = pool.submit(count_files, batch, pattern)
+                numbers[future] = number
+                pending.add(future)
+    # most_common() orders ties by first occurrence, like the serial run
+    yield from sorted(total.items(),
+                      key=lambda item: (-item[1], first_seen[item[0]]))
+
+
 if __name__ == "__main__":
-    files = gen_files('../*/*.py')
-    lines = gen_lines(files)
-    modules = gen_grep(lines, re.compile(r'^import (\w+)'))
-    for mod, count in gen_count(modules):
+    parallel = '--parallel' in sys.argv
+    args = [arg for arg in sys.argv[1:] if arg != '--parallel']
+    files = gen_files(args[0] if args else '../*/*.py')
+    if parallel:
+        counts = gen_count_parallel(files, IMPORT_PATTERN, processes=True)
+    else:
+        lines = gen_lines(files)
+        modules = gen_grep(lines, IMPORT_PATTERN)
+        counts = gen_count(modules)
+    for mod, count in counts:
         print('{:<2} {}'.format(count, mod))
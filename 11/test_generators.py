@@ -0,0 +1,50 @@
+import os
+import random
+
+import pytest
+
+from generators import (IMPORT_PATTERN, gen_count, gen_count_parallel,
+                        gen_files, gen_grep, gen_lines)
+
+MODULES = ['os', 'sys', 're', 'csv', 'json', 'time', 'random', 'itertools']
+
+
+@pytest.fixture(scope='module')
+def tree(tmp_path_factory):
+    '''A few dirs of scripts with random imports, plenty of tied counts'''
+    rng = random.Random(0)
+    root = tmp_path_factory.mktemp('challenges')
+    for num in range(12):
+        folder = root / '{:02}'.format(num)
+        folder.mkdir()
+        for script in range(rng.randint(0, 9)):
+            lines = ['import {}\n'.format(rng.choice(MODULES))
+                     for _ in range(rng.randint(0, 4))]
+            lines.append('from os import path\n    import nested\n')
+            (folder / 'script{}.py'.format(script)).write_text(''.join(lines))
+    return os.path.join(str(root), '*', '*.py')
+
+
+def serial(pattern):
+    files = sorted(gen_files(pattern))
+    return list(gen_count(gen_grep(gen_lines(files), IMPORT_PATTERN)))
+
+
+@pytest.mark.parametrize('workers, batch_size', [(1, 1), (2, 3), (4, 16)])
+def test_gen_count_parallel_threads(tree, workers, batch_size):
+    files = sorted(gen_files(tree))
+    counts = list(gen_count_parallel(files, IMPORT_PATTERN, workers=workers,
+                                     batch_size=batch_size))
+    assert counts == serial(tree)
+    assert 'nested' not in dict(counts)
+
+
+def test_gen_count_parallel_processes(tree):
+    files = iter(sorted(gen_files(tree)))
+    counts = list(gen_count_parallel(files, IMPORT_PATTERN, workers=2,
+                                     processes=True, batch_size=5))
+    assert counts == serial(tree)
+
+
+def test_gen_count_parallel_no_files():
+    assert list(gen_count_parallel([], IMPORT_PATTERN)) == []
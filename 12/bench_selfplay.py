@@ -0,0 +1,87 @@
+'''Self-play games/sec of the bitboard engine: perfect play against
+itself and against a random player on 3,3,3, and depth limited
+alpha-beta on an m,n,k board (15,15,5 gomoku by default)'''
+import random
+import sys
+import time
+
+from bitboard import MNKGame
+from tictactoe import WINNING_COMBINATIONS, WIN_MASKS
+
+NUM_GAMES = 10000
+NUM_MNK_GAMES = 3
+
+
+def play(engine, first, second, rng=None):
+    '''Play a game between two strategies ('engine' or 'random'), returns
+    1 or 2 for the winner, 0 for a draw'''
+    me = other = 0
+    players = (first, second)
+    for ply in range(engine.cells):
+        moves = engine.moves(me, other)
+        if players[ply % 2] == 'random':
+            cell = rng.choice(moves)
+        else:
+            cell = engine.best_move(me, other)
+        me, other = other, me | 1 << cell
+        if engine.wins_with(other, cell):
+            return ply % 2 + 1
+    return 0
+
+
+def bench(label, engine, games, first, second):
+    rng = random.Random(0)
+    results = [0, 0, 0]
+    start = time.perf_counter()
+    for _ in range(games):
+        results[play(engine, first, second, rng)] += 1
+    duration = time.perf_counter() - start
+    print('{:<28} {:>10.1f} games/sec  draws {} / wins {} / losses {}'.format(
+        label, games / duration, results[0], results[1], results[2]))
+    return results
+
+
+def bench_is_win(boards):
+    '''The old set per combination is_win against masks'''
+    def set_is_win(board):
+        for a, b, c in WINNING_COMBINATIONS:
+            combo_vals = set([board[a], board[b], board[c]])
+            if '_' not in combo_vals and len(combo_vals) == 1:
+                return True
+        return False
+
+    def mask_is_win(bits):
+        return any(b & mask == mask for b in bits for mask in WIN_MASKS)
+
+    as_bits = [tuple(sum(1 << (pos - 1) for pos in range(1, 10)
+                         if board[pos] == player) for player in 'XO')
+               for board in boards]
+    for label, func, args in (('is_win, sets', set_is_win, boards),
+                              ('is_win, 8 mask ANDs', mask_is_win, as_bits)):
+        start = time.perf_counter()
+        wins = sum(map(func, args))
+        duration = time.perf_counter() - start
+        print('{:<28} {:>10.0f} checks/sec  ({} wins)'.format(
+            label, len(args) / duration, wins))
+
+
+if __name__ == "__main__":
+    games = int(sys.argv[1]) if len(sys.argv) > 1 else NUM_GAMES
+    mnk = tuple(map(int, sys.argv[2].split(','))) if len(sys.argv) > 2 \
+        else (15, 15, 5)
+
+    rng = random.Random(0)
+    bench_is_win([[None] + [rng.choice('XO_') for _ in range(9)]
+                  for _ in range(games * 10)])
+
+    engine = MNKGame(3, 3, 3)
+    start = time.perf_counter()
+    solved = engine.solve()
+    print('solved {} positions in {:.3f} s'.format(
+        len(solved), time.perf_counter() - start))
+    bench('engine vs engine', engine, games, 'engine', 'engine')
+    bench('engine vs random', engine, games, 'engine', 'random')
+    bench('random vs engine', engine, games, 'random', 'engine')
+
+    bench('{},{},{} engine vs engine'.format(*mnk), MNKGame(*mnk),
+          NUM_MNK_GAMES, 'engine', 'engine')
@@ -0,0 +1,181 @@
+'''Bitboard engine for m,n,k games: an m rows by n columns board where
+k in a row wins. Tic-tac-toe is 3,3,3 and gomoku 15,15,5.
+
+A position is two ints, the stones of the player to move and of the
+other player, cell row * n + col being bit 1 << (row * n + col). A win
+is a line mask fully covered: (bits & mask) == mask.
+'''
+
+WIN = 10 ** 9  # beats any evaluate() score, plus the empty cells left
+INF = float('inf')
+MAX_SOLVED_CELLS = 9  # boards up to this size get solved completely
+LOCAL_MOVES_FROM = 36  # on boards this big only search next to stones
+EXACT, LOWER, UPPER = 0, 1, 2  # transposition table entry kinds
+
+
+def popcount(bits):
+    return bin(bits).count('1')
+
+
+class MNKGame:
+
+    def __init__(self, m=3, n=3, k=3):
+        self.m, self.n, self.k = m, n, k
+        self.cells = m * n
+        self.full = (1 << self.cells) - 1
+        self.lines = []
+        for row in range(m):
+            for col in range(n):
+                for drow, dcol in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                    end_row = row + drow * (k - 1)
+                    end_col = col + dcol * (k - 1)
+                    if 0 <= end_row < m and 0 <= end_col < n:
+                        self.lines.append(sum(
+                            1 << ((row + drow * i) * n + col + dcol * i)
+                            for i in range(k)))
+        self.lines_through = [[line for line in self.lines if line >> cell & 1]
+                              for cell in range(self.cells)]
+        self.neighbours = [self._neighbours(cell) for cell in range(self.cells)]
+        # cells on more lines first, center and corners for tic-tac-toe
+        self.order = sorted(range(self.cells),
+                            key=lambda cell: -len(self.lines_through[cell]))
+        self.weights = [0] + [4 ** i for i in range(1, k + 1)]
+        self.table = {}  # transposition table of search()
+        self.nodes = self.tt_hits = 0  # positions searched / taken from table
+        self.solved = None  # exact values of all positions, see solve()
+
+    def _neighbours(self, cell):
+        row, col = divmod(cell, self.n)
+        return sum(1 << (r * self.n + c)
+                   for r in range(max(row - 1, 0), min(row + 2, self.m))
+                   for c in range(max(col - 1, 0), min(col + 2, self.n)))
+
+    def won(self, bits):
+        return any(bits & line == line for line in self.lines)
+
+    def wins_with(self, bits, cell):
+        '''Is there a line through cell in bits, cheaper than won()'''
+        return any(bits & line == line for line in self.lines_through[cell])
+
+    def moves(self, me, other):
+        '''Empty cells in search order, on big boards only those next
+        to a stone'''
+        taken = me | other
+        if self.cells < LOCAL_MOVES_FROM:
+            return [cell for cell in self.order if not taken >> cell & 1]
+        if not taken:
+            return [self.order[0]]
+        near = 0
+        for cell in range(self.cells):
+            if taken >> cell & 1:
+                near |= self.neighbours[cell]
+        near &= ~taken
+        return [cell for cell in self.order if near >> cell & 1]
+
+    def evaluate(self, me, other):
+        '''Heuristic score for the player to move: 4 ** stones for each
+        line only they have stones on, minus the same for the other'''
+        score = 0
+        weights = self.weights
+        for line in self.lines:
+            mine, theirs = me & line, other & line
+            if mine and not theirs:
+                score += weights[popcount(mine)]
+            elif theirs and not mine:
+                score -= weights[popcount(theirs)]
+        return score
+
+    def solve(self):
+        '''{(me, other): exact value} of every position reachable from
+        the empty board (5,478 for tic-tac-toe), computed once. Each
+        runs search() with a full window to its number of empty cells,
+        fullest boards first, so the positions after it are already
+        exact in the transposition table. A win scores WIN plus the
+        empty cells left so quicker wins and slower losses are preferred'''
+        if self.solved is not None:
+            return self.solved
+        plies = [[(0, 0)]]
+        seen = {(0, 0)}
+        while plies[-1]:
+            positions = []
+            for me, other in plies[-1]:
+                if self.won(other):
+                    continue
+                taken = me | other
+                for cell in range(self.cells):
+                    if not taken >> cell & 1:
+                        key = (other, me | 1 << cell)
+                        if key not in seen:
+                            seen.add(key)
+                            positions.append(key)
+            plies.append(positions)
+        solved = {}
+        for ply in range(len(plies) - 1, -1, -1):
+            empty = self.cells - ply
+            for me, other in plies[ply]:
+                if self.won(other):
+                    solved[(me, other)] = -(WIN + empty)
+                else:
+                    solved[(me, other)] = self.search(me, other, empty)
+        self.solved = solved
+        return solved
+
+    def search(self, me, other, depth, alpha=-INF, beta=INF):
+        '''Negamax with alpha-beta pruning, positions stored in the
+        transposition table as exact values or bounds'''
+        key = (me, other)
+        entry = self.table.get(key)
+        if entry is not None and entry[0] >= depth:
+            _, kind, value = entry
+            if kind == EXACT:
+                self.tt_hits += 1
+                return value
+            if kind == LOWER:
+                alpha = max(alpha, value)
+            else:
+                beta = min(beta, value)
+            if alpha >= beta:
+                self.tt_hits += 1
+                return value
+        self.nodes += 1
+        moves = self.moves(me, other)
+        if not moves:
+            return 0
+        if depth == 0:
+            return self.evaluate(me, other)
+        empty = self.cells - popcount(me | other) - 1
+        start_alpha, best = alpha, -INF
+        for cell in moves:
+            bits = me | 1 << cell
+            if self.wins_with(bits, cell):
+                value = WIN + empty
+            else:
+                value = -self.search(other, bits, depth - 1, -beta, -alpha)
+            if value > best:
+                best = value
+                alpha = max(alpha, value)
+                if alpha >= beta:
+                    break
+        kind = (UPPER if best <= start_alpha else
+                LOWER if best >= beta else EXACT)
+        self.table[key] = (depth, kind, best)
+        return best
+
+    def best_move(self, me, other, depth=2):
+        '''Cell for the player to move, perfect on boards up to
+        MAX_SOLVED_CELLS, otherwise searching depth moves ahead'''
+        if self.cells <= MAX_SOLVED_CELLS:
+            solved = self.solve()
+            return max(self.moves(me, other),
+                       key=lambda cell: -solved[(other, me | 1 << cell)])
+        self.table.clear()  # bounds memory, entries are cheap to redo
+        best, best_value, alpha = None, -INF, -INF
+        for cell in self.moves(me, other):
+            bits = me | 1 << cell
+            if self.wins_with(bits, cell):
+                return cell
+            value = -self.search(other, bits, depth - 1, -INF, -alpha)
+            if value > best_value:
+                best, best_value = cell, value
+                alpha = max(alpha, value)
+        return best
@@ -0,0 +1,130 @@
+import pytest
+
+from bitboard import EXACT, LOWER, UPPER, WIN, MNKGame
+from tictactoe import WIN_MASKS
+
+
+def bits(*cells):
+    return sum(1 << cell for cell in cells)
+
+
+def cells(game, row, col, drow, dcol, length):
+    return [(row + drow * i) * game.n + col + dcol * i for i in range(length)]
+
+
+@pytest.fixture(scope='module')
+def game():
+    return MNKGame(5, 6, 4)  # not square, k < m, n: all directions fit
+
+
+def test_tictactoe_lines():
+    assert sorted(MNKGame().lines) == sorted(WIN_MASKS)
+
+
+@pytest.mark.parametrize('start, direction', [
+    ((2, 1), (0, 1)),   # row
+    ((1, 5), (1, 0)),   # column
+    ((0, 2), (1, 1)),   # diagonal
+    ((1, 3), (1, -1)),  # anti-diagonal
+])
+def test_win_per_direction(game, start, direction):
+    line = cells(game, *start, *direction, game.k)
+    stones = bits(*line)
+    assert game.won(stones)
+    for cell in line:
+        assert game.wins_with(stones, cell)
+        assert not game.won(stones & ~(1 << cell))
+        assert not game.wins_with(stones & ~(1 << cell), cell)
+    # plus stones elsewhere, it's still that line
+    assert game.won(stones | bits(0, game.cells - 1))
+
+
+def test_no_win_across_the_edge(game):
+    # consecutive bits, but wrapping from the end of one row to the next
+    assert not game.won(bits(*range(4, 8)))
+    # a diagonal wrapping around the right edge
+    assert not game.won(bits(4, 4 + game.n + 1, 4 + 2 * (game.n + 1),
+                             4 + 3 * (game.n + 1)))
+    assert not game.won(0)
+
+
+def test_forced_win_tictactoe():
+    game = MNKGame()
+    me, other = bits(0, 2), bits(1, 3)  # X O X / O . . / . . .
+    assert not any(game.wins_with(me | 1 << cell, cell)
+                   for cell in game.moves(me, other))
+    # the center forks two lines, winning with 2 cells left
+    assert game.solve()[(me, other)] == WIN + 2
+    assert game.best_move(me, other) == 4
+    assert game.search(me, other, depth=3) == WIN + 2
+
+
+def test_forced_win_gomoku():
+    game = MNKGame(15, 15, 5)
+    row = 7 * game.n
+    me = bits(row + 5, row + 6, row + 7)  # open three in the middle row
+    other = bits(0, 14)
+    assert game.search(me, other, depth=3) >= WIN
+    cell = game.best_move(me, other, depth=3)
+    assert cell in (row + 4, row + 8)  # the open four
+    # which the other side loses against whatever they do
+    assert game.search(other, me | 1 << cell, depth=2) <= -WIN
+
+
+def test_transposition_table_hit():
+    game = MNKGame(4, 4, 3)
+    me, other = bits(5), bits(0)
+    value = game.search(me, other, depth=3)
+    assert game.table[(me, other)] == (3, EXACT, value)
+
+    calls = []
+    moves = game.moves
+    game.moves = lambda *args: calls.append(args) or moves(*args)
+    assert game.search(me, other, depth=3) == value
+    assert game.search(me, other, depth=2) == value  # deeper entry is fine
+    assert calls == []
+    game.search(me, other, depth=4)  # a shallower entry is not
+    assert calls[0] == (me, other)
+
+
+def test_transposition_table_bounds():
+    game = MNKGame(4, 4, 3)
+    me, other = bits(5), bits(0)
+    game.table[(me, other)] = (2, LOWER, 50)
+    assert game.search(me, other, depth=2, alpha=0, beta=40) == 50
+    game.table[(me, other)] = (2, UPPER, -50)
+    assert game.search(me, other, depth=2, alpha=-40, beta=0) == -50
+    assert (game.nodes, game.tt_hits) == (0, 2)
+    game.search(me, other, depth=2, alpha=-100, beta=0)  # bound in window
+    assert game.nodes > 0 and game.tt_hits == 2
+
+
+def negamax(game, me, other, values):
+    '''Plain memoised negamax, what solve() has to agree with'''
+    key = (me, other)
+    if key not in values:
+        taken = me | other
+        empty = game.cells - bin(taken).count('1')
+        if game.won(other):
+            values[key] = -(WIN + empty)
+        elif not empty:
+            values[key] = 0
+        else:
+            values[key] = max(-negamax(game, other, me | 1 << cell, values)
+                              for cell in range(game.cells)
+                              if not taken >> cell & 1)
+    return values[key]
+
+
+@pytest.mark.parametrize('mnk', [(3, 3, 3), (2, 4, 2), (3, 3, 2)])
+def test_solve(mnk):
+    game = MNKGame(*mnk)
+    values = {}
+    negamax(game, 0, 0, values)
+    solved = game.solve()
+    assert solved == values
+    assert game.solve() is solved
+    # positions after a move come from the table, not searched again
+    assert game.nodes < len(solved) and game.tt_hits > 0
+    if mnk == (3, 3, 3):
+        assert len(solved) == 5478 and solved[(0, 0)] == 0
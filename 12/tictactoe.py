@@ -2,15 +2,19 @@
                 7 8 9
                 4 5 6
                 1 2 3
+
+Add 'hard' to let the computer start, and m,n,k (like 15,15,5 for
+gomoku) to play on an m by n board where k in a row wins.
 '''
 
 from builtins import input
-from collections import Counter
 from functools import wraps
 import itertools
 import os
 import sys
 
+from bitboard import MNKGame
+
 DEFAULT = '_'
 VALID_POSITIONS = list(range(1, 10))
 WINNING_COMBINATIONS = (
@@ -18,9 +22,10 @@ WINNING_COMBINATIONS = (
     (7, 4, 1), (8, 5, 2), (9, 6, 3),
     (1, 5, 9), (7, 5, 3),
 )
-POSITION_VALUES = Counter(
-    itertools.chain(*WINNING_COMBINATIONS)
-)
+# position p is bit p - 1, so 1 2 3 is the first row of a 3,3,3 MNKGame
+WIN_MASKS = tuple(sum(1 << (pos - 1) for pos in combo)
+                  for combo in WINNING_COMBINATIONS)
+ENGINE = MNKGame(3, 3, 3)  # solves the game on the first ai_move
 PLAYER = 'O'
 COMPUTER = 'X'
 
@@ -38,6 +43,8 @@ class TicTacToe:
 
     def __init__(self):
         self.board = [None] + len(VALID_POSITIONS) * [DEFAULT]  # skip index 0
+        self.bits = {PLAYER: 0, COMPUTER: 0}
+        self.cells = len(VALID_POSITIONS)
 
     @clear_screen
     def __str__(self):
@@ -48,12 +55,12 @@ class TicTacToe:
         '''.format(*(self.board[7:] + self.board[4:7] + self.board[1:4]))
 
     def is_win(self):
-        for combo in WINNING_COMBINATIONS:
-            a, b, c = combo
-            combo_vals = set([self.board[a], self.board[b], self.board[c]])
-            if DEFAULT not in combo_vals and len(combo_vals) == 1:
-                return True
-        return False
+        return any(bits & mask == mask
+                   for bits in self.bits.values() for mask in WIN_MASKS)
+
+    def _place(self, pos, player):
+        self.board[pos] = player
+        self.bits[player] |= 1 << (pos - 1)
 
     def _get_pos(self):
         while True:
@@ -73,34 +80,10 @@ class TicTacToe:
             return False
         return True
 
-    def _update_board(self, combo, combo_vals):
-        index = combo_vals.index(DEFAULT)
-        empty_slot = combo[index]
-        self.board[empty_slot] = COMPUTER
-        return True
-
-    def _win_or_block(self):
-        for combo in WINNING_COMBINATIONS:
-            a, b, c = combo
-            combo_vals = [self.board[a], self.board[b], self.board[c]]
-            # can only use unitiated positions
-            if DEFAULT not in combo_vals:
-                continue
-            if combo_vals.count(COMPUTER) == 2:
-                return self._update_board(combo, combo_vals)
-            if combo_vals.count(PLAYER) == 2:
-                return self._update_board(combo, combo_vals)
-        return False
-
-    def _take_best_next_free_pos(self):
-        for pos, _ in POSITION_VALUES.most_common():
-            if self.board[pos] == DEFAULT:
-                self.board[pos] = COMPUTER
-                return True
-        return False
-
     def ai_move(self):
-        self._win_or_block() or self._take_best_next_free_pos()
+        '''Perfect play from the solved game'''
+        cell = ENGINE.best_move(self.bits[COMPUTER], self.bits[PLAYER])
+        self._place(cell + 1, COMPUTER)
 
     def manual_move(self):
         pos = self._get_pos()
@@ -108,7 +91,71 @@ class TicTacToe:
         if not valid:
             self.manual_move()
         else:
-            self.board[pos] = PLAYER
+            self._place(pos, PLAYER)
+
+
+class MNKTicTacToe(TicTacToe):
+    '''m rows of n cells where k in a row wins, 15,15,5 is gomoku. Moves
+    are "row col", 1 1 being the top left cell'''
+
+    def __init__(self, m, n, k, depth=2):
+        self.engine = MNKGame(m, n, k)
+        self.depth = depth  # moves the computer looks ahead
+        self.bits = {PLAYER: 0, COMPUTER: 0}
+        self.cells = m * n
+        self.last = None
+
+    @clear_screen
+    def __str__(self):
+        symbols = [DEFAULT] * self.cells
+        for player, bits in self.bits.items():
+            for cell in range(self.cells):
+                if bits >> cell & 1:
+                    symbols[cell] = player
+        n = self.engine.n
+        return '\n'.join(' '.join(symbols[row * n:(row + 1) * n])
+                         for row in range(self.engine.m)) + '\n'
+
+    def is_win(self):
+        return self.last is not None and any(
+            self.engine.wins_with(bits, self.last)
+            for bits in self.bits.values())
+
+    def _place(self, cell, player):
+        self.bits[player] |= 1 << cell
+        self.last = cell
+
+    def _get_pos(self):
+        while True:
+            try:
+                row, col = map(int, input('Next move (row col): ').split())
+                if 1 <= col <= self.engine.n:
+                    return (row - 1) * self.engine.n + col - 1
+                return -1
+            except ValueError:
+                print('Two numeric values please')
+
+    def _validate(self, cell):
+        if not 0 <= cell < self.cells:
+            print('Not on the {0.m}x{0.n} board'.format(self.engine))
+            return False
+        if (self.bits[PLAYER] | self.bits[COMPUTER]) >> cell & 1:
+            print('Position already taken by a previous move')
+            return False
+        return True
+
+    def ai_move(self):
+        self._place(self.engine.best_move(self.bits[COMPUTER],
+                                          self.bits[PLAYER], self.depth),
+                    COMPUTER)
+
+
+def new_game(args):
+    '''A TicTacToe, or an MNKTicTacToe when args has m,n,k (say 15,15,5)'''
+    for arg in args:
+        if arg.count(',') == 2:
+            return MNKTicTacToe(*map(int, arg.split(',')))
+    return TicTacToe()
 
 
 if __name__ == "__main__":
@@ -118,11 +165,11 @@ if __name__ == "__main__":
         first, second = PLAYER, COMPUTER
 
     while True:
-        game = TicTacToe()
+        game = new_game(sys.argv[1:])
 
         turns = itertools.cycle([first, second])
         print(game)
-        for _ in VALID_POSITIONS:
+        for _ in range(game.cells):
             player = next(turns)
             if player == COMPUTER:
                 game.ai_move()
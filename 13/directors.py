@@ -1,12 +1,32 @@
 import csv
+from array import array
+from bisect import bisect_left, insort
 from collections import defaultdict, namedtuple
+import hashlib
+import heapq
+import io
+import os
+import sys
+import time
+
+try:
+    import numpy as np
+except ImportError:  # optional, MovieStore.aggregate falls back to loops
+    np = None
 
 MOVIE_DATA = 'movie_metadata.csv'
+STORE_SUFFIX = '.columns'
+MAGIC = b'MOVIES1'
+STRING_SEP = '\0'
 NUM_TOP_DIRECTORS = 20
 MIN_MOVIES = 4
 MIN_YEAR = 1960
+FOLLOW_INTERVAL = 5  # seconds between checks for new csv rows
 
 Movie = namedtuple('Movie', 'title year score')
+Aggregates = namedtuple('Aggregates', 'counts means min_years')
+
+_stores = {}  # path -> (fingerprint, MovieStore), only read the file once
 
 
 def get_movies_by_director():
@@ -15,22 +35,30 @@ def get_movies_by_director():
     directors = defaultdict(list)
     with open(MOVIE_DATA) as f:
         for line in csv.DictReader(f):
-            try:
-                director = line['director_name']
-                movie = line['movie_title']
-                year = int(line['title_year'])
-                score = float(line['imdb_score'])
-            except ValueError:
+            row = _parse_row(line)
+            if row is None:
                 continue
-            if year and year < MIN_YEAR:
+            director, m = row
+            if m.year and m.year < MIN_YEAR:
                 continue
 
-            m = Movie(title=movie, year=year, score=score)
             directors[director].append(m)
 
     return directors
 
 
+def _parse_row(line):
+    '''(director, Movie) of a csv row, None if it has no valid year or score'''
+    try:
+        director = line['director_name']
+        movie = line['movie_title']
+        year = int(line['title_year'])
+        score = float(line['imdb_score'])
+    except ValueError:
+        return None
+    return director, Movie(title=movie, year=year, score=score)
+
+
 def get_average_scores(directors):
     '''Filter directors with < MIN_MOVIES and calculate averge score'''
     return { (director, _calc_mean(movies)): movies
@@ -45,29 +73,329 @@ def _calc_mean(movies):
     return round(mean, 1)
 
 
+class MovieStore:
+    """All movies of a csv file as typed columns: row i is the movie
+    titles[i] of directors[director_codes[i]], with years[i] in an
+    array('H') and scores[i] in an array('d'). Director codes follow
+    the order in which directors first appear in the csv. Rows before
+    MIN_YEAR are kept so queries can pick their own min_year"""
+
+    def __init__(self, directors, titles, director_codes, years, scores):
+        self.directors = directors
+        self.titles = titles
+        self.director_codes = director_codes
+        self.years = years
+        self.scores = scores
+        self._codes = {director: code for code, director in enumerate(directors)}
+        self._by_director = None
+        self._by_year = None
+
+    @classmethod
+    def build(cls, path=MOVIE_DATA):
+        codes = {}
+        titles = []
+        director_codes, years, scores = array('I'), array('H'), array('d')
+        with open(path) as f:
+            for line in csv.DictReader(f):
+                row = _parse_row(line)
+                if row is None:
+                    continue
+                director, movie = row
+                director_codes.append(codes.setdefault(director, len(codes)))
+                titles.append(movie.title)
+                years.append(movie.year)
+                scores.append(movie.score)
+        return cls(list(codes), titles, director_codes, years, scores)
+
+    @classmethod
+    def load(cls, path, fingerprint):
+        """Return the store saved in path or None if it is missing or
+        was built from another csv"""
+        try:
+            with open(path, 'rb') as f:
+                header = f.readline().split()
+                if header[:2] != [MAGIC, fingerprint.encode()]:
+                    return None
+                count, num_directors = int(header[2]), int(header[3])
+                director_codes, years, scores = array('I'), array('H'), array('d')
+                director_codes.fromfile(f, count)
+                years.fromfile(f, count)
+                scores.fromfile(f, count)
+                strings = f.read().decode('utf-8').split(STRING_SEP)
+        except (OSError, EOFError, IndexError, ValueError):
+            return None
+        if len(strings) != num_directors + count:
+            return None
+        return cls(strings[:num_directors], strings[num_directors:],
+                   director_codes, years, scores)
+
+    def save(self, path, fingerprint):
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(b' '.join((MAGIC, fingerprint.encode(),
+                               str(len(self)).encode(),
+                               str(len(self.directors)).encode())) + b'\n')
+            self.director_codes.tofile(f)
+            self.years.tofile(f)
+            self.scores.tofile(f)
+            f.write(STRING_SEP.join(self.directors + self.titles).encode('utf-8'))
+        os.replace(tmp, path)  # readers never see a half written store
+
+    def __len__(self):
+        return len(self.scores)
+
+    def rows_by_director(self, director):
+        """Row numbers of director's movies, in csv order"""
+        if self._by_director is None:
+            index = defaultdict(lambda: array('I'))
+            for row, code in enumerate(self.director_codes):
+                index[code].append(row)
+            self._by_director = dict(index)
+        code = self._codes.get(director)
+        return self._by_director.get(code, array('I'))
+
+    def rows_by_year(self, start, stop=None):
+        """Row numbers of the movies with start <= year < stop (default
+        no upper bound), in csv order"""
+        if self._by_year is None:
+            order = sorted(range(len(self)), key=self.years.__getitem__)
+            self._by_year = (array('H', (self.years[i] for i in order)),
+                             array('I', order))
+        years, order = self._by_year
+        lo = bisect_left(years, start)
+        hi = len(years) if stop is None else bisect_left(years, stop, lo)
+        return sorted(order[lo:hi])
+
+    def _query_rows(self, min_year, stop_year=None):
+        """rows_by_year, plus the year 0 rows when there is no upper
+        bound: like get_movies_by_director, an unknown year is kept"""
+        rows = self.rows_by_year(min_year, stop_year)
+        if stop_year is None and min_year > 0:
+            rows = sorted(rows + self.rows_by_year(0, 1))
+        return rows
+
+    def movies(self, director, min_year=MIN_YEAR):
+        return [Movie(self.titles[row], self.years[row], self.scores[row])
+                for row in self.rows_by_director(director)
+                if self.years[row] >= min_year or not self.years[row]]
+
+    def aggregate(self, rows=None):
+        """Group rows (default all) by director: movie count, mean score
+        and first year, as columns indexed by director code"""
+        rows = range(len(self)) if rows is None else rows
+        if np is not None:
+            return self._aggregate_numpy(rows)
+        num_directors = len(self.directors)
+        counts, totals = [0] * num_directors, [0.0] * num_directors
+        min_years = [0xFFFF] * num_directors
+        for row in rows:
+            code = self.director_codes[row]
+            counts[code] += 1
+            totals[code] += self.scores[row]
+            min_years[code] = min(min_years[code], self.years[row])
+        means = [total / max(1, count) for total, count in zip(totals, counts)]
+        return Aggregates(counts, means, min_years)
+
+    def _aggregate_numpy(self, rows):
+        rows = np.asarray(rows, dtype=np.intp)
+        codes = np.frombuffer(self.director_codes, dtype=np.uint32)[rows]
+        years = np.frombuffer(self.years, dtype=np.uint16)[rows]
+        scores = np.frombuffer(self.scores, dtype=np.float64)[rows]
+        num_directors = len(self.directors)
+        counts = np.bincount(codes, minlength=num_directors)
+        totals = np.bincount(codes, weights=scores, minlength=num_directors)
+        min_years = np.full(num_directors, 0xFFFF, dtype=np.uint16)
+        np.minimum.at(min_years, codes, years)
+        return Aggregates(counts.tolist(), (totals / np.maximum(counts, 1)).tolist(),
+                          min_years.tolist())
+
+    def top_directors(self, n=NUM_TOP_DIRECTORS, min_movies=MIN_MOVIES,
+                      min_year=MIN_YEAR, stop_year=None):
+        """The n best (director, rounded mean score, count) with at least
+        min_movies movies in min_year <= year < stop_year (and year 0
+        if there is no stop_year). Ties are in the order of each
+        director's first movie in that range, like sorting
+        get_average_scores does"""
+        rows = self._query_rows(min_year, stop_year)
+        counts, means, _ = self.aggregate(rows)
+        first_rows = {}
+        for row in rows:
+            first_rows.setdefault(self.director_codes[row], row)
+        ranked = sorted((-round(means[code], 1), first_rows[code], code)
+                        for code, count in enumerate(counts)
+                        if count >= min_movies)
+        return [(self.directors[code], -mean, counts[code])
+                for mean, _, code in ranked[:n]]
+
+    def top_directors_by_decade(self, n=NUM_TOP_DIRECTORS, min_movies=MIN_MOVIES,
+                                min_year=MIN_YEAR):
+        """{decade: top_directors of that decade}, for all decades from
+        min_year on that have any qualifying director"""
+        decades = {}
+        if not len(self):
+            return decades
+        for decade in range(min_year // 10 * 10, max(self.years) + 1, 10):
+            top = self.top_directors(n, min_movies, max(decade, min_year),
+                                     decade + 10)
+            if top:
+                decades[decade] = top
+        return decades
+
+    def average_scores(self, min_movies=MIN_MOVIES, min_year=MIN_YEAR):
+        """Same result as get_average_scores(get_movies_by_director())"""
+        return {(director, avg): self.movies(director, min_year)
+                for director, avg, _ in self.top_directors(
+                    len(self.directors), min_movies, min_year)}
+
+
+def _fingerprint(path):
+    """Changes whenever the csv at path changes"""
+    stat = os.stat(path)
+    key = '{} {} {} {}'.format(os.path.abspath(path), stat.st_size,
+                               stat.st_mtime_ns, sys.byteorder)
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def get_movie_store(path=MOVIE_DATA):
+    """Return the MovieStore of the csv at path, (re)building its
+    STORE_SUFFIX cache file when it is missing or stale"""
+    fingerprint = _fingerprint(path)
+    cached_fingerprint, store = _stores.get(path, (None, None))
+    if cached_fingerprint != fingerprint:
+        cache = path + STORE_SUFFIX
+        store = MovieStore.load(cache, fingerprint)
+        if store is None:
+            store = MovieStore.build(path)
+            store.save(cache, fingerprint)
+        _stores[path] = fingerprint, store
+    return store
+
+
+class Leaderboard:
+    '''Running top n directors: (score sum, movie count) per director is
+    updated as rows come in and the n best directors with min_movies are
+    kept in a min heap, so new rows never mean recomputing from scratch.
+    Each director's movies are kept sorted, best first'''
+
+    def __init__(self, n=NUM_TOP_DIRECTORS, min_movies=MIN_MOVIES,
+                 min_year=MIN_YEAR):
+        self.n = n
+        self.min_movies = min_movies
+        self.min_year = min_year
+        self.totals = {}  # director -> [score sum, movie count]
+        self._movies = defaultdict(list)  # director -> [(-score, seq, Movie)]
+        self._order = {}  # director -> first seen, ties keep csv order
+        self._heap = []  # (avg, -order, director) of the current top n
+        self._stale = False  # a top director dropped, heap needs a rebuild
+        self._positions = {}  # csv path -> (bytes read, header)
+        self._seq = 0
+
+    def _key(self, director):
+        total, count = self.totals[director]
+        return round(total / count, 1), -self._order[director], director
+
+    def add(self, director, movie):
+        if movie.year and movie.year < self.min_year:
+            return
+        if director not in self.totals:
+            self._order[director] = len(self._order)
+            self.totals[director] = [0.0, 0]
+        totals = self.totals[director]
+        totals[0] += movie.score
+        totals[1] += 1
+        insort(self._movies[director], (-movie.score, self._seq, movie))
+        self._seq += 1
+        if totals[1] < self.min_movies or self._stale:
+            return
+
+        key = self._key(director)
+        heap = self._heap
+        for i, old in enumerate(heap):
+            if old[2] == director:
+                if key < old:  # someone outside the heap might beat it now
+                    self._stale = True
+                else:
+                    heap[i] = key
+                    heapq.heapify(heap)
+                return
+        if len(heap) < self.n:
+            heapq.heappush(heap, key)
+        elif key > heap[0]:
+            heapq.heapreplace(heap, key)
+
+    def read_csv(self, path=MOVIE_DATA):
+        '''Add the rows appended to the csv at path since the last call
+        (all rows the first time), a trailing partial line is left for
+        the next call. Returns the number of rows read'''
+        position, header = self._positions.get(path, (0, None))
+        with open(path, 'rb') as f:
+            f.seek(position)
+            data = f.read()
+        end = data.rfind(b'\n') + 1
+        # newline='' like open() for csv: only the csv module splits
+        # records, splitlines() would also break on \x0b, \x1c, \u2028 ..
+        text = io.StringIO(data[:end].decode('utf-8'), newline='')
+        if header is None:
+            header = next(csv.reader(text), None)
+        rows = 0
+        for line in csv.DictReader(text, fieldnames=header):
+            rows += 1
+            row = _parse_row(line)
+            if row is not None:
+                self.add(*row)
+        self._positions[path] = position + end, header
+        return rows
+
+    def top(self):
+        '''[(director, avg, movies best first)], the best director first'''
+        if self._stale:
+            self._heap = heapq.nlargest(
+                self.n, (self._key(director)
+                         for director, (_, count) in self.totals.items()
+                         if count >= self.min_movies))
+            heapq.heapify(self._heap)
+            self._stale = False
+        return [(director, avg, [m for *_, m in self._movies[director]])
+                for avg, _, director in sorted(self._heap, reverse=True)]
+
+
 def print_results(directors):
+    top = heapq.nlargest(NUM_TOP_DIRECTORS, directors.items(),
+                         key=lambda x: float(x[0][1]))
+    print_leaderboard([(director, avg, sorted(movies, key=lambda m: m.score,
+                                              reverse=True))
+                       for (director, avg), movies in top])
+
+
+def print_leaderboard(top):
     fmt_director_entry = '{counter:>02}. {director:<52} {avg}'
     fmt_movie_entry = '{year}] {title:<50} {score}'
     sep_line = '-' * 60
 
-    for counter, (director_rating, movies) in \
-        enumerate(sorted(directors.items(), key=lambda x: float(x[0][1]),
-                  reverse=True)[:NUM_TOP_DIRECTORS], 1):
-        director, avg = director_rating
-
+    for counter, (director, avg, movies) in enumerate(top, 1):
         print()
         print(fmt_director_entry.format(counter=counter,
                                         director=director, avg=avg))
         print(sep_line)
 
-        for m in sorted(movies, key=lambda m: m.score, reverse=True):
+        for m in movies:
             print(fmt_movie_entry.format(year=m.year,
                                          title=m.title[:50], score=m.score))
 
 
+def follow(path=MOVIE_DATA, interval=FOLLOW_INTERVAL):
+    '''Print the leaderboard of a growing csv whenever rows got added'''
+    leaderboard = Leaderboard()
+    while True:
+        if leaderboard.read_csv(path):
+            print_leaderboard(leaderboard.top())
+        time.sleep(interval)
+
+
 def main():
-    directors = get_movies_by_director()
-    directors = get_average_scores(directors)
+    if '--follow' in sys.argv:
+        follow()
+    directors = get_movie_store().average_scores()
     print_results(directors)
 
 
@@ -1,4 +1,7 @@
 from directors import get_movies_by_director, get_average_scores, _calc_mean
+from directors import MovieStore, Movie, get_movie_store, _fingerprint
+from directors import Leaderboard
+import directors as directors_module
 
 
 def test():
@@ -32,5 +35,99 @@ def test():
     return "tests pass"
 
 
+def test_movie_store():
+    store = get_movie_store()
+    assert store is get_movie_store()  # cached in memory
+    assert store.average_scores() == get_average_scores(get_movies_by_director())
+
+    top = store.top_directors(3)
+    assert top == [('Sergio Leone', 8.5, 4), ('Christopher Nolan', 8.4, 8),
+                   ('Quentin Tarantino', 8.2, 8)]
+    assert store.movies('Sergio Leone')[0] == \
+        Movie(title='Once Upon a Time in America\xa0', year=1984, score=8.4)
+    assert store.movies('Nobody') == []
+
+    decades = store.top_directors_by_decade(1)
+    assert decades[1970] == [('Francis Ford Coppola', 8.7, 4)]
+    assert min(decades) == 1960
+
+
+def test_movie_store_cache(tmp_path):
+    csv_file = tmp_path / 'movies.csv'
+    csv_file.write_text('director_name,movie_title,title_year,imdb_score\n'
+                        'A,One,1999,7.0\nB,Two,1950,9.0\nA,Three,2001,8.0\n'
+                        'B,Four,,6.0\n')
+    store = get_movie_store(str(csv_file))
+    assert len(store) == 3  # row without a year gets skipped
+    assert store.top_directors(min_movies=1) == [('A', 7.5, 2)]
+    assert store.top_directors(min_movies=1, min_year=0)[0] == ('B', 9.0, 1)
+
+    cached = MovieStore.load(str(csv_file) + '.columns',
+                             _fingerprint(str(csv_file)))
+    assert cached.directors == ['A', 'B']
+    assert cached.titles == ['One', 'Two', 'Three']
+    assert list(cached.years) == [1999, 1950, 2001]
+    assert MovieStore.load(str(csv_file) + '.columns', 'stale') is None
+
+
+
+def test_movie_store_ties_and_unknown_years(tmp_path, monkeypatch):
+    # B appears first, but only with a movie before MIN_YEAR, A has a
+    # movie of unknown year (0), both average 7.0
+    csv_file = tmp_path / 'movies.csv'
+    csv_file.write_text('director_name,movie_title,title_year,imdb_score\n'
+                        'B,Old,1950,9.0\n'
+                        'A,A1,0,7.0\nA,A2,1990,6.0\nA,A3,1991,8.0\n'
+                        'B,B1,1992,7.0\nB,B2,1993,7.0\nB,B3,1994,7.0\n'
+                        'B,B4,1995,7.0\nA,A4,1996,7.0\n')
+    monkeypatch.setattr(directors_module, 'MOVIE_DATA', str(csv_file))
+    expected = get_average_scores(get_movies_by_director())
+    store = get_movie_store(str(csv_file))
+
+    scores = store.average_scores()
+    assert scores == expected
+    assert list(scores) == sorted(expected, key=lambda x: x[1], reverse=True)
+    assert list(scores) == [('A', 7.0), ('B', 7.0)]
+    assert store.movies('A')[0] == Movie(title='A1', year=0, score=7.0)
+    assert store.top_directors() == [('A', 7.0, 4), ('B', 7.0, 4)]
+    # a decade has no room for an unknown year
+    assert store.top_directors_by_decade() == {1990: [('B', 7.0, 4)]}
+
+def test_leaderboard():
+    leaderboard = Leaderboard()
+    assert leaderboard.read_csv() > 5000
+    top = leaderboard.top()
+    assert len(top) == 20
+    report = get_average_scores(get_movies_by_director())
+    for director, avg, movies in top[:6]:
+        assert sorted(report[(director, avg)], key=lambda m: m.score,
+                      reverse=True) == movies
+    assert [director for director, *_ in top[:3]] == \
+        ['Sergio Leone', 'Christopher Nolan', 'Quentin Tarantino']
+
+
+def test_leaderboard_growing_csv(tmp_path):
+    csv_file = tmp_path / 'ratings.csv'
+    csv_file.write_text('director_name,movie_title,title_year,imdb_score\n'
+                        'A,One,1999,7.0\nB,Two,1999,6.0\nB,Thr')
+    leaderboard = Leaderboard(n=1, min_movies=1)
+    assert leaderboard.read_csv(str(csv_file)) == 2  # partial line waits
+    assert leaderboard.top() == [('A', 7.0, [Movie('One', 1999, 7.0)])]
+
+    with open(csv_file, 'a') as f:
+        f.write('ee,2000,9.0\nA,Four,2001,5.0\n')
+    assert leaderboard.read_csv(str(csv_file)) == 2
+    assert leaderboard.top() == [('B', 7.5, [Movie('Three', 2000, 9.0),
+                                             Movie('Two', 1999, 6.0)])]
+    assert leaderboard.read_csv(str(csv_file)) == 0
+
+    with open(csv_file, 'a', encoding='utf-8') as f:  # not line breaks in csv
+        f.write('C,Line\u2028Separator,2002,9.5\nC,Form\x0cFeed,2003,9.5\n')
+    assert leaderboard.read_csv(str(csv_file)) == 2
+    assert leaderboard.top() == [('C', 9.5, [
+        Movie('Line\u2028Separator', 2002, 9.5),
+        Movie('Form\x0cFeed', 2003, 9.5)])]
+
+
 if __name__ == '__main__':
     print(test())
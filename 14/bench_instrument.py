@@ -0,0 +1,48 @@
+''' Per call overhead of the timing decorators on a function doing
+    (almost) nothing, against the print per call timeit they replace '''
+from contextlib import redirect_stdout
+from functools import wraps
+import io
+import sys
+import time
+from timeit import repeat
+
+from instrument import timeit
+
+NUMBER = 200000
+REPEAT = 5
+
+
+def print_timeit(func):
+    ''' the old timeit of decorator-pb.py '''
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.time()
+        result = func(*args, **kwargs)
+        end = time.time()
+        print()
+        print(f'{func.__name__} of args: {args} took {end-start}')
+        return result
+    return wrapper
+
+
+def noop(x):
+    return x
+
+
+if __name__ == '__main__':
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else NUMBER
+    candidates = [('bare function', noop),
+                  ('old timeit, print per call', print_timeit(noop)),
+                  ('timeit', timeit(noop, name='all')),
+                  ('timeit(sample=16)', timeit(noop, sample=16, name='1/16')),
+                  ('timeit(sample=1024)', timeit(noop, sample=1024,
+                                                 name='1/1024'))]
+    baseline = None
+    for label, func in candidates:
+        with redirect_stdout(io.StringIO()):
+            best = min(repeat('func(1)', globals={'func': func},
+                              number=number, repeat=REPEAT))
+        ns = best / number * 1e9
+        baseline = ns if baseline is None else baseline
+        print(f'{label:<28} {ns:>8.0f} ns/call  (+{ns - baseline:.0f} ns)')
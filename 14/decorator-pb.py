@@ -3,24 +3,14 @@ import logging
 from random import random
 import time
 
+from instrument import report, timeit
+
 logging.basicConfig(level=logging.DEBUG,
                     format='%(asctime)s %(name)-12s %(levelname)-8s %(message)s',
                     datefmt='%H:%M:%S',
                     filename='decorators.log',
                     filemode='a')
-
-
-def timeit(func):
-    ''' a simple one - from Python cookbook 3rd ed '''
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        start = time.time()
-        result = func(*args, **kwargs)
-        end = time.time()
-        print()
-        print(f'{func.__name__} of args: {args} took {end-start}')
-        return result
-    return wrapper
+logger = logging.getLogger(__name__)
 
 
 def mute_exception(func=None, *, reraise=False, default_return=None):
@@ -32,10 +22,11 @@ def mute_exception(func=None, *, reraise=False, default_return=None):
     @wraps(func)
     def wrapper(*args, **kwargs):
         try:
-            logging.debug(f'{func.__name__} called for args {args}')
+            if logger.isEnabledFor(logging.DEBUG):   # skip formatting when off
+                logger.debug('%s called for args %s', func.__name__, args)
             return func(*args, **kwargs)
         except Exception as e:
-            logging.error(f'{func.__name__} raised exception {e.__class__.__name__} for args: {args}')
+            logger.error(f'{func.__name__} raised exception {e.__class__.__name__} for args: {args}')
             if reraise:
                 raise
             return default_return
@@ -61,3 +52,5 @@ if __name__ == '__main__':
     for i, j in zip(a, b):
         res = div(i, j)
         print(f'div {i}/{j} = {res}')
+
+    print(report())
@@ -0,0 +1,158 @@
+''' Low overhead timing decorators: per function call count, total and max
+    latency plus a latency histogram, recorded with perf_counter_ns in
+    preallocated lists (an array('Q') boxes an int on every increment,
+    making it slower). Nothing is printed or logged per call, use
+    report() or dump() to look at the numbers. '''
+from functools import partial, wraps
+import json
+from time import perf_counter_ns
+
+SUB_BITS = 4                # histogram precision: 2 ** 4 buckets per power of 2
+SUB_BUCKETS = 1 << SUB_BITS
+MAX_BITS = 44               # slower calls (> ~4.9 hours) share the last bucket
+NUM_BUCKETS = (MAX_BITS - SUB_BITS + 1) * SUB_BUCKETS
+PERCENTILES = (50, 90, 99)
+
+_stats = {}                 # qualified function name -> Stats
+
+
+def bucket(ns):
+    ''' HDR style log-linear bucket of a duration: exact below
+        2 * SUB_BUCKETS ns, then SUB_BUCKETS buckets per power of 2 '''
+    shift = ns.bit_length() - SUB_BITS - 1
+    if shift <= 0:
+        return ns
+    return min(shift * SUB_BUCKETS + (ns >> shift), NUM_BUCKETS - 1)
+
+
+def bucket_floor(index):
+    ''' Smallest duration in ns landing in bucket index '''
+    if index < 2 * SUB_BUCKETS:
+        return index
+    shift, sub = divmod(index, SUB_BUCKETS)
+    return (sub + SUB_BUCKETS) << (shift - 1)
+
+
+class Stats:
+    ''' Timings of one function, the histogram is allocated up front '''
+    __slots__ = ('name', 'calls', 'timed', 'total_ns', 'max_ns', 'histogram')
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0          # all calls, timed or not
+        self.timed = 0
+        self.total_ns = 0       # of the timed calls
+        self.max_ns = 0
+        self.histogram = [0] * NUM_BUCKETS
+
+    def record(self, ns):
+        ''' Add a timing, the wrappers of timeit() inline this '''
+        self.timed += 1
+        self.total_ns += ns
+        if ns > self.max_ns:
+            self.max_ns = ns
+        self.histogram[bucket(ns)] += 1
+
+    @property
+    def mean_ns(self):
+        return self.total_ns / self.timed if self.timed else 0.0
+
+    def percentile(self, pct):
+        ''' Lower bound of the bucket holding the pct-th percentile '''
+        rank = self.timed * pct / 100
+        seen = 0
+        for index, count in enumerate(self.histogram):
+            seen += count
+            if count and seen >= rank:
+                return bucket_floor(index)
+        return 0
+
+    def reset(self):
+        self.calls = self.timed = self.total_ns = self.max_ns = 0
+        self.histogram[:] = [0] * NUM_BUCKETS  # in place, wrappers hold it
+
+    def to_dict(self):
+        return {'name': self.name, 'calls': self.calls, 'timed': self.timed,
+                'total_ns': self.total_ns, 'max_ns': self.max_ns,
+                'percentiles_ns': {pct: self.percentile(pct)
+                                   for pct in PERCENTILES},
+                'histogram': {bucket_floor(index): count for index, count
+                              in enumerate(self.histogram) if count}}
+
+
+def timeit(func=None, *, sample=1, name=None):
+    ''' Record the latency of func, of 1 in sample calls (all calls are
+        counted). Usable as @timeit or @timeit(sample=100) '''
+    if func is None:
+        return partial(timeit, sample=sample, name=name)
+
+    name = name or func.__qualname__
+    if name not in _stats:
+        _stats[name] = Stats(name)
+    stats = _stats[name]
+
+    histogram = stats.histogram
+    countdown = sample
+
+    # Stats.record and bucket() inlined, saves a method call per call
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        nonlocal countdown
+        stats.calls += 1
+        countdown -= 1
+        if countdown:
+            return func(*args, **kwargs)
+        countdown = sample
+        start = perf_counter_ns()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            ns = perf_counter_ns() - start
+            stats.timed += 1
+            stats.total_ns += ns
+            if ns > stats.max_ns:
+                stats.max_ns = ns
+            shift = ns.bit_length() - SUB_BITS - 1
+            if shift > 0:
+                ns = (shift << SUB_BITS) + (ns >> shift)
+                if ns >= NUM_BUCKETS:
+                    ns = NUM_BUCKETS - 1
+            histogram[ns] += 1
+
+    wrapper.stats = stats
+    return wrapper
+
+
+def get_stats(name=None):
+    ''' Stats of the function recorded as name, all of them if no name '''
+    return _stats[name] if name else list(_stats.values())
+
+
+def reset():
+    for stats in _stats.values():
+        stats.reset()
+
+
+def report():
+    ''' Table of the recorded functions, slowest in total first '''
+    header = (f'{"function":<30} {"calls":>9} {"timed":>9} {"mean us":>9} '
+              + ' '.join(f'{"p" + str(pct) + " us":>9}' for pct in PERCENTILES)
+              + f' {"max us":>9} {"total ms":>9}')
+    lines = [header]
+    for stats in sorted(_stats.values(), key=lambda s: -s.total_ns):
+        lines.append(
+            f'{stats.name:<30} {stats.calls:>9} {stats.timed:>9} '
+            f'{stats.mean_ns / 1e3:>9.2f} '
+            + ' '.join(f'{stats.percentile(pct) / 1e3:>9.2f}'
+                       for pct in PERCENTILES)
+            + f' {stats.max_ns / 1e3:>9.2f} {stats.total_ns / 1e6:>9.2f}')
+    return '\n'.join(lines)
+
+
+def dump(path=None):
+    ''' All stats as a list of dicts, also written as json to path '''
+    data = [stats.to_dict() for stats in _stats.values()]
+    if path is not None:
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=2)
+    return data
@@ -0,0 +1,122 @@
+from itertools import count
+import json
+
+import pytest
+
+import instrument
+from instrument import (NUM_BUCKETS, PERCENTILES, SUB_BUCKETS, Stats, bucket,
+                        bucket_floor, dump, get_stats, reset, timeit)
+
+STEP_NS = 1000
+
+
+@pytest.fixture(autouse=True)
+def clean_stats(monkeypatch):
+    monkeypatch.setattr(instrument, '_stats', {})
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    ''' perf_counter_ns advancing STEP_NS per reading, a call takes that '''
+    ticks = count(0, STEP_NS)
+    monkeypatch.setattr(instrument, 'perf_counter_ns', lambda: next(ticks))
+
+
+def test_bucket_round_trip():
+    for index in range(NUM_BUCKETS):
+        assert bucket(bucket_floor(index)) == index
+    floors = [bucket_floor(index) for index in range(NUM_BUCKETS)]
+    assert floors == sorted(set(floors))
+
+
+@pytest.mark.parametrize('ns', [0, 1, 31, 32, 33, 100, 1023, 1024,
+                                123456789, 10 ** 12])
+def test_bucket_bounds(ns):
+    index = bucket(ns)
+    assert bucket_floor(index) <= ns < bucket_floor(index + 1)
+    # log-linear: the bucket is at most 1 / SUB_BUCKETS of ns wide
+    assert ns - bucket_floor(index) <= ns / SUB_BUCKETS
+
+
+def test_slowest_calls_share_the_last_bucket():
+    assert bucket(2 ** 60) == bucket(2 ** 50) == NUM_BUCKETS - 1
+
+
+def test_percentile():
+    stats = Stats('f')
+    assert stats.percentile(50) == 0
+    for _ in range(90):
+        stats.record(100)
+    for _ in range(9):
+        stats.record(10000)
+    stats.record(10 ** 6)
+    assert stats.percentile(50) == stats.percentile(90) == \
+        bucket_floor(bucket(100))
+    assert stats.percentile(99) == bucket_floor(bucket(10000))
+    assert stats.percentile(100) == bucket_floor(bucket(10 ** 6))
+    assert stats.max_ns == 10 ** 6
+    assert stats.mean_ns == (90 * 100 + 9 * 10000 + 10 ** 6) / 100
+
+
+def test_sample_counts_all_calls_times_some(clock):
+    @timeit(sample=3)
+    def double(x):
+        return 2 * x
+
+    assert [double(x) for x in range(10)] == [2 * x for x in range(10)]
+    stats = get_stats(double.__qualname__)
+    assert stats is double.stats
+    assert (stats.calls, stats.timed) == (10, 3)
+    assert (stats.total_ns, stats.max_ns) == (3 * STEP_NS, STEP_NS)
+    # the wrapper's inlined bucket() agrees with bucket()
+    assert stats.histogram[bucket(STEP_NS)] == 3
+    assert sum(stats.histogram) == 3
+
+
+def test_exceptions_are_timed(clock):
+    @timeit
+    def fail():
+        raise ValueError
+
+    with pytest.raises(ValueError):
+        fail()
+    assert (fail.stats.calls, fail.stats.timed) == (1, 1)
+
+
+def test_reset(clock):
+    @timeit(name='noop')
+    def noop():
+        pass
+
+    noop()
+    reset()
+    stats = get_stats('noop')
+    assert (stats.calls, stats.timed, stats.total_ns, stats.max_ns) == \
+        (0, 0, 0, 0)
+    assert not any(stats.histogram)
+    # the wrapper still records into the same, reset histogram
+    noop()
+    assert stats.histogram[bucket(STEP_NS)] == 1
+    assert stats.calls == stats.timed == 1
+
+
+def test_dump(tmp_path, clock):
+    @timeit(name='noop')
+    def noop():
+        pass
+
+    for _ in range(4):
+        noop()
+    path = tmp_path / 'stats.json'
+    data = dump(str(path))
+    assert data == [{
+        'name': 'noop', 'calls': 4, 'timed': 4, 'total_ns': 4 * STEP_NS,
+        'max_ns': STEP_NS,
+        'percentiles_ns': {pct: bucket_floor(bucket(STEP_NS))
+                           for pct in PERCENTILES},
+        'histogram': {bucket_floor(bucket(STEP_NS)): 4}}]
+    # json has string keys
+    saved = json.loads(path.read_text())
+    assert saved[0]['histogram'] == {str(bucket_floor(bucket(STEP_NS))): 4}
+    assert saved[0]['total_ns'] == 4 * STEP_NS
+    assert dump() == data
@@ -1,9 +1,10 @@
 import argparse
 import logging
+import os
 
 from podify.models import Podcast
-from podify.store import PodStore
-from podify.utils.feed import parse_feed
+from podify.store import DB_DIR, PodStore
+from podify.utils.feed import FeedPoller
 from podify.utils.mail import mail_episode
 
 DEFAULT_FEED = 'https://talkpython.fm/episodes/rss'
@@ -19,15 +20,14 @@ else:
 
 pod = PodStore(feed)
 
-feed_output = parse_feed(feed)
-ids_in_db = pod.get_episodes_from_db()
-
-new_episodes = dict((k, feed_output[k]) 
-		    for k in feed_output.keys() 
-		    if k not in ids_in_db)
-
-logging.debug('adding {} new episodes'.format(len(new_episodes)))
-pod.add_new_episodes_to_db(new_episodes)
+# only downloads the feed when it is due and changed since the last run,
+# its state is saved once the episodes are in the database: if storing them
+# fails they are new again on the next run
+poller = FeedPoller(os.path.join(DB_DIR, 'feeds.json'))
+feed_output = poller.poll([feed]).get(feed, {})
+added = pod.sync_episodes(feed_output)
+poller.save()
+logging.debug('added {} new episodes'.format(added))
 
 ep = pod.get_random_episode()
 if not ep:
@@ -11,10 +11,26 @@ class Podcast(Base):
     title = Column('title', String(), index=True)
     link = Column('link', String())
     published = Column('published', DateTime())
-    done = Column('done', Boolean(), default=False)
+    done = Column('done', Boolean(), default=False, index=True)
     created_on = Column('created_on', DateTime(), default=datetime.now)
     updated_on = Column('updated_on', DateTime(), default=datetime.now, onupdate=datetime.now)
 
     def __repr__(self):
         return "<Podcast(id='%s', title='%s', link='%s', published='%s', done='%s')>" \
                % (self.id, self.title, self.link, self.published, self.done)
+
+
+class PodcastCounts(Base):
+    """Single row of episode counts, kept up to date by triggers"""
+    __tablename__ = 'podcast_counts'
+    id = Column('id', Integer(), primary_key=True)
+    total = Column('total', Integer(), nullable=False)
+    done = Column('done', Integer(), nullable=False)
+
+
+class UndonePodcast(Base):
+    """The episodes not done yet in slots 0 .. undone - 1, so a random one
+    is a primary key lookup. Kept up to date by triggers"""
+    __tablename__ = 'undone_podcasts'
+    slot = Column('slot', Integer(), primary_key=True, autoincrement=False)
+    id = Column('id', String(), unique=True, nullable=False)
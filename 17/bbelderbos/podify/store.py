@@ -1,15 +1,54 @@
 import os
+import random
 import sys
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
+from sqlalchemy.dialects.sqlite import insert
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.sql.expression import func
 
-from podify.models import Base, Podcast
+from podify.models import Base, Podcast, PodcastCounts, UndonePodcast
 from podify.utils.utils import get_db_name
 
 DB_DIR = os.path.abspath(os.path.join(os.path.dirname( __file__ ), '..', 'databases'))
 
+# Keep podcast_counts and the undone_podcasts slots in line with podcasts.
+# An episode leaving the undone set hands its slot to the one in the last
+# slot (parked at -1 - slot first, slots being unique), keeping them dense
+_REMOVE_UNDONE = '''
+    UPDATE undone_podcasts SET slot = -1 - slot WHERE id = OLD.id;
+    UPDATE undone_podcasts
+    SET slot = (SELECT -1 - slot FROM undone_podcasts WHERE id = OLD.id)
+    WHERE slot = (SELECT total - done - 1 FROM podcast_counts)
+    AND EXISTS (SELECT 1 FROM undone_podcasts WHERE id = OLD.id);
+    DELETE FROM undone_podcasts WHERE id = OLD.id;
+'''
+_ADD_UNDONE = '''
+    INSERT INTO undone_podcasts (slot, id)
+    SELECT total - done, NEW.id FROM podcast_counts WHERE NOT NEW.done;
+'''
+TRIGGERS = (
+    '''CREATE TRIGGER IF NOT EXISTS podcasts_insert AFTER INSERT ON podcasts
+    BEGIN''' + _ADD_UNDONE + '''
+        UPDATE podcast_counts SET total = total + 1,
+                                  done = done + (NEW.done != 0);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS podcasts_done AFTER UPDATE OF done ON podcasts
+    WHEN NEW.done AND NOT OLD.done BEGIN''' + _REMOVE_UNDONE + '''
+        UPDATE podcast_counts SET done = done + 1;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS podcasts_undone AFTER UPDATE OF done ON podcasts
+    WHEN OLD.done AND NOT NEW.done BEGIN''' + _ADD_UNDONE + '''
+        UPDATE podcast_counts SET done = done - 1;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS podcasts_delete AFTER DELETE ON podcasts
+    BEGIN''' + _REMOVE_UNDONE + '''
+        UPDATE podcast_counts SET total = total - 1,
+                                  done = done - (OLD.done != 0);
+    END''',
+)
+
+
 class PodStore:
 
     def __init__(self, feed, dropall=False):
@@ -18,28 +57,73 @@ class PodStore:
         if dropall:
             Base.metadata.drop_all(engine)
         Base.metadata.create_all(engine)
+        with engine.begin() as conn:
+            for trigger in TRIGGERS:
+                conn.execute(text(trigger))
         Session = sessionmaker(bind=engine)
         self.session = Session()
+        if self.session.query(PodcastCounts).first() is None:
+            self._count_episodes()
+
+    def _count_episodes(self):
+        '''Fill the counters and slots for a database from before they
+        existed (or an empty one)'''
+        undone = [row.id for row in
+                  self.session.query(Podcast.id).filter(Podcast.done == False)]
+        total = self.session.query(func.count(Podcast.id)).scalar()
+        self.session.query(UndonePodcast).delete()
+        self.session.add(PodcastCounts(id=1, total=total,
+                                       done=total - len(undone)))
+        if undone:
+            self.session.execute(UndonePodcast.__table__.insert(),
+                                 [{'slot': slot, 'id': id_}
+                                  for slot, id_ in enumerate(undone)])
+        self.session.commit()
+
+    def get_counts(self):
+        '''(done, total) episodes, read from the counters'''
+        counts = self.session.query(PodcastCounts.done, PodcastCounts.total).one()
+        return counts.done, counts.total
 
     def get_episodes_from_db(self):
         return [row.id for row in self.session.query(Podcast.id).all()]
 
-    def add_new_episodes_to_db(self, new_episodes):
-        records = [Podcast(id=ep.id, title=ep.title, link=ep.link, published=ep.published)
-                for ep in new_episodes.values()]
-        self.session.add_all(records)
+    def sync_episodes(self, episodes):
+        '''Add the episodes ({id: Episode}) not in the database yet in one
+        INSERT .. ON CONFLICT (id) DO NOTHING executemany, no need to
+        fetch the ids in the database first. Unlike INSERT OR IGNORE it
+        only skips duplicate ids, not other constraint violations.
+        Returns the number of episodes added'''
+        if not episodes:
+            return 0
+        total_before = self.get_counts()[1]
+        self.session.execute(
+            insert(Podcast.__table__).on_conflict_do_nothing(
+                index_elements=['id']),
+            [{'id': ep.id, 'title': ep.title, 'link': ep.link,
+              'published': ep.published} for ep in episodes.values()])
         self.session.commit()
+        return self.get_counts()[1] - total_before
+
+    def add_new_episodes_to_db(self, new_episodes):
+        self.sync_episodes(new_episodes)
 
     def get_random_episode(self):
-        return self.session.query(Podcast).filter(Podcast.done==False).order_by(func.random()).first()
+        '''A random undone episode: a random slot of undone_podcasts, two
+        primary key lookups instead of ORDER BY random() over them all'''
+        done, total = self.get_counts()
+        if done == total:
+            return None
+        slot = random.randrange(total - done)
+        return (self.session.query(Podcast)
+                .join(UndonePodcast, UndonePodcast.id == Podcast.id)
+                .filter(UndonePodcast.slot == slot).one())
 
     def mark_episode_done(self, episode):
         episode.done = True
         self.session.commit()
 
     def get_stats(self):
-        status = dict(self.session.query(Podcast.done, func.count(Podcast.done)).group_by(Podcast.done).all())
-        done = status.get(True, 0)
-        total = sum(status.values())
+        done, total = self.get_counts()
         perc = done/total * 100
         return 'Podcast consumption stats: {:.1f}% done [{} of {}]'.format(perc, done, total)
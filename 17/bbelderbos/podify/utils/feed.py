@@ -1,24 +1,242 @@
 from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from email.utils import parsedate_to_datetime
+from http.client import HTTPException, IncompleteRead
+from itertools import islice
+import json
+import logging
+import os
+import re
+import statistics
 import time
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+from xml.etree.ElementTree import ParseError, XMLPullParser
 
 import feedparser
 
 Episode = namedtuple('Episode', 'id title link published')
 
+POLL_STATE = 'feeds.json'
+MAX_WORKERS = 16  # feeds fetched at the same time
+TIMEOUT = 30
+CHUNK_SIZE = 16 * 1024
+MAX_KNOWN_IDS = 200  # per newest first feed, to recognise where new ones end
+MAX_DATES = 20  # publish dates per feed to base the poll interval on
+POLLS_PER_EPISODE = 4  # polls per typical time between two episodes
+DEFAULT_INTERVAL = 60 * 60  # seconds
+MIN_INTERVAL = 15 * 60
+MAX_INTERVAL = 24 * 60 * 60
+ATOM = '{http://www.w3.org/2005/Atom}'
+RSS1 = '{http://purl.org/rss/1.0/}'
+RDF = '{http://www.w3.org/1999/02/22-rdf-syntax-ns#}'
+DC = '{http://purl.org/dc/elements/1.1/}'
+
 
 def parse_feed(feed):
-    output = feedparser.parse(feed)
+    return {ep.id: ep for ep in _feedparser_episodes(feed)}
+
 
-    d = {}
-    for e in output['entries']:
-        id = e.get('id')
-        title = e.get('title')
+def _feedparser_episodes(feed):
+    for e in feedparser.parse(feed)['entries']:
         link = e.get('link')
-        published = _to_dt(e.get('published_parsed'))
-        d[id] = Episode(id, title, link, published)
-    return d
+        published = e.get('published_parsed') or e.get('updated_parsed')
+        yield Episode(e.get('id') or link, e.get('title'), link,
+                      _to_dt(published) if published else None)
 
 
 def _to_dt(struct):
     return datetime.fromtimestamp(time.mktime(struct))
+
+
+def _parse_date(text, atom=False):
+    if not text:
+        return None
+    try:
+        if atom:  # RFC 3339, like 2017-05-01T08:00:00.000+02:00 or ..Z
+            text = re.sub(r'\.\d+', '', text.strip())
+            # dc:date is W3C-DTF, seconds are optional
+            text = re.sub(r'T(\d\d:\d\d)(?=[Z+-])', r'T\1:00', text)
+            dt = datetime.strptime(text, '%Y-%m-%dT%H:%M:%S%z')
+        else:
+            dt = parsedate_to_datetime(text.strip())
+    except (TypeError, ValueError):
+        return None
+    # UTC like feedparser's published_parsed
+    return _to_dt(dt.utctimetuple() if dt.tzinfo else dt.timetuple())
+
+
+def _text(elem, tag):
+    """Text of the child tag stripped like feedparser does, None if empty"""
+    return (elem.findtext(tag) or '').strip() or None
+
+
+def _rss_episode(item, ns=''):
+    """An RSS 2.0 item, or with the RSS1 ns an RSS 1.0 (RDF) one"""
+    guid = item.find('guid')
+    link = _text(item, ns + 'link')
+    if (link is None and guid is not None and
+            guid.get('isPermaLink', 'true') != 'false'):
+        link = _text(item, 'guid')  # like feedparser's guidislink
+    published = (_parse_date(_text(item, 'pubDate')) or
+                 _parse_date(_text(item, DC + 'date'), atom=True))
+    return Episode(_text(item, 'guid') or item.get(RDF + 'about') or link,
+                   _text(item, ns + 'title'), link, published)
+
+
+def _atom_episode(entry):
+    link = next((el.get('href').strip() for el in entry.iter(ATOM + 'link')
+                 if el.get('rel', 'alternate') == 'alternate' and
+                 el.get('href')), None)
+    published = (_text(entry, ATOM + 'published') or
+                 _text(entry, ATOM + 'updated'))
+    return Episode(_text(entry, ATOM + 'id') or link,
+                   _text(entry, ATOM + 'title'), link,
+                   _parse_date(published, atom=True))
+
+
+def iter_episodes(stream, chunk_size=CHUNK_SIZE):
+    """Yield the Episodes of an RSS or Atom feed read from stream while
+    it downloads, so a caller that stops early doesn't read the rest.
+    Feeds that aren't well-formed XML, say with an HTML entity like
+    &eacute;, are read to the end and the episodes from there on are
+    taken from feedparser, which copes with that. Not so a response cut
+    off before its Content-Length, that is an IncompleteRead"""
+    parser = XMLPullParser(events=('end',))
+    chunks = []
+    count = 0
+    try:
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            parser.feed(chunk)
+            for _, elem in parser.read_events():
+                if elem.tag == 'item':
+                    episode = _rss_episode(elem)
+                elif elem.tag == RSS1 + 'item':
+                    episode = _rss_episode(elem, RSS1)
+                elif elem.tag == ATOM + 'entry':
+                    episode = _atom_episode(elem)
+                else:
+                    continue
+                elem.clear()
+                count += 1
+                yield episode
+        parser.close()
+    except ParseError:
+        chunks.append(stream.read())
+        if getattr(stream, 'length', None):  # a download that broke off
+            raise IncompleteRead(b''.join(chunks), stream.length)
+        yield from islice(_feedparser_episodes(b''.join(chunks)), count, None)
+
+
+class FeedPoller:
+    """Polls many feeds concurrently. Per feed it remembers the ETag and
+    Last-Modified for conditional GETs (unchanged feeds cost a 304), the
+    episode ids it lists to tell the new ones, and when to poll next,
+    based on how often the feed publishes. The state is only written by
+    save(), call it once the new episodes are stored"""
+
+    def __init__(self, state_file=POLL_STATE, max_workers=MAX_WORKERS):
+        self.state_file = state_file
+        self.max_workers = max_workers
+        try:
+            with open(state_file) as f:
+                self.state = json.load(f)
+        except (OSError, ValueError):
+            self.state = {}
+
+    def _feed_state(self, feed):
+        return self.state.setdefault(feed, {
+            'etag': None, 'modified': None, 'known': [], 'dates': [],
+            'newest_first': False, 'interval': DEFAULT_INTERVAL,
+            'next_poll': 0})
+
+    def due(self, feeds, now=None):
+        now = time.time() if now is None else now
+        return [feed for feed in feeds
+                if self._feed_state(feed)['next_poll'] <= now]
+
+    def poll_feed(self, feed):
+        """New episodes of feed, newest first if the feed lists them that
+        way. Only feeds seen to be ordered newest first get cut off at
+        the first known episode, others are read to the end. The known
+        ids become all ids the feed lists, or for a cut off newest first
+        feed the new ids followed by the latest known ones"""
+        state = self._feed_state(feed)
+        request = Request(feed, headers={'User-Agent': 'podify'})
+        if state['etag']:
+            request.add_header('If-None-Match', state['etag'])
+        if state['modified']:
+            request.add_header('If-Modified-Since', state['modified'])
+        known = set(state['known'])
+        new = []
+        try:
+            response = urlopen(request, timeout=TIMEOUT)
+        except HTTPError as exc:
+            if exc.code != 304:
+                raise
+        else:
+            with response:
+                listed, dates = [], []
+                for episode in iter_episodes(response):
+                    listed.append(episode.id)
+                    if episode.id in known:
+                        if state['newest_first']:
+                            state['known'] = ([ep.id for ep in new] +
+                                              state['known'])[:MAX_KNOWN_IDS]
+                            break
+                    else:
+                        new.append(episode)
+                    if episode.published is not None:
+                        dates.append(episode.published)
+                else:  # read it all, learn the order
+                    state['newest_first'] = dates == sorted(dates,
+                                                            reverse=True)
+                    state['known'] = listed
+                state['etag'] = response.headers.get('ETag')
+                state['modified'] = response.headers.get('Last-Modified')
+        self._update_schedule(state, new)
+        return new
+
+    def _update_schedule(self, state, new):
+        stamps = [ep.published.timestamp() for ep in new if ep.published]
+        state['dates'] = sorted(set(state['dates'] + stamps))[-MAX_DATES:]
+        gaps = [b - a for a, b in zip(state['dates'], state['dates'][1:])]
+        if gaps:
+            interval = statistics.median(gaps) / POLLS_PER_EPISODE
+            state['interval'] = min(MAX_INTERVAL, max(MIN_INTERVAL, interval))
+        state['next_poll'] = time.time() + state['interval']
+
+    def poll(self, feeds, force=False):
+        """{feed: {id: Episode}} of the new episodes of the feeds that are
+        due (all of them with force), fetched max_workers at a time.
+        Feeds that fail are logged and tried again after their interval.
+        Nothing is saved, call save() once the episodes are stored"""
+        feeds = list(feeds) if force else self.due(feeds)
+        for feed in feeds:
+            self._feed_state(feed)  # no state dict changes in the threads
+
+        def poll_one(feed):
+            try:
+                return feed, self.poll_feed(feed)
+            except (OSError, HTTPException, ValueError,
+                    SyntaxError) as exc:  # ParseError too
+                logging.error('Cannot poll {}: {}'.format(feed, exc))
+                state = self.state[feed]
+                state['next_poll'] = time.time() + state['interval']
+                return feed, []
+
+        with ThreadPoolExecutor(self.max_workers) as pool:
+            results = dict(pool.map(poll_one, feeds))
+        return {feed: {ep.id: ep for ep in episodes}
+                for feed, episodes in results.items()}
+
+    def save(self):
+        tmp = self.state_file + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.state_file)
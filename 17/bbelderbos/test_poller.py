@@ -0,0 +1,296 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import hashlib
+import io
+import os
+import threading
+
+import pytest
+
+from podify.utils.feed import (FeedPoller, MAX_KNOWN_IDS, MIN_INTERVAL,
+                               POLLS_PER_EPISODE, iter_episodes, parse_feed)
+
+START = datetime(2017, 5, 1, 8, 0)
+# an existing database has the ids from feedparser, these must match them
+MESSY_RSS = '''<?xml version="1.0"?>
+<rss version="2.0" xmlns:dc="http://purl.org/dc/elements/1.1/"><channel>
+<title>fixture</title>
+<item><title>
+    Episode 2 </title><link> https://example.com/2
+  </link><guid>
+  abc-2
+</guid><pubDate> Tue, 02 May 2017 08:00:00 GMT </pubDate></item>
+<item><title>Episode 1</title><guid>https://example.com/1</guid>
+<dc:date>2017-05-01T10:00:00+02:00</dc:date></item>
+</channel></rss>'''
+ENTITIES_RSS = MESSY_RSS.replace('Episode 1', 'Caf&eacute; &amp; more')
+RDF_FEED = '''<?xml version="1.0"?>
+<rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+ xmlns="http://purl.org/rss/1.0/" xmlns:dc="http://purl.org/dc/elements/1.1/">
+<channel rdf:about="https://example.com/"><title>fixture</title></channel>
+<item rdf:about="https://example.com/2"><title>Episode 2</title>
+<link>https://example.com/2</link><dc:date>2017-05-02T08:00Z</dc:date></item>
+<item rdf:about="https://example.com/1"><title> Episode 1 </title>
+<link>https://example.com/1</link>
+<dc:date>2017-05-01T08:00:00Z</dc:date></item>
+</rdf:RDF>'''
+
+
+def rss(num, step=timedelta(days=1), newest_first=True):
+    items = ['''<item><title>Episode {0}</title>
+        <link>https://example.com/{0}</link><guid>ep-{0}</guid>
+        <pubDate>{1}</pubDate></item>'''.format(
+            i, format_datetime(START + i * step)) for i in range(num)]
+    if newest_first:
+        items.reverse()
+    return ('<?xml version="1.0"?><rss version="2.0"><channel>'
+            '<title>fixture</title>{}</channel></rss>'.format(''.join(items)))
+
+
+def atom(num):
+    entries = ''.join('''<entry><id>urn:ep-{0}</id><title>Episode {0}</title>
+        <link href="https://example.com/{0}"/>
+        <published>{1}Z</published></entry>'''.format(
+            i, (START + timedelta(days=i)).isoformat())
+        for i in reversed(range(num)))
+    return ('<?xml version="1.0"?><feed xmlns="http://www.w3.org/2005/Atom">'
+            '<title>fixture</title>{}</feed>'.format(entries))
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """Serves server.feeds with an ETag, a 304 for a matching
+    If-None-Match, or for the paths in server.modified with that
+    Last-Modified, a 304 for a matching If-Modified-Since. Requests are
+    recorded as (path, validator sent, status). /truncated.rss breaks
+    off before its Content-Length, /garbled.rss isn't HTTP at all"""
+
+    def do_GET(self):
+        feeds = self.server.feeds
+        if self.path == '/garbled.rss':
+            self.wfile.write(b'garbage\r\n\r\n')
+            self.close_connection = True
+            return
+        if self.path == '/truncated.rss':
+            body = rss(30).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body[:len(body) // 2])
+            self.close_connection = True
+            return
+        if self.path not in feeds:
+            self.send_error(404)
+            return
+        body = feeds[self.path].encode('utf-8')
+        if self.path in self.server.modified:
+            header = 'Last-Modified'
+            validator = self.server.modified[self.path]
+            sent = self.headers.get('If-Modified-Since')
+        else:
+            header = 'ETag'
+            validator = '"{}"'.format(hashlib.md5(body).hexdigest())
+            sent = self.headers.get('If-None-Match')
+        status = 304 if sent == validator else 200
+        self.server.requests.append((self.path, sent, status))
+        self.send_response(status)
+        if status == 304:
+            self.end_headers()
+            return
+        self.send_header(header, validator)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class CountingStream(io.BytesIO):
+    bytes_read = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.bytes_read += len(data)
+        return data
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FixtureHandler)
+    server.feeds, server.modified, server.requests = {}, {}, []
+    server.url = 'http://127.0.0.1:{}'.format(server.server_port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def state_file(tmp_path):
+    return str(tmp_path / 'feeds.json')
+
+
+def test_first_poll_parses_like_feedparser(server, state_file):
+    server.feeds.update({'/feed.rss': rss(30), '/atom.xml': atom(30),
+                         '/messy.rss': MESSY_RSS,
+                         '/entities.rss': ENTITIES_RSS, '/rdf.xml': RDF_FEED})
+    output = FeedPoller(state_file).poll(
+        [server.url + path for path in server.feeds])
+    for path in ('/feed.rss', '/messy.rss', '/entities.rss', '/rdf.xml'):
+        assert output[server.url + path] == parse_feed(server.feeds[path])
+    assert list(output[server.url + '/messy.rss']) == [
+        'abc-2', 'https://example.com/1']
+    assert output[server.url + '/entities.rss']['https://example.com/1'] \
+        .title == 'Caf\xe9 & more'
+    assert [ep.published for ep in output[server.url + '/rdf.xml'].values()
+            ] == [datetime(2017, 5, 2, 8, 0), datetime(2017, 5, 1, 8, 0)]
+    atom_ids = list(output[server.url + '/atom.xml'])
+    assert len(atom_ids) == 30
+    assert atom_ids[:2] == ['urn:ep-29', 'urn:ep-28']
+
+
+@pytest.mark.parametrize('feed', [MESSY_RSS, ENTITIES_RSS, RDF_FEED])
+def test_iter_episodes_like_feedparser(feed):
+    # ENTITIES_RSS breaks off at its second item, the rest from feedparser
+    stream = io.BytesIO(feed.encode('utf-8'))
+    assert list(iter_episodes(stream, chunk_size=64)) == list(
+        parse_feed(feed).values())
+
+
+def test_schedule(server, state_file):
+    server.feeds.update({'/daily.rss': rss(30),
+                         '/hourly.rss': rss(30, step=timedelta(hours=1)),
+                         '/oldest-first.rss': rss(30, newest_first=False)})
+    urls = [server.url + path for path in server.feeds]
+    poller = FeedPoller(state_file)
+    assert len(poller.poll(urls)) == 3
+    # polled feeds are not due until their interval passed
+    assert poller.poll(urls) == {}
+    daily = poller.state[server.url + '/daily.rss']
+    assert daily['interval'] == 24 * 60 * 60 / POLLS_PER_EPISODE
+    assert daily['newest_first']
+    assert poller.state[server.url + '/hourly.rss']['interval'] == \
+        MIN_INTERVAL
+    assert not poller.state[server.url + '/oldest-first.rss']['newest_first']
+
+
+def test_unchanged_feed_is_a_304(server, state_file):
+    server.feeds['/feed.rss'] = rss(30)
+    url = server.url + '/feed.rss'
+    poller = FeedPoller(state_file)
+    assert len(poller.poll([url])[url]) == 30
+    poller.save()
+
+    # the ETag of the 200 goes back as If-None-Match, also after a restart
+    poller = FeedPoller(state_file)
+    assert poller.poll([url], force=True) == {url: {}}
+    (_, first_etag, first), (_, etag, status) = server.requests
+    assert (first_etag, first) == (None, 200)
+    assert etag == poller.state[url]['etag'] and etag.startswith('"')
+    assert status == 304
+
+    # a changed feed sends a new ETag, which is the one used next
+    server.feeds['/feed.rss'] = rss(31)
+    assert list(poller.poll([url], force=True)[url]) == ['ep-30']
+    assert poller.state[url]['etag'] != etag
+    assert poller.poll([url], force=True) == {url: {}}
+    assert server.requests[-1] == ('/feed.rss', poller.state[url]['etag'],
+                                   304)
+
+
+def test_unchanged_feed_without_etag(server, state_file):
+    server.feeds['/feed.rss'] = rss(30)
+    server.modified['/feed.rss'] = format_datetime(
+        START.replace(tzinfo=timezone.utc), usegmt=True)
+    url = server.url + '/feed.rss'
+    poller = FeedPoller(state_file)
+    assert len(poller.poll([url])[url]) == 30
+    assert poller.state[url]['etag'] is None
+
+    # Last-Modified goes back as If-Modified-Since
+    assert poller.poll([url], force=True) == {url: {}}
+    assert server.requests[-1] == ('/feed.rss', server.modified['/feed.rss'],
+                                   304)
+    server.feeds['/feed.rss'] = rss(31)
+    server.modified['/feed.rss'] = format_datetime(
+        START.replace(tzinfo=timezone.utc) + timedelta(days=1), usegmt=True)
+    assert list(poller.poll([url], force=True)[url]) == ['ep-30']
+    assert poller.state[url]['modified'] == server.modified['/feed.rss']
+
+
+def test_only_new_episodes(server, state_file):
+    server.feeds.update({'/newest-first.rss': rss(30),
+                         '/oldest-first.rss': rss(30, newest_first=False)})
+    urls = [server.url + path for path in server.feeds]
+    poller = FeedPoller(state_file)
+    poller.poll(urls)
+
+    server.feeds.update({'/newest-first.rss': rss(32),
+                         '/oldest-first.rss': rss(31, newest_first=False)})
+    output = poller.poll(urls, force=True)
+    assert list(output[urls[0]]) == ['ep-31', 'ep-30']
+    assert list(output[urls[1]]) == ['ep-30']
+    assert poller.poll(urls, force=True) == {url: {} for url in urls}
+
+
+def test_long_oldest_first_feed(server, state_file):
+    # more episodes than MAX_KNOWN_IDS, the newest of them last
+    num = MAX_KNOWN_IDS + 50
+    server.feeds['/feed.rss'] = rss(num, newest_first=False)
+    url = server.url + '/feed.rss'
+    poller = FeedPoller(state_file)
+    assert len(poller.poll([url])[url]) == num
+
+    server.feeds['/feed.rss'] = rss(num + 1, newest_first=False)
+    assert list(poller.poll([url], force=True)[url]) == ['ep-{}'.format(num)]
+    assert len(poller.state[url]['known']) == num + 1
+
+
+def test_newest_first_feed_stops_at_known_episode(server, state_file):
+    num = MAX_KNOWN_IDS + 50
+    server.feeds['/feed.rss'] = rss(num)
+    url = server.url + '/feed.rss'
+    poller = FeedPoller(state_file)
+    poller.poll([url])
+
+    server.feeds['/feed.rss'] = rss(num + 2)
+    assert len(poller.poll([url], force=True)[url]) == 2
+    # the ids of the latest episodes are kept
+    assert poller.state[url]['known'] == [
+        'ep-{}'.format(i) for i in range(num + 1, num + 1 - MAX_KNOWN_IDS, -1)]
+
+    # stopping at a known episode stops reading the download too
+    big = rss(5000).encode('utf-8')
+    stream = CountingStream(big)
+    for episode in iter_episodes(stream):
+        if episode.id == 'ep-4990':
+            break
+    assert stream.bytes_read < len(big) / 10
+
+
+def test_failing_feeds(server, state_file):
+    server.feeds['/feed.rss'] = rss(30)
+    urls = [server.url + path
+            for path in ('/missing.rss', '/truncated.rss', '/garbled.rss',
+                         '/feed.rss')]
+    poller = FeedPoller(state_file)
+    output = poller.poll(urls)
+    assert output[urls[0]] == output[urls[1]] == output[urls[2]] == {}
+    assert len(output[urls[3]]) == 30
+    # tried again, not skipped for good
+    assert all(poller.state[url]['next_poll'] > 0 for url in urls)
+    assert poller.state[urls[1]]['known'] == []
+
+
+def test_state_is_saved_by_save_only(server, state_file):
+    server.feeds['/feed.rss'] = rss(30)
+    url = server.url + '/feed.rss'
+    poller = FeedPoller(state_file)
+    poller.poll([url])
+    assert not os.path.exists(state_file)
+    # e.g. storing the episodes failed: they are new again
+    assert len(FeedPoller(state_file).poll([url])[url]) == 30
+
+    poller.save()
+    assert FeedPoller(state_file).poll([url], force=True) == {url: {}}
@@ -0,0 +1,81 @@
+from datetime import datetime
+import random
+
+import pytest
+from sqlalchemy import func
+
+from podify import store
+from podify.models import Podcast, UndonePodcast
+from podify.store import PodStore
+from podify.utils.feed import Episode
+
+STEPS = 500
+
+
+def episodes(*ids):
+    return {id_: Episode(id_, 'Episode {}'.format(id_),
+                         'https://example.com/{}'.format(id_),
+                         datetime(2017, 5, 1))
+            for id_ in ids}
+
+
+@pytest.fixture
+def pod(tmp_path, monkeypatch):
+    monkeypatch.setattr(store, 'DB_DIR', str(tmp_path))
+    return PodStore('https://example.com/rss')
+
+
+def check_consistent(pod):
+    """Counters match the podcasts table, undone slots are 0 .. n - 1"""
+    session = pod.session
+    total = session.query(func.count(Podcast.id)).scalar()
+    undone = {row.id for row in
+              session.query(Podcast.id).filter(Podcast.done == False)}
+    assert pod.get_counts() == (total - len(undone), total)
+    slots = dict(session.query(UndonePodcast.slot, UndonePodcast.id))
+    assert sorted(slots) == list(range(len(undone)))
+    assert set(slots.values()) == undone
+
+
+def test_sync_episodes(pod):
+    assert pod.sync_episodes({}) == 0
+    assert pod.sync_episodes(episodes('a', 'b', 'c')) == 3
+    assert pod.sync_episodes(episodes('b', 'c', 'd')) == 1  # b, c known
+    assert pod.sync_episodes(episodes('a', 'd')) == 0
+    assert sorted(pod.get_episodes_from_db()) == ['a', 'b', 'c', 'd']
+    check_consistent(pod)
+
+
+def test_random_steps_keep_counts_and_slots(pod):
+    rng = random.Random(0)
+    random.seed(0)  # get_random_episode
+    next_id = 0
+    for _ in range(STEPS):
+        step = rng.choice(['add', 'add', 'done', 'undone', 'delete'])
+        known = pod.get_episodes_from_db()
+        if step == 'add':
+            new = ['ep{}'.format(next_id + i) for i in range(rng.randint(1, 4))]
+            next_id += len(new)
+            seen = rng.sample(known, min(len(known), rng.randint(0, 3)))
+            assert pod.sync_episodes(episodes(*new + seen)) == len(new)
+        elif step == 'done':
+            episode = pod.get_random_episode()
+            if episode is not None:
+                assert not episode.done
+                pod.mark_episode_done(episode)
+        else:
+            done = step == 'undone'
+            candidates = pod.session.query(Podcast).filter(
+                Podcast.done == done).all()
+            if candidates:
+                episode = rng.choice(candidates)
+                if step == 'undone':
+                    episode.done = False
+                else:
+                    pod.session.delete(episode)
+                pod.session.commit()
+        check_consistent(pod)
+
+    # a new store on the same database counts from the triggers' tables
+    counts = pod.get_counts()
+    assert PodStore('https://example.com/rss').get_counts() == counts
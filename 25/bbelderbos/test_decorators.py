@@ -0,0 +1,189 @@
+import atexit
+import os
+import threading
+import time
+
+import pytest
+
+os.environ.setdefault('THE_MOVIE_DB_API_KEY', 'test-key')  # before tmdb_init
+
+from themoviedb.decorators import ResultCache, cached  # noqa: E402
+
+NUM_CALLERS = 8
+TIMEOUT = 5
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def make_cache(tmp_path, clock):
+    """ResultCaches on one file in tmp_path, not flushed at exit"""
+    caches = []
+
+    def make_cache(**kwargs):
+        kwargs.setdefault('clock', clock)
+        cache = ResultCache(str(tmp_path / 'results.sqlite'), **kwargs)
+        caches.append(cache)
+        return cache
+    yield make_cache
+    for cache in caches:
+        atexit.unregister(cache.flush)
+        if cache.conn is not None:
+            cache.conn.close()
+
+
+class Computation:
+    """Counts its calls, returns the value or raises it if an exception"""
+
+    def __init__(self, value='value'):
+        self.value = value
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if isinstance(self.value, Exception):
+            raise self.value
+        return self.value
+
+
+def disk_keys(cache):
+    return {key for key, in cache._db().execute('SELECT key FROM results')}
+
+
+def test_ttl_expiry(make_cache, clock):
+    cache = make_cache(ttl=10)
+    compute = Computation()
+    assert cache.get_or_compute('a', compute) == 'value'
+    clock.now += 9.9
+    assert cache.get_or_compute('a', compute) == 'value'
+    assert (compute.calls, cache.hits, cache.misses) == (1, 1, 1)
+    clock.now += 0.1
+    assert cache.get_or_compute('a', compute) == 'value'
+    assert (compute.calls, cache.misses) == (2, 2)
+
+    # expired on disk too
+    cache.flush()
+    clock.now += 10
+    other = make_cache(ttl=10)
+    assert other.get_or_compute('a', compute) == 'value'
+    assert (compute.calls, other.disk_hits) == (3, 0)
+
+
+def test_lru_eviction(make_cache):
+    cache = make_cache(maxsize=2)
+    for key in 'ab':
+        cache.get_or_compute(key, Computation(key))
+    cache.get_or_compute('a', Computation())  # a is now the most recent
+    cache.get_or_compute('c', Computation('c'))
+    assert list(cache.memory) == ['a', 'c']
+
+    # b was evicted from memory, not from the results to write to disk
+    compute = Computation()
+    assert cache.get_or_compute('b', compute) == 'b'
+    assert (compute.calls, cache.disk_hits) == (0, 1)
+    assert list(cache.memory) == ['c', 'b']
+
+
+def test_disk_hits_from_another_cache(make_cache):
+    cache = make_cache(batch_size=2)
+    cache.get_or_compute('a', Computation({'id': 1}))
+    assert disk_keys(cache) == set()  # waits for a batch
+    cache.get_or_compute('b', Computation([1, 2]))
+    assert disk_keys(cache) == {'a', 'b'}
+    cache.get_or_compute('c', Computation('c'))
+    cache.flush()
+
+    other = make_cache()
+    compute = Computation()
+    assert other.get_or_compute('a', compute) == {'id': 1}
+    assert other.get_or_compute('b', compute) == [1, 2]
+    assert other.get_or_compute('c', compute) == 'c'
+    assert other.get_or_compute('a', compute) == {'id': 1}
+    assert compute.calls == 0
+    assert (other.disk_hits, other.hits) == (3, 1)
+
+
+def test_disk_maxsize(make_cache, clock):
+    cache = make_cache(disk_maxsize=3, batch_size=1)
+    for key in 'abcde':
+        clock.now += 1
+        cache.get_or_compute(key, Computation(key))
+    # the ones expiring last are kept
+    assert disk_keys(cache) == {'c', 'd', 'e'}
+
+    cache.clear()
+    assert disk_keys(cache) == set() and not cache.memory
+
+
+def run_concurrently(cache, compute):
+    """Results or exceptions of NUM_CALLERS threads asking for key at the
+    same time. compute doesn't finish before the others are waiting"""
+    results = [None] * NUM_CALLERS
+
+    def slow_compute():
+        deadline = time.monotonic() + TIMEOUT
+        while cache.waits < NUM_CALLERS - 1 and time.monotonic() < deadline:
+            time.sleep(0.001)
+        return compute()
+
+    def caller(num):
+        try:
+            results[num] = cache.get_or_compute('key', slow_compute)
+        except Exception as exc:
+            results[num] = exc
+
+    threads = [threading.Thread(target=caller, args=(num,))
+               for num in range(NUM_CALLERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(TIMEOUT)
+    return results
+
+
+def test_concurrent_callers_compute_once(make_cache):
+    cache = make_cache()
+    compute = Computation()
+    assert run_concurrently(cache, compute) == ['value'] * NUM_CALLERS
+    assert compute.calls == 1
+    assert (cache.misses, cache.waits) == (1, NUM_CALLERS - 1)
+    assert cache.inflight == {}
+
+
+def test_exception_reaches_waiters(make_cache):
+    cache = make_cache()
+    error = ValueError('no luck')
+    compute = Computation(error)
+    assert run_concurrently(cache, compute) == [error] * NUM_CALLERS
+    assert compute.calls == 1
+    assert cache.waits == NUM_CALLERS - 1
+    assert cache.inflight == {}
+
+    # nothing cached, the next caller tries again
+    assert cache.get_or_compute('key', Computation()) == 'value'
+
+
+def test_cached(tmp_path, clock):
+    calls = []
+
+    @cached(key=lambda x, verbose=False: x,
+            path=str(tmp_path / 'results.sqlite'), clock=clock)
+    def square(x, verbose=False):
+        calls.append(x)
+        return x * x
+
+    atexit.unregister(square.cache.flush)
+    assert [square(3), square(3, verbose=True), square(4)] == [9, 9, 16]
+    assert calls == [3, 4]
+    assert square.cache.hits == 1
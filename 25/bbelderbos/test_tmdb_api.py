@@ -0,0 +1,116 @@
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+os.environ.setdefault('THE_MOVIE_DB_API_KEY', 'test-key')  # before tmdb_init
+
+from themoviedb.rate_limit import TokenBucket  # noqa: E402
+from themoviedb.tmdb_api import Movies  # noqa: E402
+
+NUM_PAGES = 12
+RATE, WINDOW = 5, 0.5  # RATE requests per WINDOW seconds, ~2 s for it all
+PER_PAGE = 5
+
+
+class FakeTmdbHandler(BaseHTTPRequestHandler):
+    """/3/movie/now_playing with NUM_PAGES pages. The first request for
+    page 3 gets a 429 with an HTTP date Retry-After, page 5 one in
+    seconds, page 7 a 503 and page 9 doesn't exist"""
+    lock = threading.Lock()
+    requests = []  # (time, page, status)
+    inflight = max_inflight = 0
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        page = int(query.get('page', 1))
+        with self.lock:
+            cls = type(self)
+            cls.inflight += 1
+            cls.max_inflight = max(cls.max_inflight, cls.inflight)
+            retry = any(seen == page for _, seen, _ in self.requests)
+        time.sleep(0.02)  # overlap concurrent requests
+        headers = {}
+        if url.path != '/3/movie/now_playing' or page == 9:
+            status = 404
+        elif page == 3 and not retry:
+            status = 429
+            headers['Retry-After'] = formatdate(time.time() + 2, usegmt=True)
+        elif page == 5 and not retry:
+            status, headers['Retry-After'] = 429, '0'
+        elif page == 7 and not retry:
+            status = 503
+        else:
+            status = 200
+        body = json.dumps({
+            'page': page, 'total_pages': NUM_PAGES,
+            'results': [{'id': page * 100 + i, 'vote_count': i}
+                        for i in range(PER_PAGE)]} if status == 200
+            else {'status_message': 'nope'}).encode()
+        with self.lock:
+            self.requests.append((time.monotonic(), page, status))
+            type(self).inflight -= 1
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def movies():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeTmdbHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    FakeTmdbHandler.requests = []
+    FakeTmdbHandler.max_inflight = 0
+
+    class FakeMovies(Movies):
+        rate_limiter = TokenBucket(RATE, WINDOW)
+
+    movies = FakeMovies('en', NUM_PAGES)
+    movies.movies.base_uri = 'http://127.0.0.1:{}/3'.format(
+        server.server_port)
+    yield movies
+    server.shutdown()
+    server.server_close()
+
+
+def test_get_items(movies):
+    # without the cached and store_results decorators, they use files
+    get_items = Movies.get_items.__wrapped__.__wrapped__
+    items = get_items(movies, movies.movies.now_playing)
+
+    # pages in order, 9 skipped, only the items with enough votes
+    assert [item['id'] for item in items] == [
+        page * 100 + i for page in range(1, NUM_PAGES + 1) if page != 9
+        for i in range(PER_PAGE) if i > movies.min_vote_count]
+
+    requests = FakeTmdbHandler.requests
+    statuses = {}
+    for _, page, status in requests:
+        statuses.setdefault(page, []).append(status)
+    assert statuses.pop(3) == statuses.pop(5) == [429, 200]
+    assert statuses.pop(7) == [503, 200]
+    assert statuses.pop(9) == [404]  # not retried
+    assert all(seen == [200] for seen in statuses.values())
+
+    # concurrent, but never faster than the token bucket allows
+    assert FakeTmdbHandler.max_inflight > 1
+    start = requests[0][0]
+    for num, (when, _, _) in enumerate(sorted(requests), 1):
+        assert num <= RATE + (when - start) * RATE / WINDOW + 1
+
+    # the HTTP date Retry-After (2 s, in whole seconds) was waited for
+    page3 = [when for when, page, _ in requests if page == 3]
+    assert page3[1] - page3[0] > 0.9
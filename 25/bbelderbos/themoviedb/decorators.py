@@ -1,11 +1,23 @@
-from collections import namedtuple
+import atexit
+from collections import OrderedDict, namedtuple
+from concurrent.futures import Future
 from functools import wraps
+import pickle
 import re
 import shelve
+import sqlite3
+import threading
+import time
 
 CACHE = 'items.shelve'
 DEFAULT_OVERWRITE = False
 
+RESULTS_DB = 'results.sqlite'  # disk tier of the cached decorator
+CACHE_TTL = 60 * 60  # seconds
+CACHE_MAXSIZE = 128  # results kept in memory
+DISK_MAXSIZE = 10000  # results kept on disk
+BATCH_SIZE = 32  # new results written to disk in one transaction
+
 Item = namedtuple('Item', 'id kind listing title genres overview release_date poster')  # noqa E501
 
 
@@ -71,3 +83,150 @@ def store_results(f):
         print(len(resp))
         return resp
     return wrapped
+
+
+class ResultCache:
+    """LRU of at most maxsize results in memory backed by SQLite, both
+    expiring after ttl seconds. New results get written to disk in
+    batches of batch_size, and on exit. Callers asking for a key that
+    is being computed wait for that computation instead of starting
+    their own. clock gives the time expiry is based on"""
+
+    def __init__(self, path=RESULTS_DB, ttl=CACHE_TTL, maxsize=CACHE_MAXSIZE,
+                 disk_maxsize=DISK_MAXSIZE, batch_size=BATCH_SIZE,
+                 clock=time.time):
+        self.path = path
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.disk_maxsize = disk_maxsize
+        self.batch_size = batch_size
+        self.clock = clock
+        self.memory = OrderedDict()  # key -> (expires, value)
+        self.pending = {}  # key -> (expires, pickled value), not on disk yet
+        self.inflight = {}  # key -> Future of the caller computing it
+        self.lock = threading.Lock()
+        self.conn = None
+        self.hits = self.disk_hits = self.misses = self.waits = 0
+        atexit.register(self.flush)
+
+    def _db(self):
+        if self.conn is None:
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.conn.execute('CREATE TABLE IF NOT EXISTS results '
+                              '(key TEXT PRIMARY KEY, value BLOB, '
+                              'expires REAL)')
+        return self.conn
+
+    def _remember(self, key, expires, value):
+        self.memory[key] = (expires, value)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.maxsize:
+            self.memory.popitem(last=False)
+
+    def _get(self, key, now):
+        if key in self.memory:
+            expires, value = self.memory[key]
+            if expires > now:
+                self.memory.move_to_end(key)
+                self.hits += 1
+                return True, value
+            del self.memory[key]
+        if key in self.pending:  # evicted from memory, not on disk yet
+            expires, blob = self.pending[key]
+        else:
+            row = self._db().execute(
+                'SELECT expires, value FROM results WHERE key = ?',
+                (key,)).fetchone()
+            if row is None:
+                return False, None
+            expires, blob = row
+        if expires <= now:
+            return False, None
+        value = pickle.loads(blob)
+        self._remember(key, expires, value)
+        self.disk_hits += 1
+        return True, value
+
+    def _set(self, key, value, now):
+        expires = now + self.ttl
+        self._remember(key, expires, value)
+        self.pending[key] = (expires, pickle.dumps(value))
+        if len(self.pending) >= self.batch_size:
+            self._flush(now)
+
+    def _flush(self, now):
+        conn = self._db()
+        with conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO results VALUES (?, ?, ?)',
+                [(key, value, expires)
+                 for key, (expires, value) in self.pending.items()])
+            conn.execute('DELETE FROM results WHERE expires <= ?', (now,))
+            conn.execute('DELETE FROM results WHERE key IN (SELECT key FROM '
+                         'results ORDER BY expires DESC LIMIT -1 OFFSET ?)',
+                         (self.disk_maxsize,))
+        self.pending.clear()
+
+    def flush(self):
+        """Write the pending results to disk"""
+        with self.lock:
+            if self.pending:
+                self._flush(self.clock())
+
+    def get_or_compute(self, key, compute):
+        with self.lock:
+            found, value = self._get(key, self.clock())
+            if found:
+                return value
+            future = self.inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self.inflight[key] = Future()
+                self.misses += 1
+            else:
+                self.waits += 1
+        if not leader:
+            return future.result()
+        try:
+            value = compute()
+        except BaseException as exc:
+            with self.lock:
+                del self.inflight[key]
+            future.set_exception(exc)
+            raise
+        with self.lock:
+            self._set(key, value, self.clock())
+            del self.inflight[key]
+        future.set_result(value)
+        return value
+
+    def clear(self):
+        """Forget everything, in memory and on disk"""
+        with self.lock:
+            self.memory.clear()
+            self.pending.clear()
+            with self._db() as conn:
+                conn.execute('DELETE FROM results')
+
+
+def cached(key=None, **cache_kwargs):
+    """Cache the results of the decorated function in a ResultCache
+    (cache_kwargs: path, ttl, maxsize ..), available as its cache
+    attribute. key(*args, **kwargs) gives the part of the cache key
+    identifying a call, it defaults to the arguments themselves so
+    their repr should not change between runs"""
+    def decorator(f):
+        cache = ResultCache(**cache_kwargs)
+        name = '{}.{}'.format(f.__module__, f.__qualname__)
+
+        @wraps(f)
+        def wrapped(*args, **kwargs):
+            if key is None:
+                call = (args, sorted(kwargs.items()))
+            else:
+                call = key(*args, **kwargs)
+            return cache.get_or_compute(repr((name, call)),
+                                        lambda: f(*args, **kwargs))
+        wrapped.cache = cache
+        return wrapped
+    return decorator
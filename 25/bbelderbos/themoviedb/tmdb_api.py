@@ -1,48 +1,100 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import random
 import time
 
+import requests  # what tmdbsimple uses
+
 from .tmdb_init import tmdb
-from .decorators import store_results
+from .decorators import cached, store_results
+from .rate_limit import TokenBucket, parse_retry_after
 
 DEFAULT_LANG = 'en'
 DEFAULT_NUM_PAGES = 2
 DEFAULT_MIN_VOTE_COUNT = 1
+MAX_WORKERS = 8  # pages fetched at the same time
+RATE_LIMIT = 40  # requests per RATE_WINDOW seconds, TMDB's limit
+RATE_WINDOW = 10
+MAX_TRIES = 3
+BACKOFF = 0.5  # seconds, doubled for every retry
+
+
+def _items_key(tmdb_obj, obj_method):
+    '''What get_items fetches: the listing and the query settings'''
+    return (type(tmdb_obj).__name__, obj_method.__name__, tmdb_obj.language,
+            tmdb_obj.num_pages, tmdb_obj.min_vote_count)
 
 
 class Tmdb:
+    max_workers = MAX_WORKERS
+    rate_limiter = TokenBucket(RATE_LIMIT, RATE_WINDOW)  # shared, one API key
 
     def __init__(self, language=None, num_pages=None, min_vote_count=None):
         self.language = language or DEFAULT_LANG
         self.num_pages = num_pages or DEFAULT_NUM_PAGES
         self.min_vote_count = min_vote_count or DEFAULT_MIN_VOTE_COUNT
 
+    @cached(key=_items_key)
     @store_results
     def get_items(self, obj_method):
-        results = []
-
-        for i in range(self.num_pages):
-            page = i + 1
-
-            num_tries = 0
-            resp = None
-
-            while num_tries < 3:
-                try:
-                    resp = obj_method(language=self.language,
-                                      page=page)
-                    break
-                except:
-                    num_tries += 1
-                    continue
-
-            if not resp or 'results' not in resp:
-                continue
-
-            results += [r for r in resp['results']
-                        if r['vote_count'] > self.min_vote_count]
-
-            time.sleep(1)
-
-        return results
+        pages = dict(self.iter_pages(obj_method))
+        return [item for page in sorted(pages)
+                for item in self._popular(pages[page])]
+
+    def iter_items(self, obj_method):
+        '''Yield the items with more than min_vote_count votes as their
+        pages come in'''
+        for _, results in self.iter_pages(obj_method):
+            yield from self._popular(results)
+
+    def _popular(self, results):
+        return [r for r in results if r['vote_count'] > self.min_vote_count]
+
+    def iter_pages(self, obj_method):
+        '''Yield (page, results) of the first num_pages pages, in the
+        order they arrive. Page 1 tells how many pages there are, the
+        rest get fetched max_workers at a time. Pages that keep failing
+        are skipped'''
+        first = self._fetch_page(obj_method, 1)
+        if first is None:
+            return
+        yield 1, first.get('results', [])
+        last_page = min(self.num_pages, first.get('total_pages', 1))
+
+        with ThreadPoolExecutor(self.max_workers) as pool:
+            futures = {pool.submit(self._fetch_page, obj_method, page): page
+                       for page in range(2, last_page + 1)}
+            try:
+                for future in as_completed(futures):
+                    resp = future.result()
+                    if resp is not None:
+                        yield futures[future], resp.get('results', [])
+            finally:  # stopped early, don't fetch what nobody reads
+                for future in futures:
+                    future.cancel()
+
+    def _fetch_page(self, obj_method, page):
+        '''The response for page, retrying rate limited (429), server
+        and connection errors after their Retry-After (seconds or a
+        date) or else with jittered exponential backoff'''
+        for attempt in range(MAX_TRIES):
+            self.rate_limiter.acquire()
+            delay = None
+            try:
+                return obj_method(language=self.language, page=page)
+            except requests.HTTPError as exc:
+                if exc.response is not None:
+                    status = exc.response.status_code
+                    if status != 429 and status < 500:
+                        return None  # won't get better by asking again
+                    delay = parse_retry_after(
+                        exc.response.headers.get('Retry-After'))
+            except (requests.RequestException, ValueError):
+                pass
+            if attempt < MAX_TRIES - 1:
+                if delay is None:  # "full jitter" backoff
+                    delay = random.uniform(0, BACKOFF * 2 ** attempt)
+                time.sleep(delay)
+        return None
 
 
 class Movies(Tmdb):
@@ -1,13 +1,18 @@
 from collections import defaultdict, Counter
+from concurrent.futures import ProcessPoolExecutor
+import ast
 import glob
+import hashlib
+import json
 import os
 import re
 
 from stdlib import is_std_lib
 
-index = defaultdict(set)
+CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                     '.module_index.json')  # next to this script
 
-import_regex = re.compile('^(?:from|import)\s(?P<module>\w+).*')
+import_regex = re.compile(r'^(?:from|import)\s(?P<module>\w+).*')
 
 dirname = os.getcwd()
 
@@ -24,20 +29,89 @@ def get_files(path):
 
 
 def get_lines(src):
-    with open(scr) as f:
+    with open(src) as f:
         for line in f:
             yield line
 
 
+def get_modules(src):
+    """Top level modules imported by module level statements of src,
+    falling back to import_regex for files ast cannot parse (Python 2)"""
+    with open(src, 'rb') as f:
+        source = f.read()
+    try:
+        tree = ast.parse(source, src)
+    except (SyntaxError, ValueError):
+        lines = source.decode('utf-8', 'replace').splitlines()
+        return sorted({m.group('module') for m in map(import_regex.match, lines)
+                       if m})
+    modules = set()
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.update(alias.name.split('.')[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            modules.add(node.module.split('.')[0])
+    return sorted(modules)
+
+
+def scan_file(src):
+    """Return (mtime, hash, modules) of src, run in the worker processes"""
+    with open(src, 'rb') as f:
+        digest = hashlib.sha1(f.read()).hexdigest()
+    return os.stat(src).st_mtime_ns, digest, get_modules(src)
+
+
+def load_cache(cache_file=CACHE):
+    try:
+        with open(cache_file) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(cache, cache_file=CACHE):
+    with open(cache_file, 'w') as f:
+        json.dump(cache, f)
+
+
+def _is_fresh(src, entry):
+    """Cached entry is still valid: same mtime, or same content"""
+    if os.stat(src).st_mtime_ns == entry['mtime']:
+        return True
+    with open(src, 'rb') as f:
+        if hashlib.sha1(f.read()).hexdigest() == entry['hash']:
+            entry['mtime'] = os.stat(src).st_mtime_ns
+            return True
+    return False
+
+
+def build_index(cache, workers=None):
+    """Map module -> challenge days importing it, only (re)scanning
+    files that are new or changed since they got cached"""
+    files = {src: os.path.basename(path)
+             for path in get_dirs() for src in get_files(path)}
+    stale = [src for src in files
+             if src not in cache or not _is_fresh(src, cache[src])]
+    if stale:
+        with ProcessPoolExecutor(workers) as pool:
+            for src, (mtime, digest, modules) in zip(
+                    stale, pool.map(scan_file, stale, chunksize=32)):
+                cache[src] = {'mtime': mtime, 'hash': digest,
+                              'modules': modules}
+    for src in set(cache) - set(files):
+        del cache[src]  # file got removed
+
+    index = defaultdict(set)
+    for src, day in files.items():
+        for mod in cache[src]['modules']:
+            index[mod].add(day)
+    return index
+
+
 if __name__ == '__main__':
-    for path in get_dirs():
-        day = os.path.basename(path)
-        for scr in get_files(path):
-            for line in get_lines(scr):
-                m = import_regex.match(line)
-                if m:
-                    mod = m.groupdict()['module']
-                    index[mod].add(day)
+    cache = load_cache()
+    index = build_index(cache)
+    save_cache(cache)
 
     cnt = Counter()
 
@@ -4,6 +4,9 @@ import sys
 from contextlib import contextmanager
 from importlib import import_module
 
+# Python 3.10+ ships the list, no need to import anything to check
+STDLIB_MODULE_NAMES = getattr(sys, 'stdlib_module_names', None)
+
 
 @contextmanager
 def ignore_site_packages_paths():
@@ -22,6 +25,9 @@ def is_std_lib(module):
     if module in sys.builtin_module_names:
         return True
 
+    if STDLIB_MODULE_NAMES is not None:
+        return module in STDLIB_MODULE_NAMES
+
     with ignore_site_packages_paths():
         imported_module = sys.modules.pop(module, None)
         try:
@@ -0,0 +1,143 @@
+from collections import defaultdict
+import os
+import pathlib
+
+import pytest
+
+import module_index
+import stdlib
+from module_index import build_index, get_modules
+
+SOURCES = {
+    '01/wordvalue.py': '''"""docstring"""
+import os, sys
+import xml.etree.ElementTree as ET
+from collections import Counter
+from . import data
+from .common import helper
+
+
+def f():
+    import json  # not module level
+''',
+    '01/py2.py': '''import urllib2
+print "Python 2"
+    import indented
+from string import letters
+''',
+    '02/game.py': '''from __future__ import print_function
+try:
+    import numpy  # not module level either
+except ImportError:
+    pass
+from wordvalue import calc_word_value
+''',
+    '02/notes.txt': 'import nothing\n',
+    'docs/conf.py': 'import sphinx\n',  # not a challenge day
+}
+
+
+@pytest.fixture
+def tree(tmp_path, monkeypatch):
+    for name, source in SOURCES.items():
+        path = tmp_path / name
+        path.parent.mkdir(exist_ok=True)
+        path.write_text(source)
+    monkeypatch.setattr(module_index, 'dirname', str(tmp_path))
+    return tmp_path
+
+
+class NoPool:
+    """Stands in for ProcessPoolExecutor where nothing should get scanned"""
+
+    def __init__(self, *args):
+        raise AssertionError('files got scanned')
+
+
+def serial_index(root):
+    index = defaultdict(set)
+    for day in os.listdir(str(root)):
+        if not day[0].isdigit():
+            continue
+        for name in os.listdir(str(root / day)):
+            if name.endswith('.py'):
+                for mod in get_modules(str(root / day / name)):
+                    index[mod].add(day)
+    return index
+
+
+def test_get_modules(tree):
+    assert get_modules(str(tree / '01/wordvalue.py')) == [
+        'collections', 'os', 'sys', 'xml']
+    # no ast for Python 2, the regex takes unindented imports
+    assert get_modules(str(tree / '01/py2.py')) == ['string', 'urllib2']
+    assert get_modules(str(tree / '02/game.py')) == ['__future__',
+                                                     'wordvalue']
+
+
+def test_build_index_matches_serial(tree):
+    cache = {}
+    index = build_index(cache, workers=2)
+    assert index == serial_index(tree)
+    assert index['os'] == {'01'} and index['wordvalue'] == {'02'}
+    assert 'sphinx' not in index
+    assert sorted(cache) == sorted(str(tree / name) for name in SOURCES
+                                   if name[0].isdigit() and
+                                   name.endswith('.py'))
+
+
+def test_build_index_of_this_repo(monkeypatch):
+    root = os.path.dirname(os.path.abspath(__file__))
+    monkeypatch.setattr(module_index, 'dirname', root)
+    index = build_index({})
+    assert index == serial_index(pathlib.Path(root))
+    assert 'os' in index
+
+
+def test_cache_invalidation(tree, monkeypatch):
+    cache = {}
+    build_index(cache)
+    src = str(tree / '02/game.py')
+    mtime = os.stat(src).st_mtime_ns
+
+    # unchanged, or touched but the same content: nothing is scanned
+    monkeypatch.setattr(module_index, 'ProcessPoolExecutor', NoPool)
+    assert build_index(cache) == serial_index(tree)
+    os.utime(src, ns=(mtime + 10 ** 9, mtime + 10 ** 9))
+    assert build_index(cache) == serial_index(tree)
+    assert cache[src]['mtime'] == mtime + 10 ** 9
+    monkeypatch.undo()
+    monkeypatch.setattr(module_index, 'dirname', str(tree))
+
+    # an edit is picked up
+    with open(src, 'a') as f:
+        f.write('import requests\n')
+    os.utime(src, ns=(mtime + 2 * 10 ** 9, mtime + 2 * 10 ** 9))
+    index = build_index(cache)
+    assert index['requests'] == {'02'}
+    assert index == serial_index(tree)
+
+    # removed files leave the cache and the index
+    os.remove(src)
+    index = build_index(cache)
+    assert src not in cache and 'requests' not in index
+    assert index == serial_index(tree)
+
+
+def test_cache_round_trip(tmp_path):
+    cache_file = str(tmp_path / 'cache.json')
+    assert module_index.load_cache(cache_file) == {}
+    cache = {'01/a.py': {'mtime': 1, 'hash': 'abc', 'modules': ['os']}}
+    module_index.save_cache(cache, cache_file)
+    assert module_index.load_cache(cache_file) == cache
+    assert os.path.dirname(module_index.CACHE) == os.path.dirname(
+        os.path.abspath(module_index.__file__))
+
+
+@pytest.mark.parametrize('names', [stdlib.STDLIB_MODULE_NAMES, None])
+def test_is_std_lib(monkeypatch, names):
+    monkeypatch.setattr(stdlib, 'STDLIB_MODULE_NAMES', names)
+    for module in ('sys', 'os', 'json', 'collections'):
+        assert stdlib.is_std_lib(module)
+    for module in ('requests', 'feedparser', 'no_such_module'):
+        assert not stdlib.is_std_lib(module)